@@ -0,0 +1,106 @@
+import unittest
+import random
+from KubaGame import KubaGame, BitBoard
+
+try:
+    import numpy as np
+    from batch import BatchBoard, encode_board, encode_move, decode_move, DIRS, CODE_COLORS, COLOR_CODES, EMPTY, \
+        WHITE, BLACK
+except ImportError:
+    np = None
+
+@unittest.skipIf(np is None, 'numpy is not installed')
+class TestBatchBoard(unittest.TestCase):
+    """ Contains parity tests of the NumPy batch board against KubaGame"""
+
+    def assertParity(self, batch, games):
+        for i, game in enumerate(games):
+            np.testing.assert_array_equal(batch.cells[i], encode_board(game.board.board))
+            self.assertEqual(decode_move(*batch.ko[i]), game.ko_rule_move)
+            self.assertEqual(tuple(batch.red_captured[i]), (game.player_a.red_captured, game.player_b.red_captured))
+            self.assertEqual(tuple(batch.marbles_left[i]), (game.player_a.marbles_left, game.player_b.marbles_left))
+
+        for code, color in ((WHITE, 'W'), (BLACK, 'B')):
+            mask = batch.legal_mask(code)
+            for i, game in enumerate(games):
+                player = game.player_a if color == 'W' else game.player_b
+                expected = set(player.available_moves(game.board, game.ko_rule_move))
+                found = {((row, col), DIRS[d]) for row, col, d in zip(*np.nonzero(mask[i]))}
+                self.assertEqual(found, expected)
+
+        winners = batch.winners()
+        for i, game in enumerate(games):
+            winner = game.get_winner()
+            expected = EMPTY if winner is None else COLOR_CODES[game.players[winner].color]
+            self.assertEqual(winners[i], expected)
+
+    def testRandomGames(self):
+        rng = np.random.default_rng(4)
+        n = 24
+        games = [KubaGame(('White', 'W'), ('Black', 'B'), board_type=BitBoard) for _ in range(n)]
+        batch = BatchBoard.initial(n)
+        batch.to_move[:] = np.where(rng.random(n) < 0.5, WHITE, BLACK)
+        self.assertParity(batch, games)
+
+        for _ in range(120):
+            active = batch.winners() == EMPTY
+            rows, cols, dirs, has_move = batch.sample_moves(batch.legal_mask(batch.to_move), rng)
+            active &= has_move
+            if not active.any():
+                break
+            pushed_off = batch.apply_moves(rows, cols, dirs, active)
+            for i, game in enumerate(games):
+                if active[i]:
+                    record = game.apply_move((int(rows[i]), int(cols[i])), DIRS[dirs[i]])
+                    expected = EMPTY if record.pushed_off is None else COLOR_CODES[record.pushed_off.color]
+                    self.assertEqual(pushed_off[i], expected)
+                else:
+                    self.assertEqual(pushed_off[i], EMPTY)
+            self.assertParity(batch, games)
+
+    def testFromGames(self):
+        game = KubaGame(('White', 'W'), ('Black', 'B'))
+        game.make_move('White', (5, 6), 'L')
+        game.make_move('Black', (6, 0), 'R')
+        batch = BatchBoard.from_games([game, KubaGame(('White', 'W'), ('Black', 'B'))])
+        self.assertEqual(batch.to_move[0], WHITE)
+        self.assertEqual(batch.to_move[1], EMPTY)
+        self.assertParity(batch, [game, KubaGame(('White', 'W'), ('Black', 'B'))])
+
+    def testEdgePushOff(self):
+        game = KubaGame(('White', 'W'), ('Black', 'B'))
+        batch = BatchBoard.from_games([game])
+        pushed_off = batch.apply_moves([0], [1], [DIRS.index('L')])
+        self.assertEqual(CODE_COLORS[pushed_off[0]], 'W')
+        self.assertEqual(batch.cells[0, 0, 0], WHITE)
+        self.assertEqual(batch.cells[0, 0, 1], EMPTY)
+        self.assertEqual(batch.ko[0, 0], -1)
+
+    def testFromSnapshots(self):
+        game = KubaGame(('White', 'W'), ('Black', 'B'), board_type=BitBoard)
+        game.make_move('White', (5, 6), 'L')
+        game.make_move('Black', (6, 0), 'R')
+        games = [game, KubaGame(('White', 'W'), ('Black', 'B'))]
+        batch = BatchBoard.from_snapshots([g.snapshot() for g in games])
+        self.assertEqual(list(batch.to_move), [WHITE, EMPTY])
+        self.assertParity(batch, games)
+
+    def testPushedOff(self):
+        game = KubaGame(('White', 'W'), ('Black', 'B'), board_type=BitBoard)
+        game.make_move('White', (5, 6), 'L')
+        pushed_off = BatchBoard.from_games([game]).pushed_off()[0]
+        for row in range(7):
+            for col in range(7):
+                for d, dir in enumerate(DIRS):
+                    color = game.board.trace_push((row, col), dir)[1] if game.get_marble((row, col)) != 'X' else None
+                    self.assertEqual(pushed_off[row, col, d], EMPTY if color is None else COLOR_CODES[color])
+
+    def testRejectsOtherSizes(self):
+        game = KubaGame(('White', 'W'), ('Black', 'B'), size=9)
+        with self.assertRaises(ValueError):
+            BatchBoard.from_games([game])
+        with self.assertRaises(ValueError):
+            BatchBoard(np.zeros((7, 7), dtype=np.int8))
+
+if __name__ == '__main__':
+    unittest.main(exit=False)
@@ -0,0 +1,104 @@
+import os
+import tempfile
+import unittest
+from KubaGame import KubaGame
+from book import OpeningBook, collect, write_book, build_book, book_policy
+from symmetry import transform_move, transform_snapshot
+from records import RecordWriter, PLAYERS
+from search import legal_moves
+from simulate import run, make_policy
+
+class TestBook(unittest.TestCase):
+    """ Contains tests for the opening book"""
+
+    def setUp(self) -> None:
+        self._dir = tempfile.TemporaryDirectory()
+        self._records = os.path.join(self._dir.name, 'games.kgr')
+        self._book = os.path.join(self._dir.name, 'book.kbk')
+        with RecordWriter(self._records) as records:
+            run(30, 'random', 'random', seed=4, max_plies=120, records=records)
+
+    def tearDown(self) -> None:
+        self._dir.cleanup()
+
+    def testStartPosition(self):
+        count = build_book([self._records], self._book, plies=6)
+        with OpeningBook(self._book) as book:
+            self.assertEqual(len(book), count)
+            start = book.probe(KubaGame(*PLAYERS).position_hash)
+            self.assertEqual(sum(book_move.games for book_move in start), 30)
+            points = sum(book_move.points for book_move in start)
+            self.assertGreaterEqual(points, 0)
+            self.assertLessEqual(points, 30)
+            for book_move in start:
+                self.assertTrue(0 <= book_move.win_rate <= 1)
+
+    def testMatchesCollectedStats(self):
+        stats = collect([self._records], plies=4)
+        write_book(stats, self._book)
+        with OpeningBook(self._book) as book:
+            for (key, code), (games, points) in stats.items():
+                found = [book_move for book_move in book.probe(key) if book_move.games == games and
+                         book_move.points == points / 2]
+                self.assertTrue(found)
+            self.assertEqual(book.probe(12345), [])
+
+    def testMinGames(self):
+        build_book([self._records], self._book, plies=8, min_games=3)
+        with OpeningBook(self._book) as book:
+            start = book.probe(KubaGame(*PLAYERS).position_hash)
+            self.assertTrue(start)
+            for book_move in start:
+                self.assertGreaterEqual(book_move.games, 3)
+
+    def testPolicyUsesBook(self):
+        build_book([self._records], self._book, plies=2)
+        game = KubaGame(*PLAYERS)
+        with OpeningBook(self._book) as book:
+            expected = book.choose(game, 'White')
+            self.assertIsNotNone(expected)
+            policy = book_policy(book, lambda game, player_name: None)
+            self.assertEqual(policy(game, 'White'), expected)
+            game.make_move('White', *expected)
+            game.make_move('Black', *make_policy('random', 0)(game, 'Black'))
+            game.make_move('White', *make_policy('random', 0)(game, 'White'))
+            self.assertIsNone(policy(game, 'Black'))
+        policy = make_policy('random:book={}'.format(self._book), 0)
+        self.assertEqual(policy(KubaGame(*PLAYERS), 'White'), expected)
+
+    def testSymmetricBook(self):
+        plain = build_book([self._records], self._book, plies=8)
+        symmetric_path = os.path.join(self._dir.name, 'symmetric.kbk')
+        count = build_book([self._records], symmetric_path, plies=8, symmetric=True)
+        self.assertLessEqual(count, plain)
+        with OpeningBook(self._book) as book, OpeningBook(symmetric_path) as symmetric:
+            self.assertFalse(book.symmetric)
+            self.assertTrue(symmetric.symmetric)
+            self.assertEqual(len(symmetric), count)
+            game = KubaGame(*PLAYERS)
+            self.assertEqual(sum(book_move.games for book_move in symmetric.lookup(game)), 30)
+            move = symmetric.choose(game, 'White')
+            game.make_move('White', *move)
+            moves = {book_move.move: book_move.games for book_move in symmetric.lookup(game)}
+            self.assertTrue(moves)
+            self.assertLessEqual(set(moves), set(legal_moves(game, game.players[game.get_current_turn()])))
+            # A rotated position finds the same moves, rotated
+            image = KubaGame.from_snapshot(transform_snapshot(game.snapshot(), 1), *PLAYERS)
+            self.assertEqual({book_move.move: book_move.games for book_move in symmetric.lookup(image)},
+                             {transform_move(move, 1): games for move, games in moves.items()})
+
+    def testRejectsOtherSizes(self):
+        records = os.path.join(self._dir.name, 'large.kgr')
+        with RecordWriter(records, size=9) as writer:
+            run(2, 'random', 'random', seed=1, max_plies=20, records=writer, size=9)
+        with self.assertRaisesRegex(ValueError, '9x9'):
+            collect([records])
+
+    def testBadFile(self):
+        with open(self._book, 'wb') as file:
+            file.write(b'nope' * 10)
+        with self.assertRaises(ValueError):
+            OpeningBook(self._book)
+
+if __name__ == '__main__':
+    unittest.main(exit=False)
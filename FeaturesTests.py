@@ -0,0 +1,75 @@
+import os
+import random
+import tempfile
+import unittest
+from KubaGame import KubaGame, Board, BitBoard
+from search import LinearEvaluation, AlphaBetaSearch, legal_moves, position_features, FEATURES
+
+try:
+    import numpy as np
+    from batch import BatchBoard, WHITE, BLACK
+    from features import extract, dataset, fit, accuracy, fit_evaluation
+    from posdb import PositionDB
+    from simulate import run
+except ImportError:
+    np = None
+
+@unittest.skipIf(np is None, 'numpy is not installed')
+class TestFeatures(unittest.TestCase):
+    """ Contains tests for the vectorized features and the weight fitting pipeline"""
+
+    def testMatchesPositionFeatures(self):
+        rng = random.Random(5)
+        games = []
+        for index in range(30):
+            game = KubaGame(('White', 'W'), ('Black', 'B'), board_type=BitBoard if index % 2 else Board)
+            player_name = rng.choice(['White', 'Black'])
+            for _ in range(rng.randrange(1, 100)):
+                moves = legal_moves(game, game.players[player_name])
+                if game.get_winner() is not None or not moves:
+                    break
+                game.make_move(player_name, *rng.choice(moves))
+                player_name = game.get_current_turn()
+            games.append(game)
+        batch = BatchBoard.from_games(games)
+        for code, index in ((WHITE, 0), (BLACK, 1)):
+            features = extract(batch, code)
+            self.assertEqual(features.shape, (len(games), len(FEATURES)))
+            for i, game in enumerate(games):
+                players = (game.player_a, game.player_b)
+                self.assertEqual(tuple(features[i]), position_features(game, players[index], players[1 - index]))
+        with self.assertRaises(ValueError):
+            extract(BatchBoard.initial(2))
+
+    def testFit(self):
+        rng = np.random.default_rng(3)
+        features = rng.normal(size=(4000, 3))
+        truth = np.array([2.0, -1.0, 0.0])
+        outcomes = rng.random(4000) < 1.0 / (1.0 + np.exp(-(features @ truth)))
+        weights = fit(features, outcomes, l2=0.1)
+        np.testing.assert_allclose(weights, truth, atol=0.25)
+        self.assertGreater(accuracy(features, outcomes, weights), 0.7)
+
+    def testPipeline(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'positions.kpd')
+            with PositionDB(path, writable=True) as positions:
+                summary = run(20, 'greedy', 'random', seed=2, max_plies=150, positions=positions)
+            features, outcomes = dataset([path])
+            self.assertEqual(len(features), len(outcomes))
+            self.assertLessEqual(len(outcomes), summary['moves'])
+            self.assertGreater(len(outcomes), 0)
+
+            evaluation = fit_evaluation([path])
+            self.assertGreater(evaluation.weights['red_captured'], 0)
+            self.assertEqual(evaluation.info['positions'], len(outcomes))
+            weights_path = os.path.join(directory, 'weights.json')
+            evaluation.save(weights_path)
+            loaded = LinearEvaluation.load(weights_path)
+        self.assertEqual(loaded.weights, evaluation.weights)
+        game = KubaGame(('White', 'W'), ('Black', 'B'))
+        result = AlphaBetaSearch(max_depth=2, time_limit=None, evaluation=loaded).search(game, 'White')
+        self.assertTrue(game.make_move('White', *result.move))
+
+if __name__ == '__main__':
+    unittest.main(exit=False)
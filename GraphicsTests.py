@@ -0,0 +1,102 @@
+import os
+import random
+import unittest
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+try:
+    import pygame
+    from graphics import Game, TextCache
+    from search import legal_moves
+except ImportError:
+    pygame = None
+
+@unittest.skipIf(pygame is None, 'pygame is not installed')
+class TestGraphics(unittest.TestCase):
+    """ Contains headless tests of the incremental redraws and the text cache"""
+
+    def setUp(self):
+        pygame.init()
+        self.game = Game(('White', 'W'), ('Black', 'B'))
+        self.game.setup()
+        self.calls = []
+        update_display = self.game._graphics.update_display
+
+        def record(*args):
+            self.calls.append(args[-1])
+            update_display(*args)
+        self.game._graphics.update_display = record
+
+    def tearDown(self):
+        pygame.quit()
+
+    def screenBytes(self):
+        return pygame.image.tostring(self.game._graphics.screen, 'RGB')
+
+    def assertMatchesFullRedraw(self):
+        dirty = self.screenBytes()
+        game = self.game.game
+        self.game._graphics.update_display(game.board.board, game.get_current_turn(), game.player_a.red_captured,
+                                           game.player_b.red_captured, game.get_winner())
+        self.assertEqual(dirty, self.screenBytes())
+
+    def randomMove(self, rng):
+        game = self.game.game
+        turn = game.get_current_turn() or 'White'
+        moves = sorted(legal_moves(game, game.players[turn]))
+        coord, dir = rng.choice(moves)
+        self.assertTrue(game.make_move(turn, coord, dir))
+        return coord, dir
+
+    def testUnchangedVersionSkipsRedraw(self):
+        self.game.game.make_move('White', (5, 6), 'L')
+        self.game.update()
+        self.game.update()
+        self.game.update()
+        self.assertEqual(self.calls, [None])
+
+        self.game.game.make_move('Black', (6, 0), 'R')
+        self.game.update()
+        self.game.update()
+        self.assertEqual(self.calls, [None, self.game._graphics.line_cells((6, 0), 'R')])
+
+    def testDirtyRedrawMatchesFullRedraw(self):
+        rng = random.Random(3)
+        self.game.game.make_move('White', (5, 6), 'L')
+        self.game.update()
+        for _ in range(40):
+            if self.game.game.get_winner() is not None or self.game.game.draw:
+                break
+            self.randomMove(rng)
+            self.game.update()
+            self.assertIsNotNone(self.calls[-1])
+            self.assertMatchesFullRedraw()
+
+    def testUndoRedrawsUndoneLine(self):
+        self.game.game.make_move('White', (5, 6), 'L')
+        self.game.update()
+        record = self.game.game.apply_move((6, 0), 'R')
+        self.game.update()
+        self.game.game.undo_move(record)
+        self.game.update()
+        self.assertIsNone(self.calls[-1])
+        self.assertMatchesFullRedraw()
+
+    def testTextCacheEvictsLeastRecentlyUsed(self):
+        cache = TextCache(pygame.font.SysFont('arial', 20), max_size=2)
+        black = (0, 0, 0)
+        first = cache.render('a', black)
+        cache.render('b', black)
+        self.assertIs(cache.render('a', black), first)
+        cache.render('c', black)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual((cache.hits, cache.misses), (1, 3))
+
+        # 'b' was the least recently used entry, 'a' was touched after it
+        self.assertIs(cache.render('a', black), first)
+        cache.render('b', black)
+        self.assertEqual((cache.hits, cache.misses), (2, 4))
+
+if __name__ == '__main__':
+    unittest.main(exit=False)
@@ -0,0 +1,117 @@
+import os
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+import unittest
+from KubaGame import KubaGame, Board
+from instrument import Instrumentation, instrumented, active
+
+class TestInstrument(unittest.TestCase):
+    """ Contains tests for the hot path instrumentation"""
+
+    def play(self):
+        game = KubaGame(('PlayerA', 'W'), ('PlayerB', 'B'))
+        game.make_move('PlayerA', (6, 5), 'F')
+        game.make_move('PlayerB', (6, 0), 'R')
+        game.make_move('PlayerA', (5, 6), 'L')
+        return game
+
+    def testCountsAndRestores(self):
+        make_move = KubaGame.make_move
+        update_board = Board.update_board
+        with instrumented() as stats:
+            self.assertIs(active(), stats)
+            self.assertIsNot(KubaGame.make_move, make_move)
+            self.play()
+        self.assertIsNone(active())
+        self.assertIs(KubaGame.make_move, make_move)
+        self.assertIs(Board.update_board, update_board)
+
+        self.assertEqual(stats.stats['KubaGame.make_move'].calls, 3)
+        self.assertEqual(stats.stats['Board.update_board'].calls, 3)
+        self.assertGreater(stats.stats['KubaGame.update_ko_rule'].calls, 0)
+        make_move_stats = stats.stats['KubaGame.make_move']
+        self.assertLessEqual(make_move_stats.percentile(50), make_move_stats.max_seconds)
+        self.assertGreater(make_move_stats.seconds, 0)
+        self.assertIn('KubaGame.make_move', stats.report())
+
+        # Counting stops with the block
+        self.play()
+        self.assertEqual(stats.stats['KubaGame.make_move'].calls, 3)
+        stats.reset()
+        self.assertEqual(stats.stats['KubaGame.make_move'].calls, 0)
+
+    def testPrometheus(self):
+        with instrumented() as stats:
+            self.play()
+        text = stats.prometheus()
+        self.assertIn('# TYPE kuba_method_calls_total counter', text)
+        self.assertIn('kuba_method_calls_total{method="KubaGame.make_move"} 3\n', text)
+        self.assertIn('kuba_method_seconds_count{method="KubaGame.make_move"} 3\n', text)
+        self.assertIn('kuba_method_seconds{method="KubaGame.make_move",quantile="0.99"}', text)
+        self.assertNotIn('retained', text)
+
+    def testMemory(self):
+        with instrumented(memory=True) as stats:
+            self.assertTrue(tracemalloc.is_tracing())
+            KubaGame(('PlayerA', 'W'), ('PlayerB', 'B'), board_type=Board)
+            self.play()
+        self.assertFalse(tracemalloc.is_tracing())
+        self.assertGreater(sum(method.retained for method in stats.stats.values()), 0)
+        self.assertIn('retained KiB', stats.report())
+        self.assertIn('kuba_method_retained_bytes_total', stats.prometheus())
+
+    def testRetainedBytes(self):
+        class Holder:
+            def keep(self):
+                self.kept = bytearray(100000)
+
+            def churn(self):
+                return len(bytearray(100000))
+
+        holder = Holder()
+        with Instrumentation(memory=True, targets={Holder: ('keep', 'churn')}) as stats:
+            holder.churn()
+            holder.keep()
+        self.assertLess(stats.stats['Holder.churn'].retained, 10000)
+        self.assertGreaterEqual(stats.stats['Holder.keep'].retained, 100000)
+
+    def testOneAtATime(self):
+        with instrumented():
+            self.assertRaises(RuntimeError, Instrumentation().enable)
+        Instrumentation().enable().disable()
+
+    def testEnvironment(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'metrics.prom')
+            env = dict(os.environ, KUBA_INSTRUMENT='1', KUBA_INSTRUMENT_OUTPUT=output)
+            script = ('import instrument\n'
+                      'from KubaGame import KubaGame\n'
+                      'instrument.enable_from_environment()\n'
+                      'game = KubaGame(("PlayerA", "W"), ("PlayerB", "B"))\n'
+                      'game.make_move("PlayerA", (6, 5), "F")\n')
+            subprocess.run([sys.executable, '-c', script], env=env, check=True,
+                           cwd=os.path.dirname(os.path.abspath(__file__)))
+            with open(output) as file:
+                self.assertIn('kuba_method_calls_total{method="KubaGame.make_move"} 1\n', file.read())
+
+    def testWorkerReports(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'metrics{pid}.prom')
+            env = dict(os.environ, KUBA_INSTRUMENT='1', KUBA_INSTRUMENT_OUTPUT=output)
+            result = subprocess.run([sys.executable, 'simulate.py', '--games', '4', '--workers', '2'], env=env,
+                                    check=True, capture_output=True, text=True,
+                                    cwd=os.path.dirname(os.path.abspath(__file__)))
+            moves = int(result.stdout.splitlines()[-2].split(', ')[-1].split()[0])
+            calls = 0
+            for name in os.listdir(directory):
+                with open(os.path.join(directory, name)) as file:
+                    for line in file:
+                        if line.startswith('kuba_method_calls_total{method="KubaGame.make_move"}'):
+                            calls += int(line.split()[-1])
+            self.assertGreaterEqual(len(os.listdir(directory)), 2)
+            self.assertEqual(calls, moves)
+
+if __name__ == '__main__':
+    unittest.main(exit=False)
@@ -2,7 +2,8 @@
 # Date: 5/29/2021
 # Description: Implementation of the Kuba game.
 
-import copy
+import functools
+import random
 
 class Player:
     """ Represents a player. This class contains the player name, color, how many marbles are left, turn status, and how many red marbles are captured.
@@ -11,7 +12,9 @@ class Player:
         the available moves for the player.
     """
 
-    def __init__(self, name, color):
+    __slots__ = ('_name', '_color', '_is_turn', '_red_captured', '_marbles_left')
+
+    def __init__(self, name, color, marbles=8):
         """
         Initializes a player with name and color.
 
@@ -24,12 +27,13 @@ class Player:
 
         :param name: Player name
         :param color: Player color
+        :param marbles: number of marbles the player starts with
         """
         self._name = name
         self._color = color
         self._is_turn = None
         self._red_captured = 0
-        self._marbles_left = 8
+        self._marbles_left = marbles
 
     @property
     def name(self):
@@ -64,6 +68,11 @@ class Player:
         """
         return self._marbles_left
 
+    @marbles_left.setter
+    def marbles_left(self, marbles):
+        """ Marbles left setter """
+        self._marbles_left = marbles
+
     @property
     def red_captured(self):
         """ Number of captured red marbles property
@@ -71,6 +80,11 @@ class Player:
         """
         return self._red_captured
 
+    @red_captured.setter
+    def red_captured(self, captured):
+        """ Captured red marbles setter """
+        self._red_captured = captured
+
     def update_marbles_left(self):
         """ Subtracts one from the total number or marbles on the board """
         self._marbles_left -= 1
@@ -82,36 +96,12 @@ class Player:
     def available_moves(self, board, ko_rule):
         """
         Determines moves a player has available
-        :param board: KubaGame.Board
+        :param board: KubaGame.Board or KubaGame.BitBoard
         :ko_rule: the current Ko Rule
         :return: list of valid moves as tuple (row, col)
         """
 
-        board = board.board
-        available_moves = list()
-        for row in range(len(board)):
-            for col in range(len(board[row])):
-                if board[row][col] is not None and board[row][col].color == self.color:
-                    if row < 6:
-                        if board[row + 1][col] is None:
-                            available_moves.append(((row, col), 'F'))
-                    if row > 0:
-                        if board[row - 1][col] is None:
-                            available_moves.append(((row, col), 'B'))
-                    if col < 6:
-                        if board[row][col + 1] is None:
-                            available_moves.append(((row, col), 'L'))
-                    if col > 0:
-                        if board[row][col - 1] is None:
-                            available_moves.append(((row, col), 'R'))
-                    if col == 6:
-                        available_moves.append(((row, col), 'L'))
-                    if row == 6:
-                        available_moves.append(((row, col), 'F'))
-                    if col == 0:
-                        available_moves.append(((row, col), 'R'))
-                    if row == 0:
-                        available_moves.append(((row, col), 'B'))
+        available_moves = board.available_moves(self.color)
 
         if ko_rule in available_moves:
             available_moves.remove(ko_rule)
@@ -122,9 +112,11 @@ class Marble:
     """ Represents a marble. Communicates with the KubaGame class to determine color.
 
         Attributes:
-            pos: the position of the marble (row, col) as a tuple
+            pos: the position of the marble (row, col) as a tuple, None for the marbles of SHARED_MARBLES
     """
 
+    __slots__ = ('_pos',)
+
     def __init__(self, pos):
         """
         A marble
@@ -151,11 +143,13 @@ class WhiteMarble(Marble):
             color: the color of the marble
     """
 
+    __slots__ = ()
+    _color = 'W'
+    _rgb = (255, 255, 255)
+
     def __init__(self, pos):
         """ Inits a white marble """
         super().__init__(pos)
-        self._color = 'W'
-        self._rgb = (255, 255, 255)
 
     @property
     def color(self):
@@ -178,11 +172,13 @@ class BlackMarble(Marble):
             color: the color of the marble
     """
 
+    __slots__ = ()
+    _color = 'B'
+    _rgb = (0, 0, 0)
+
     def __init__(self, pos):
         """ Inits a black marble """
         super().__init__(pos)
-        self._color = 'B'
-        self._rgb = (0, 0, 0)
 
     @property
     def color(self):
@@ -202,11 +198,13 @@ class RedMarble(Marble):
             color: the color of the marble
     """
 
+    __slots__ = ()
+    _color = 'R'
+    _rgb = (255, 0, 0)
+
     def __init__(self, pos):
         """ Inits a red marble """
         super().__init__(pos)
-        self._color = 'R'
-        self._rgb = (255, 0, 0)
 
     @property
     def color(self):
@@ -219,29 +217,165 @@ class RedMarble(Marble):
         """
         return self._rgb
 
+MARBLE_TYPES = {'W': WhiteMarble, 'B': BlackMarble, 'R': RedMarble}
+
+# One marble per color shared by every square of that color, used by CompactBoard. Their position is the square they
+# are in, so pos is None and boards using them never set it.
+SHARED_MARBLES = {color: marble_type(None) for color, marble_type in MARBLE_TYPES.items()}
+
+# Zobrist keys for hashing positions, generated from a fixed seed so hashes are the same in every process
+_zobrist_random = random.Random(0x4B756261)
+ZOBRIST_CELLS = {color: [_zobrist_random.getrandbits(64) for _ in range(49)] for color in 'WBR'}
+ZOBRIST_TURN = {color: _zobrist_random.getrandbits(64) for color in 'WB'}
+ZOBRIST_KO = {((row, col), dir): _zobrist_random.getrandbits(64)
+              for row in range(7) for col in range(7) for dir in 'FBLR'}
+
+_DIR_STEPS = {'R': (0, 1), 'L': (0, -1), 'B': (1, 0), 'F': (-1, 0)}
+_OPPOSITE_DIRS = {'R': 'L', 'L': 'R', 'B': 'F', 'F': 'B'}
+
+
+class Geometry:
+    """ Represents the shape of a board of one size and the tables derived from it, shared by every board of that
+        size. The standard game is 7x7. Larger boards keep its layout: square blocks of white and black marbles in the
+        corners, a diamond of red marbles in the middle, and a player wins by capturing more than half of the reds.
+
+        Attributes:
+            size: number of rows and columns, odd and at least 5
+            corner: side of the blocks of marbles in the corners
+            marbles: number of marbles of each player
+            reds: number of red marbles
+            win_reds: number of red marbles a player has to capture to win
+            coords: (row, col) of each cell index row * size + col
+            rays: squares from every cell to the edge in each push direction, the cell itself first, by cell index
+                  and direction. Pushes, chain lengths, the ko rule and move previews walk these lines instead of
+                  stepping and bounds checking square by square
+            ray_bits: the same lines as bit masks for the bit boards
+            cell_moves: every possible tuple of cell moves by cell index and a bit set of the pushable directions
+                        (F 1, B 2, L 4, R 8). The move caches hold these shared tuples instead of building new ones
+            full, first_row, last_row, first_col, last_col: bit masks of the board and of its edges
+            edges: bit mask of the squares on any edge
+            lines: bit masks of every row, then every column
+            zobrist_cells, zobrist_ko: Zobrist keys of the marbles on each cell and of the ko rule moves
+    """
+
+    __slots__ = ('size', 'corner', 'marbles', 'reds', 'win_reds', 'coords', 'rays', 'ray_bits', 'cell_moves', 'full',
+                 'first_row', 'last_row', 'first_col', 'last_col', 'edges', 'lines', 'zobrist_cells', 'zobrist_ko',
+                 '_red_radius')
+
+    def __init__(self, size):
+        """
+        Builds the tables of a board size
+
+        :param size: number of rows and columns
+        """
+        if size < 5 or size % 2 == 0:
+            raise ValueError('board size must be odd and at least 5, got {}'.format(size))
+        self.size = size
+        self.corner = (size + 3) // 4
+        self._red_radius = size // 2 - 1
+        self.marbles = 2 * self.corner * self.corner
+        self.reds = 2 * self._red_radius * (self._red_radius + 1) + 1
+        self.win_reds = self.reds // 2 + 1
+
+        cells = size * size
+        self.coords = [divmod(i, size) for i in range(cells)]
+        self.rays = [{dir: tuple((row + i * d_row, col + i * d_col) for i in range(size)
+                                 if 0 <= row + i * d_row < size and 0 <= col + i * d_col < size)
+                      for dir, (d_row, d_col) in _DIR_STEPS.items()}
+                     for row, col in self.coords]
+        self.ray_bits = [{dir: tuple(1 << (row * size + col) for row, col in ray) for dir, ray in rays.items()}
+                         for rays in self.rays]
+        self.cell_moves = [[tuple(((row, col), dir) for bit, dir in ((1, 'F'), (2, 'B'), (4, 'L'), (8, 'R'))
+                                  if flags & bit)
+                            for flags in range(16)]
+                           for row, col in self.coords]
+
+        self.full = (1 << cells) - 1
+        self.first_row = (1 << size) - 1
+        self.last_row = self.first_row << (cells - size)
+        self.first_col = sum(1 << (row * size) for row in range(size))
+        self.last_col = self.first_col << (size - 1)
+        self.edges = self.first_row | self.last_row | self.first_col | self.last_col
+        self.lines = (tuple(self.first_row << (row * size) for row in range(size)) +
+                      tuple(self.first_col << col for col in range(size)))
+
+        if size == 7:
+            self.zobrist_cells = ZOBRIST_CELLS
+            self.zobrist_ko = ZOBRIST_KO
+        else:
+            zobrist_random = random.Random('kuba-{}'.format(size))
+            self.zobrist_cells = {color: [zobrist_random.getrandbits(64) for _ in range(cells)] for color in 'WBR'}
+            self.zobrist_ko = {(coord, dir): zobrist_random.getrandbits(64) for coord in self.coords for dir in 'FBLR'}
+
+    def layout(self):
+        """
+        Builds the starting board
+
+        :return: 2D array of marbles
+        """
+        size = self.size
+        center = size // 2
+        low, high = self.corner, size - self.corner
+        board = [[None] * size for _ in range(size)]
+        for row in range(size):
+            for col in range(size):
+                if (row < low and col < low) or (row >= high and col >= high):
+                    board[row][col] = WhiteMarble((row, col))
+                elif (row < low and col >= high) or (row >= high and col < low):
+                    board[row][col] = BlackMarble((row, col))
+                elif abs(row - center) + abs(col - center) <= self._red_radius:
+                    board[row][col] = RedMarble((row, col))
+        return board
+
+
+@functools.lru_cache(maxsize=None)
+def geometry(size=7):
+    """
+    Gets the shared Geometry of a board size
+
+    :param size: number of rows and columns
+    :return: Geometry
+    """
+    return Geometry(size)
+
+
+# Layout of KubaGame.snapshot: the white, black and red masks in 7 bytes each, the red marbles captured and the marbles
+# left of the white and the black player, the color to move and the ko rule move
+SNAPSHOT_SIZE = 27
+_SNAPSHOT_DIRS = 'FBLR'
+_SNAPSHOT_TURNS = (None, 'W', 'B')
+_SNAPSHOT_NO_KO = 255
+
 class Board:
     """ Represents a Kuba board.
 
         Attributes:
-            board: 2D array representation of a 7x7 game board
+            board: 2D array representation of the game board, 7x7 unless another size is given
+            size: number of rows and columns
+            geometry: Geometry of the board size
+            zobrist: Zobrist hash of the marbles on the board
     """
 
-    def __init__(self, board=None):
+    __slots__ = ('_debug', '_geometry', '_board', '_moves', '_move_counts', '_zobrist')
+
+    _STEPS = _DIR_STEPS
+
+    def __init__(self, board=None, debug=False, size=7):
         """ Initializes a board with marbles in the correct starting location
 
+            The available moves of the white and black marbles are cached per cell and refreshed around the line
+            changed by each push. Changes made directly to the cells of the board array are not seen by the cache,
+            assign a new 2D array to the board property instead.
+
             :param board: optional 2D array starting board. Should be used for testing board conditions
+            :param debug: if True every read of the move cache is checked against a full rescan of the board
+            :param size: number of rows and columns of the starting board, ignored if board is given
         """
+        self._debug = debug
+        self._geometry = geometry(size if board is None else len(board))
         if board is None:
-            self._board = [
-                [WhiteMarble((0, 0)), WhiteMarble((0, 1)), None, None, None, BlackMarble((0, 5)), BlackMarble((0, 6))],
-                [WhiteMarble((1, 0)), WhiteMarble((1, 1)), None, RedMarble((1, 3)), None, BlackMarble((1, 5)), BlackMarble((1, 6))],
-                [None, None, RedMarble((2, 2)), RedMarble((2, 3)), RedMarble((2, 4)), None, None],
-                [None, RedMarble((3, 1)), RedMarble((3, 2)), RedMarble((3, 3)), RedMarble((3, 4)), RedMarble((3, 5)), None],
-                [None, None, RedMarble((4, 2)), RedMarble((4, 3)), RedMarble((4, 4)), None, None],
-                [BlackMarble((5, 0)), BlackMarble((5, 1)), None, RedMarble((5, 3)), None, WhiteMarble((5, 5)), WhiteMarble((5, 6))],
-                [BlackMarble((6, 0)), BlackMarble((6, 1)), None, None, None, WhiteMarble((6, 5)), WhiteMarble((6, 6))]]
-        else:
-            self._board = board
+            board = self._geometry.layout()
+        self.board = board
 
     @property
     def board(self):
@@ -254,6 +388,157 @@ class Board:
     def board(self, update_board):
         """ The board setter """
         self._board = update_board
+        self._rebuild_moves()
+        self._rebuild_zobrist()
+
+    @property
+    def zobrist(self):
+        """ Zobrist hash of the marbles on the board, kept up to date by update_board and revert_board
+            :return self._zobrist
+        """
+        return self._zobrist
+
+    @property
+    def geometry(self):
+        """ Geometry property
+            :return self._geometry
+        """
+        return self._geometry
+
+    @property
+    def size(self):
+        """ Size property
+            :return number of rows and columns
+        """
+        return self._geometry.size
+
+    @property
+    def masks(self):
+        """ Masks property, cell (row, col) is bit row * size + col
+            :return dictionary of the bit mask of each marble color
+        """
+        size = self._geometry.size
+        masks = {'W': 0, 'B': 0, 'R': 0}
+        for row in range(size):
+            for col in range(size):
+                marble = self._board[row][col]
+                if marble is not None:
+                    masks[marble.color] |= 1 << (row * size + col)
+        return masks
+
+    @property
+    def debug(self):
+        """ Debug property
+            :return self._debug
+        """
+        return self._debug
+
+    @debug.setter
+    def debug(self, debug):
+        """ Debug setter """
+        self._debug = debug
+
+    def get_color(self, coord):
+        """
+        Gets the color of the marble at a coordinate
+
+        :param coord: coordinate on the board
+        :return: 'W', 'B', 'R' or None if the square is empty
+        """
+        marble = self._board[coord[0]][coord[1]]
+        if marble is None:
+            return None
+        return marble.color
+
+    def available_moves(self, color):
+        """
+        Gets the moves available to the marbles of one color from the move cache. The Ko rule is applied by
+        Player.available_moves.
+
+        :param color: marble color
+        :return: list of moves as tuple ((row, col), dir)
+        """
+        cells = self._moves.get(color)
+        if cells is None:
+            return self.scan_moves(color)
+
+        available_moves = [move for coord in sorted(cells) for move in cells[coord]]
+
+        if self._debug:
+            scanned = self.scan_moves(color)
+            if available_moves != scanned:
+                raise MoveCacheError(color, available_moves, scanned)
+
+        return available_moves
+
+    def has_moves(self, color, ko_rule):
+        """
+        Determines if the marbles of one color have any move left without building the move list. Reads the cached
+        move count, so it takes constant time.
+
+        :param color: marble color
+        :param ko_rule: the current Ko Rule
+        :return: True if there is at least one available move
+        """
+        count = self._move_counts.get(color)
+        if count is None:
+            return any(move != ko_rule for move in self.scan_moves(color))
+
+        if ko_rule is not None and ko_rule in self._moves[color].get(ko_rule[0], ()):
+            count -= 1
+
+        if self._debug:
+            scanned = len([move for move in self.scan_moves(color) if move != ko_rule])
+            if count != scanned:
+                raise MoveCacheError(color, count, scanned)
+
+        return count > 0
+
+    def scan_moves(self, color):
+        """
+        Determines the moves available to the marbles of one color by scanning the whole board.
+
+        :param color: marble color
+        :return: list of moves as tuple ((row, col), dir)
+        """
+        board = self._board
+        last = len(board) - 1
+        available_moves = list()
+        for row in range(len(board)):
+            for col in range(len(board[row])):
+                if board[row][col] is not None and board[row][col].color == color:
+                    # A marble can be pushed if the square behind it is empty or it is on the edge
+                    if row == last or board[row + 1][col] is None:
+                        available_moves.append(((row, col), 'F'))
+                    if row == 0 or board[row - 1][col] is None:
+                        available_moves.append(((row, col), 'B'))
+                    if col == last or board[row][col + 1] is None:
+                        available_moves.append(((row, col), 'L'))
+                    if col == 0 or board[row][col - 1] is None:
+                        available_moves.append(((row, col), 'R'))
+
+        return available_moves
+
+    def cell_moves(self, coord):
+        """
+        Determines the moves available to the marble at a coordinate.
+
+        :param coord: coordinate on the board
+        :return: tuple of moves as tuple ((row, col), dir)
+        """
+        row, col = coord
+        size = self._geometry.size
+        flags = 0
+        # A marble can be pushed if the square behind it is empty or it is on the edge
+        if row == size - 1 or self.get_color((row + 1, col)) is None:
+            flags |= 1
+        if row == 0 or self.get_color((row - 1, col)) is None:
+            flags |= 2
+        if col == size - 1 or self.get_color((row, col + 1)) is None:
+            flags |= 4
+        if col == 0 or self.get_color((row, col - 1)) is None:
+            flags |= 8
+        return self._geometry.cell_moves[row * size + col][flags]
 
     def update_board(self, coord, dir):
         """
@@ -263,88 +548,205 @@ class Board:
         :param dir: direction the coordinate will be 'pushed'
         :return: pushed_off - None or the marble pushed off the board
         """
+        length = self.chain_length(coord, dir)
+        self._zobrist ^= self._line_zobrist(coord, dir, length)
+        pushed_off = self._push(coord, dir)
+        self._zobrist ^= self._line_zobrist(coord, dir, length)
+        self._update_moves(coord, dir, length)
+        return pushed_off
+
+    def _push(self, coord, dir):
+        """
+        Moves the marbles of the chain one square in the push direction.
 
+        :param coord: coordinate on the board that is being played
+        :param dir: direction the coordinate will be 'pushed'
+        :return: pushed_off - None or the marble pushed off the board
+        """
+        board = self._board
+        geometry = self._geometry
+        ray = geometry.rays[coord[0] * geometry.size + coord[1]][dir]
+        length = 0
+        while length < len(ray) and board[ray[length][0]][ray[length][1]] is not None:
+            length += 1
+
+        # If the chain reaches the edge the last marble is pushed off
         pushed_off = None
+        if length == len(ray):
+            row, col = ray[-1]
+            pushed_off = board[row][col]
+            board[row][col] = None
+            length -= 1
+
+        # Move the rest of the chain one square along the line, starting from the far end
+        for i in range(length - 1, -1, -1):
+            row, col = ray[i]
+            marble = board[row][col]
+            marble.pos = ray[i + 1]
+            board[marble.pos[0]][marble.pos[1]] = marble
+
+        board[coord[0]][coord[1]] = None
+        return pushed_off
+
+    def chain_length(self, coord, dir):
+        """
+        Counts the marbles in the chain that a push from coord moves, up to the first empty square or the edge.
 
-        if dir == 'R':
-            # To iterate through column
-            col = coord[1]
-            marbles = []
-            # Create a list of the marbles in the chain being pushed
-            while col < len(self.board[0]) and self.board[coord[0]][col] is not None:
-                marbles.append(self.board[coord[0]][col])
-                col += 1
-
-            # Update position of marbles and pop final marble in marbles since it will be pushed off if already at
-            # the board edge
-            for marble in marbles:
-                if marble.pos[1] == 6:
-                    pushed_off = marbles.pop()
-                else:
-                    marble.pos = marble.pos[0], marble.pos[1] + 1
-
-            # Update the board with new marble positions
-            for marble in marbles:
-                self.board[coord[0]][marble.pos[1]] = marble
-
-            # Set the pushed space to None
-            self.board[coord[0]][coord[1]] = None
-            return pushed_off
-
-        if dir == 'L':
-            col = coord[1]
-            marbles = []
-            while col >= 0 and self.board[coord[0]][col] is not None:
-                marbles.append(self.board[coord[0]][col])
-                col -= 1
-            for marble in marbles:
-                if marble.pos[1] == 0:
-                    pushed_off = marbles.pop()
-                else:
-                    marble.pos = marble.pos[0], marble.pos[1] - 1
+        :param coord: coordinate on the board that is being played
+        :param dir: direction the coordinate will be 'pushed'
+        :return: number of marbles in the chain
+        """
+        return self.trace_push(coord, dir)[0]
 
-            for marble in marbles:
-                self.board[coord[0]][marble.pos[1]] = marble
+    def trace_push(self, coord, dir):
+        """
+        Follows the line of a push without changing the board.
 
-            self.board[coord[0]][coord[1]] = None
-            return pushed_off
+        :param coord: coordinate on the board that is being played
+        :param dir: direction the coordinate will be 'pushed'
+        :return: tuple (number of marbles in the chain, color of the marble pushed off or None, square the chain ends
+                 on or None if a marble is pushed off)
+        """
+        board = self._board
+        geometry = self._geometry
+        ray = geometry.rays[coord[0] * geometry.size + coord[1]][dir]
+        for length, (row, col) in enumerate(ray):
+            if board[row][col] is None:
+                return length, None, (row, col)
+        row, col = ray[-1]
+        return len(ray), board[row][col].color, None
+
+    def revert_board(self, coord, dir, length, pushed_off):
+        """
+        Reverts a push made by update_board.
 
-        if dir == 'B':
-            row = coord[0]
-            marbles = []
-            while row < len(self.board[0]) and self.board[row][coord[1]] is not None:
-                marbles.append(self.board[row][coord[1]])
-                row += 1
+        :param coord: coordinate on the board that was played
+        :param dir: direction the coordinate was 'pushed'
+        :param length: chain_length of the push, taken before update_board
+        :param pushed_off: None or the marble update_board pushed off the board
+        """
+        self._zobrist ^= self._line_zobrist(coord, dir, length)
+        self._revert(coord, dir, length, pushed_off)
+        self._zobrist ^= self._line_zobrist(coord, dir, length)
+        self._update_moves(coord, dir, length)
 
-            for marble in marbles:
-                if marble.pos[0] == 6:
-                    pushed_off = marbles.pop()
-                else:
-                    marble.pos = marble.pos[0] + 1, marble.pos[1]
-
-            for marble in marbles:
-                self.board[marble.pos[0]][coord[1]] = marble
-
-            self.board[coord[0]][coord[1]] = None
-            return pushed_off
-
-        if dir == 'F':
-            row = coord[0]
-            marbles = []
-            while row >= 0 and self.board[row][coord[1]] is not None:
-                marbles.append(self.board[row][coord[1]])
-                row -= 1
-            for marble in marbles:
-                if marble.pos[0] == 0:
-                    pushed_off = marbles.pop()
-                else:
-                    marble.pos = marble.pos[0] - 1, marble.pos[1]
+    def _revert(self, coord, dir, length, pushed_off):
+        """
+        Moves the marbles of a pushed chain back and puts the pushed off marble back on the board.
 
-            for marble in marbles:
-                self.board[marble.pos[0]][coord[1]] = marble
+        :param coord: coordinate on the board that was played
+        :param dir: direction the coordinate was 'pushed'
+        :param length: chain_length of the push
+        :param pushed_off: None or the marble that was pushed off the board
+        """
+        geometry = self._geometry
+        ray = geometry.rays[coord[0] * geometry.size + coord[1]][dir]
+        # Marbles of the chain that are still on the board sit one square further in the push direction
+        count = length - 1 if pushed_off is not None else length
+        for i in range(1, count + 1):
+            marble = self._board[ray[i][0]][ray[i][1]]
+            marble.pos = ray[i - 1]
+            self._board[marble.pos[0]][marble.pos[1]] = marble
+
+        # The last square of the chain either gets the pushed off marble back or becomes empty again
+        last = ray[count]
+        if pushed_off is not None:
+            pushed_off.pos = last
+        self._board[last[0]][last[1]] = pushed_off
+
+    def _rebuild_zobrist(self):
+        """ Computes the Zobrist hash of the whole board """
+        size = self._geometry.size
+        keys = self._geometry.zobrist_cells
+        self._zobrist = 0
+        for row in range(size):
+            for col in range(size):
+                color = self.get_color((row, col))
+                if color is not None:
+                    self._zobrist ^= keys[color][row * size + col]
+
+    def zobrist_after(self, coord, dir):
+        """
+        Computes the Zobrist hash the board would have after a push, without changing the board. Only the squares of
+        the chain are hashed.
+
+        :param coord: coordinate on the board that would be played
+        :param dir: direction of the push
+        :return: Zobrist hash of the marbles after the push
+        """
+        geometry = self._geometry
+        size = geometry.size
+        keys = geometry.zobrist_cells
+        ray = geometry.rays[coord[0] * size + coord[1]][dir]
+        zobrist = self._zobrist
+        for i in range(self.chain_length(coord, dir)):
+            row, col = ray[i]
+            color = self.get_color((row, col))
+            zobrist ^= keys[color][row * size + col]
+            # Every marble of the chain moves one square along the line, the last one may fall off the edge
+            if i + 1 < len(ray):
+                row, col = ray[i + 1]
+                zobrist ^= keys[color][row * size + col]
+        return zobrist
+
+    def _line_zobrist(self, coord, dir, length):
+        """
+        Computes the Zobrist hash of the squares a push changes. Hashing the line before and after the push and
+        xoring both into the board hash updates it without rehashing the whole board.
+
+        :param coord: coordinate on the board that is played
+        :param dir: direction of the push
+        :param length: chain_length of the push
+        :return: Zobrist hash of the line
+        """
+        geometry = self._geometry
+        size = geometry.size
+        zobrist = 0
+        for row, col in geometry.rays[coord[0] * size + coord[1]][dir][:length + 1]:
+            color = self.get_color((row, col))
+            if color is not None:
+                zobrist ^= geometry.zobrist_cells[color][row * size + col]
+        return zobrist
+
+    def _rebuild_moves(self):
+        """ Fills the move cache of the white and black marbles from the whole board """
+        self._moves = {'W': {}, 'B': {}}
+        self._move_counts = {'W': 0, 'B': 0}
+        for coord in self._geometry.coords:
+            self._refresh_cell(coord)
+
+    def _update_moves(self, coord, dir, length):
+        """
+        Refreshes the move cache after a push. A move depends on the marble and on the square behind it, so only the
+        squares of the pushed line and their neighbours can change.
 
-            self.board[coord[0]][coord[1]] = None
-            return pushed_off
+        :param coord: coordinate on the board that was played
+        :param dir: direction of the push
+        :param length: chain_length of the push
+        """
+        size = self._geometry.size
+        cells = set()
+        for row, col in self._geometry.rays[coord[0] * size + coord[1]][dir][:length + 1]:
+            cells.update(((row, col), (row + 1, col), (row - 1, col), (row, col + 1), (row, col - 1)))
+
+        for row, col in cells:
+            if 0 <= row < size and 0 <= col < size:
+                self._refresh_cell((row, col))
+
+    def _refresh_cell(self, coord):
+        """
+        Recomputes the cached moves of one square.
+
+        :param coord: coordinate on the board
+        """
+        for color, cells in self._moves.items():
+            self._move_counts[color] -= len(cells.pop(coord, ()))
+        color = self.get_color(coord)
+        if color in self._moves:
+            moves = self.cell_moves(coord)
+            if moves:
+                self._moves[color][coord] = moves
+                self._move_counts[color] += len(moves)
 
     def print_board(self):
         """ Prints the current state of the board as text """
@@ -357,6 +759,302 @@ class Board:
                     print(j.color, end=' ', )
             print()
 
+class BitBoard(Board):
+    """ Represents a Kuba board as one integer mask per marble color. Cell (row, col) is bit row * size + col.
+        Pushes shift bits instead of moving Marble objects, so no objects are created while playing.
+
+        Attributes:
+            board: 2D array compatibility view of the masks. The view is rebuilt after each update and changes made to
+                   it are not written back, assign a new 2D array to the board property instead.
+            masks: dictionary of the bit mask of each marble color
+    """
+
+    __slots__ = ('_masks', '_view')
+
+    def __init__(self, board=None, debug=False, size=7):
+        """ Initializes a board with marbles in the correct starting location
+
+            :param board: optional 2D array starting board. Should be used for testing board conditions
+            :param debug: if True every read of the move cache is checked against a full rescan of the board
+            :param size: number of rows and columns of the starting board, ignored if board is given
+        """
+        self._masks = {'W': 0, 'B': 0, 'R': 0}
+        self._view = None
+        super().__init__(board, debug, size)
+
+    @property
+    def board(self):
+        """ The board property
+            :return 2D array of marbles built from the masks
+        """
+        if self._view is None:
+            size = self._geometry.size
+            coords = self._geometry.coords
+            view = [[None] * size for _ in range(size)]
+            for color, mask in self._masks.items():
+                while mask:
+                    low = mask & -mask
+                    row, col = coords[low.bit_length() - 1]
+                    view[row][col] = self._marble(color, (row, col))
+                    mask ^= low
+            self._view = view
+        return self._view
+
+    @board.setter
+    def board(self, update_board):
+        """ The board setter, converts a 2D array of marbles to masks """
+        size = self._geometry.size
+        masks = {'W': 0, 'B': 0, 'R': 0}
+        for row in range(size):
+            for col in range(size):
+                if update_board[row][col] is not None:
+                    masks[update_board[row][col].color] |= 1 << (row * size + col)
+        self._masks = masks
+        self._view = None
+        self._rebuild_moves()
+        self._rebuild_zobrist()
+
+    def _marble(self, color, coord):
+        """
+        Creates the marble object of a square for the board view and for pushed off marbles
+
+        :param color: marble color
+        :param coord: coordinate of the marble
+        :return: Marble
+        """
+        return MARBLE_TYPES[color](coord)
+
+    @property
+    def masks(self):
+        """ Masks property
+            :return self._masks
+        """
+        return self._masks
+
+    def get_color(self, coord):
+        """
+        Gets the color of the marble at a coordinate
+
+        :param coord: coordinate on the board
+        :return: 'W', 'B', 'R' or None if the square is empty
+        """
+        bit = 1 << (coord[0] * self._geometry.size + coord[1])
+        for color, mask in self._masks.items():
+            if mask & bit:
+                return color
+        return None
+
+    def scan_moves(self, color):
+        """
+        Determines the moves available to the marbles of one color by scanning the whole board.
+
+        :param color: marble color
+        :return: list of moves as tuple ((row, col), dir)
+        """
+        geometry = self._geometry
+        size = geometry.size
+        masks = self._masks
+        mask = masks[color]
+        empty = geometry.full & ~(masks['W'] | masks['B'] | masks['R'])
+        # A marble can be pushed if the square behind it is empty or it is on the edge. Shifting the empty mask lines
+        # up the square behind each cell with the cell itself, wrapped bits only land on edge cells which are allowed
+        forward = mask & (geometry.last_row | (empty >> size))
+        backward = mask & (geometry.first_row | (empty << size))
+        left = mask & (geometry.last_col | (empty >> 1))
+        right = mask & (geometry.first_col | (empty << 1))
+
+        available_moves = list()
+        while mask:
+            low = mask & -mask
+            coord = geometry.coords[low.bit_length() - 1]
+            if forward & low:
+                available_moves.append((coord, 'F'))
+            if backward & low:
+                available_moves.append((coord, 'B'))
+            if left & low:
+                available_moves.append((coord, 'L'))
+            if right & low:
+                available_moves.append((coord, 'R'))
+            mask ^= low
+
+        return available_moves
+
+    def cell_moves(self, coord):
+        """
+        Determines the moves available to the marble at a coordinate.
+
+        :param coord: coordinate on the board
+        :return: tuple of moves as tuple ((row, col), dir)
+        """
+        masks = self._masks
+        occupied = masks['W'] | masks['B'] | masks['R']
+        size = self._geometry.size
+        row, col = coord
+        i = row * size + col
+        flags = 0
+        if row == size - 1 or not occupied >> (i + size) & 1:
+            flags |= 1
+        if row == 0 or not occupied >> (i - size) & 1:
+            flags |= 2
+        if col == size - 1 or not occupied >> (i + 1) & 1:
+            flags |= 4
+        if col == 0 or not occupied >> (i - 1) & 1:
+            flags |= 8
+        return self._geometry.cell_moves[i][flags]
+
+    def trace_push(self, coord, dir):
+        """
+        Follows the line of a push without changing the board.
+
+        :param coord: coordinate on the board that is being played
+        :param dir: direction the coordinate will be 'pushed'
+        :return: tuple (number of marbles in the chain, color of the marble pushed off or None, square the chain ends
+                 on or None if a marble is pushed off)
+        """
+        geometry = self._geometry
+        masks = self._masks
+        occupied = masks['W'] | masks['B'] | masks['R']
+        index = coord[0] * geometry.size + coord[1]
+        bits = geometry.ray_bits[index][dir]
+        for length, bit in enumerate(bits):
+            if not occupied & bit:
+                return length, None, geometry.rays[index][dir][length]
+        last = bits[-1]
+        for color, mask in masks.items():
+            if mask & last:
+                return len(bits), color, None
+
+    def _update_moves(self, coord, dir, length):
+        """
+        Refreshes the move cache after a push. A move depends on the marble and on the square behind it, so only the
+        squares of the pushed line and their neighbours can change.
+
+        :param coord: coordinate on the board that was played
+        :param dir: direction of the push
+        :param length: chain_length of the push
+        """
+        geometry = self._geometry
+        size = geometry.size
+        line = 0
+        for bit in geometry.ray_bits[coord[0] * size + coord[1]][dir][:length + 1]:
+            line |= bit
+
+        cells = geometry.full & (line | line << size | line >> size | (line & ~geometry.last_col) << 1 |
+                                 (line & ~geometry.first_col) >> 1)
+        white = self._masks['W']
+        black = self._masks['B']
+        white_moves = self._moves['W']
+        black_moves = self._moves['B']
+        counts = self._move_counts
+        while cells:
+            low = cells & -cells
+            coord = geometry.coords[low.bit_length() - 1]
+            counts['W'] -= len(white_moves.pop(coord, ()))
+            counts['B'] -= len(black_moves.pop(coord, ()))
+            if (white | black) & low:
+                moves = self.cell_moves(coord)
+                if moves:
+                    if white & low:
+                        white_moves[coord] = moves
+                        counts['W'] += len(moves)
+                    else:
+                        black_moves[coord] = moves
+                        counts['B'] += len(moves)
+            cells ^= low
+
+    def _push(self, coord, dir):
+        """
+        Moves the marbles of the chain one square in the push direction.
+
+        :param coord: coordinate on the board that is being played
+        :param dir: direction the coordinate will be 'pushed'
+        :return: pushed_off - None or the marble pushed off the board
+        """
+
+        geometry = self._geometry
+        masks = self._masks
+        occupied = masks['W'] | masks['B'] | masks['R']
+        index = coord[0] * geometry.size + coord[1]
+        bits = geometry.ray_bits[index][dir]
+
+        # Collect the cells of the chain being pushed
+        chain = 0
+        length = 0
+        for bit in bits:
+            if not occupied & bit:
+                break
+            chain |= bit
+            length += 1
+
+        # If the chain reaches the edge the last marble is pushed off
+        pushed_off = None
+        if length == len(bits):
+            last = bits[-1]
+            color = self.get_color(geometry.rays[index][dir][-1])
+            pushed_off = self._marble(color, geometry.rays[index][dir][-1])
+            masks[color] ^= last
+            chain ^= last
+
+        # Shift the remaining chain one cell in the push direction
+        d_row, d_col = self._STEPS[dir]
+        shift = d_row * geometry.size + d_col
+        for color, mask in masks.items():
+            part = mask & chain
+            if part:
+                masks[color] = mask ^ part | (part << shift if shift > 0 else part >> -shift)
+
+        self._view = None
+        return pushed_off
+
+    def _revert(self, coord, dir, length, pushed_off):
+        """
+        Moves the marbles of a pushed chain back and puts the pushed off marble back on the board.
+
+        :param coord: coordinate on the board that was played
+        :param dir: direction the coordinate was 'pushed'
+        :param length: chain_length of the push
+        :param pushed_off: None or the marble that was pushed off the board
+        """
+        geometry = self._geometry
+        masks = self._masks
+        bits = geometry.ray_bits[coord[0] * geometry.size + coord[1]][dir]
+        d_row, d_col = self._STEPS[dir]
+
+        # Marbles of the chain that are still on the board sit one square further in the push direction
+        count = length - 1 if pushed_off is not None else length
+        chain = 0
+        for bit in bits[1:count + 1]:
+            chain |= bit
+
+        shift = d_row * geometry.size + d_col
+        for color, mask in masks.items():
+            part = mask & chain
+            if part:
+                masks[color] = mask ^ part | (part >> shift if shift > 0 else part << -shift)
+
+        if pushed_off is not None:
+            masks[pushed_off.color] |= bits[count]
+
+        self._view = None
+
+
+class CompactBoard(BitBoard):
+    """ Represents a Kuba board as bit masks like BitBoard, with the shared marbles of SHARED_MARBLES in the board view
+        instead of one Marble object per square. For holding many games in memory, the pos of the marbles in the
+        view is None and the position of a marble is the square it is in.
+    """
+
+    __slots__ = ()
+
+    def _marble(self, color, coord):
+        """
+        Gets the shared marble of a color
+
+        :param color: marble color
+        :param coord: unused, shared marbles have no position
+        :return: Marble from SHARED_MARBLES
+        """
+        return SHARED_MARBLES[color]
 
 class KubaGame:
     """ Class represents the game of Kuba
@@ -367,9 +1065,23 @@ class KubaGame:
             board: optional parameter to initialize the board for testing
             players: dictionary of the two players with the player name as a key
             ko_rule_move: the move that would return the game to the previous state
+            position_hash: 64 bit Zobrist hash of the marbles, the side to move and the ko rule move
+            move_log: list of the moves made, in order, as tuple ((row, col), dir)
+            version: number that changes whenever a move is applied or undone
+            winner: name of the winning player or None, kept up to date by every applied or undone move
+            history: dictionary of the number of times each position_hash has been reached since the game started
+                     or since the last marble was pushed off, as no earlier position can come back after that
+            superko: if True make_move refuses moves that recreate the marbles of any earlier position
+            repetition_limit: number of times a position can be reached before the game is drawn, None for no limit
+            move_limit: number of moves in the move log after which the game is drawn, None for no limit
+            draw: True while the game is drawn by repetition_limit or move_limit and has no winner
     """
 
-    def __init__(self, player_a, player_b, board=None):
+    __slots__ = ('_player_a', '_player_b', '_players', '_board', '_ko_rule_move', '_move_log', '_version', '_winner',
+                 '_history', '_boards', '_repetition_limit', '_move_limit', '_draw')
+
+    def __init__(self, player_a, player_b, board=None, board_type=Board, debug=False, size=7, superko=False,
+                 repetition_limit=None, move_limit=None):
         """
         Initializes the Kuba game with two players and the player marble color.
         Initializes the game board.
@@ -379,18 +1091,33 @@ class KubaGame:
         :param player_a: tuple (player name, marble color)
         :param player_b: tuple (player name, marble color)
         :param board: Optional 2D array starting board
+        :param board_type: Board for the list of marbles representation, BitBoard for the bit mask representation or
+                           CompactBoard for bit masks with shared marbles
+        :param debug: if True the cached available moves are checked against a full rescan on every read
+        :param size: number of rows and columns of the starting board, ignored if board is given. The number of
+                     marbles and of red marbles needed to win follow from it, see Geometry
+        :param superko: if True a move may not recreate the marbles of an earlier position (positional superko)
+        :param repetition_limit: the game is drawn when a position is reached this many times, None for no limit
+        :param move_limit: the game is drawn after this many moves, None for no limit
 
         ko_rule_move keeps track of which move is invalid per the Ko Rule
         """
 
-        self._player_a = Player(player_a[0], player_a[1])
-        self._player_b = Player(player_b[0], player_b[1])
+        self._board = board_type(board, debug, size)
+        marbles = self._board.geometry.marbles
+        self._player_a = Player(player_a[0], player_a[1], marbles)
+        self._player_b = Player(player_b[0], player_b[1], marbles)
         self._players = {player_a[0]: self._player_a, player_b[0]: self._player_b}
-        if board == None:
-            self._board = Board()
-        else:
-            self._board = Board(board)
         self._ko_rule_move = None
+        self._move_log = []
+        self._version = 0
+        self._winner = None
+        self._boards = {} if superko else None
+        self._repetition_limit = repetition_limit
+        self._move_limit = move_limit
+        self._draw = False
+        self.update_winner()
+        self.clear_history()
 
     @property
     def board(self):
@@ -420,6 +1147,20 @@ class KubaGame:
         """
         return self._players
 
+    @property
+    def move_log(self):
+        """ Move log property. Moves taken back with undo_move are removed from the log.
+            :return self._move_log
+        """
+        return self._move_log
+
+    @property
+    def version(self):
+        """ Version property, used by the display to skip frames when nothing changed
+            :return self._version
+        """
+        return self._version
+
     @property
     def ko_rule_move(self):
         """ Ko rule property
@@ -429,8 +1170,165 @@ class KubaGame:
 
     @ko_rule_move.setter
     def ko_rule_move(self, move):
-        """ Sets the ko rule """
+        """ Sets the ko rule and recomputes the winner, as the ko rule move can leave a player without moves """
         self._ko_rule_move = move
+        self.update_winner()
+
+    @property
+    def position_hash(self):
+        """ Position hash property. The board part is updated incrementally by the board, the side to move and the ko
+            rule move each add one key.
+            :return 64 bit Zobrist hash of the position
+        """
+        position_hash = self.board.zobrist
+        if self.player_a.is_turn:
+            position_hash ^= ZOBRIST_TURN[self.player_a.color]
+        elif self.player_b.is_turn:
+            position_hash ^= ZOBRIST_TURN[self.player_b.color]
+        if self.ko_rule_move is not None:
+            position_hash ^= self.board.geometry.zobrist_ko[self.ko_rule_move]
+        return position_hash
+
+    @property
+    def history(self):
+        """ History property
+            :return self._history
+        """
+        return self._history
+
+    @property
+    def superko(self):
+        """ Superko property
+            :return True if the positional superko rule is on
+        """
+        return self._boards is not None
+
+    @property
+    def repetition_limit(self):
+        """ Repetition limit property
+            :return self._repetition_limit
+        """
+        return self._repetition_limit
+
+    @property
+    def move_limit(self):
+        """ Move limit property
+            :return self._move_limit
+        """
+        return self._move_limit
+
+    @property
+    def draw(self):
+        """ Draw property
+            :return self._draw
+        """
+        return self._draw
+
+    def repetitions(self):
+        """
+        Counts how many times the current position has been reached, with a single dictionary lookup
+
+        :return: int, 1 the first time
+        """
+        return self._history.get(self.position_hash, 0)
+
+    def clear_history(self):
+        """
+        Starts the position history over from the current position. Called when the game is created and rebuilt from
+        a snapshot; call it after changing the players or the board directly.
+        """
+        self._history = {self.position_hash: 1}
+        if self._boards is not None:
+            self._boards = {self.board.zobrist: 1}
+        self.update_draw()
+
+    def update_draw(self):
+        """
+        Recomputes whether the game is drawn by the repetition or move limit. Called after every applied or undone
+        move.
+
+        :return: self._draw
+        """
+        self._draw = self._winner is None and (
+            (self._repetition_limit is not None and self.repetitions() >= self._repetition_limit) or
+            (self._move_limit is not None and len(self._move_log) >= self._move_limit))
+        return self._draw
+
+    def repeats_position(self, coord, dir):
+        """
+        Determines if a move is forbidden by the positional superko rule: it would put the marbles back as they were
+        in an earlier position of the game. Looks up the Zobrist hash of the board after the move in the history of
+        board hashes.
+
+        :param coord: Coordinates of the marble that would be moved.
+        :param dir: Direction that the marble would be moved.
+        :return: True if superko is on and the move recreates an earlier position
+        """
+        return self._boards is not None and self._board.zobrist_after(coord, dir) in self._boards
+
+    def snapshot(self):
+        """
+        Captures the position as an immutable value: the marbles, the counters and the turn of each color and the ko
+        rule move. Player names and the move log are not included, so equal positions of different games have equal
+        snapshots and snapshots can be used as dictionary keys.
+
+        :return: bytes of length SNAPSHOT_SIZE
+        """
+        if self.board.size != 7:
+            raise ValueError('snapshots are only defined for 7x7 boards')
+        masks = self.board.masks
+        counters = {player.color: player for player in (self.player_a, self.player_b)}
+        if self.player_a.is_turn:
+            turn = _SNAPSHOT_TURNS.index(self.player_a.color)
+        elif self.player_b.is_turn:
+            turn = _SNAPSHOT_TURNS.index(self.player_b.color)
+        else:
+            turn = 0
+        if self.ko_rule_move is None:
+            ko = _SNAPSHOT_NO_KO
+        else:
+            (row, col), dir = self.ko_rule_move
+            ko = (row * 7 + col) * 4 + _SNAPSHOT_DIRS.index(dir)
+        return (masks['W'].to_bytes(7, 'little') + masks['B'].to_bytes(7, 'little') +
+                masks['R'].to_bytes(7, 'little') +
+                bytes((counters['W'].red_captured, counters['W'].marbles_left, counters['B'].red_captured,
+                       counters['B'].marbles_left, turn, ko)))
+
+    @classmethod
+    def from_snapshot(cls, snapshot, player_a, player_b, board_type=Board, debug=False):
+        """
+        Rebuilds a game from a snapshot. The move log of the new game is empty.
+
+        :param snapshot: bytes from snapshot
+        :param player_a: tuple (player name, marble color)
+        :param player_b: tuple (player name, marble color)
+        :param board_type: Board, BitBoard or CompactBoard
+        :param debug: if True the cached available moves are checked against a full rescan on every read
+        :return: KubaGame
+        """
+        if len(snapshot) != SNAPSHOT_SIZE:
+            raise ValueError('snapshot must be {} bytes, got {}'.format(SNAPSHOT_SIZE, len(snapshot)))
+
+        board = [[None] * 7 for _ in range(7)]
+        for offset, color in ((0, 'W'), (7, 'B'), (14, 'R')):
+            mask = int.from_bytes(snapshot[offset:offset + 7], 'little')
+            for i in range(49):
+                if mask >> i & 1:
+                    board[i // 7][i % 7] = MARBLE_TYPES[color]((i // 7, i % 7))
+
+        game = cls(player_a, player_b, board, board_type, debug)
+        white_red, white_left, black_red, black_left, turn, ko = snapshot[21:]
+        for player in (game.player_a, game.player_b):
+            player.red_captured, player.marbles_left = (white_red, white_left) if player.color == 'W' else \
+                (black_red, black_left)
+            if _SNAPSHOT_TURNS[turn] is not None:
+                player.is_turn = player.color == _SNAPSHOT_TURNS[turn]
+        if ko != _SNAPSHOT_NO_KO:
+            cell, dir_index = divmod(ko, 4)
+            game.ko_rule_move = (divmod(cell, 7), _SNAPSHOT_DIRS[dir_index])
+        game.update_winner()
+        game.clear_history()
+        return game
 
     def get_current_turn(self):
         """
@@ -467,56 +1365,169 @@ class KubaGame:
                 self.player_b.is_turn = True
                 self.player_a.is_turn = False
 
-        ko_temp = self.ko_rule_move
-
         move = ((coord), dir)
-        # If there is a winner
-        if self.get_winner():
+        # If there is a winner or the game is drawn
+        if self.get_winner() or self._draw:
             return False
         # If move is not available
         if move not in self.players[player].available_moves(self.board, self.ko_rule_move):
             return False
         # If coord out of bounds
-        if coord[0] > 6 or coord[1] > 6 or coord[0] < 0 or coord[1] < 0:
+        if coord[0] >= self.board.size or coord[1] >= self.board.size or coord[0] < 0 or coord[1] < 0:
             return False
         # If the coord is an empty square
-        if self.board.board[coord[0]][coord[1]] is None:
+        if self.board.get_color(coord) is None:
             return False
         # If it is not the players turn
         if player != self.get_current_turn():
             return False
 
-        # If we made it here, update the ko rule move
-        self.update_ko_rule((coord, dir))
+        # If player would capture their own marble
+        if self.board.trace_push(coord, dir)[1] == self.players[player].color:
+            return False
 
-        previous_board = copy.deepcopy(self.board.board)
+        # If the move recreates an earlier position under the superko rule
+        if self.repeats_position(coord, dir):
+            return False
 
-        # Make the move and save captured marble in captured_marble (Marble object or None)
-        captured_marble = self.board.update_board(coord, dir)
+        # If we made it here, make the move
+        self.apply_move(coord, dir)
+        return True
 
-        # If player captured their own marble, revert board back to before the move was made and return False
-        if captured_marble is not None and captured_marble.color == self.players[player].color:
-            self.board.board = previous_board
-            self.ko_rule_move = ko_temp
-            return False
+    def preview_move(self, coord, dir):
+        """
+        Determines what a move would do without making it. Follows the precomputed line of the push, so it is cheap
+        enough to call for every candidate move.
+
+        :param coord: Coordinates of the marble that would be moved.
+        :param dir: Direction that the marble would be moved.
+        :return: MovePreview
+        """
+        row, col = coord
+        size = self.board.size
+        if not (0 <= row < size and 0 <= col < size) or dir not in _DIR_STEPS:
+            return MovePreview(False, None, 0, None, None)
+
+        color = self.board.get_color(coord)
+        player = self.player_a if color == self.player_a.color else \
+            self.player_b if color == self.player_b.color else None
+        length, pushed_off, end = self.board.trace_push(coord, dir)
+        ko_rule_move = None if end is None else (end, _OPPOSITE_DIRS[dir])
+        if player is None:
+            return MovePreview(False, None, length, pushed_off, ko_rule_move)
+
+        move = (coord, dir)
+        legal = (self._winner is None and not self._draw and (player.is_turn or self.get_current_turn() is None)
+                 and move != self.ko_rule_move and move in self.board.cell_moves(coord) and pushed_off != color
+                 and not self.repeats_position(coord, dir))
+        return MovePreview(legal, player.name, length, pushed_off, ko_rule_move)
+
+    def apply_move(self, coord, dir):
+        """
+        Applies a move without checking that it is legal. The player making the move is the owner of the marble at
+        coord. Used by make_move and by callers that search through moves and take them back with undo_move.
+
+        :param coord: Coordinates of the marble that is going to be moved.
+        :param dir: Direction that the marble will be moved.
+        :return: MoveRecord needed to undo the move
+        """
+
+        color = self.board.get_color(coord)
+        player = self.player_a if color == self.player_a.color else self.player_b
+        opponent = self.player_b if player is self.player_a else self.player_a
+
+        record = MoveRecord(coord, dir, player, self.board.chain_length(coord, dir), self.ko_rule_move,
+                            self.player_a.is_turn, self.player_b.is_turn)
+
+        self.update_ko_rule((coord, dir))
+
+        # Make the move and save captured marble in pushed_off (Marble object or None)
+        record.pushed_off = self.board.update_board(coord, dir)
 
         # Update marble counts
-        if captured_marble is not None and captured_marble.color == 'R':
-            self.players[player].update_red_captured()
-        if self.player_a.is_turn and captured_marble is not None and captured_marble.color == self.player_b.color:
-            self.player_b.update_marbles_left()
-        if self.player_b.is_turn and captured_marble is not None and captured_marble.color == self.player_a.color:
-            self.player_a.update_marbles_left()
+        if record.pushed_off is not None:
+            if record.pushed_off.color == 'R':
+                player.update_red_captured()
+            elif record.pushed_off.color == opponent.color:
+                opponent.update_marbles_left()
+            else:
+                player.update_marbles_left()
 
         # Update player turns after making the move
-        if player == self.player_a.name:
-            self.player_a.is_turn = False
-            self.player_b.is_turn = True
+        player.is_turn = False
+        opponent.is_turn = True
+
+        self._move_log.append((coord, dir))
+        self._version += 1
+        self.update_winner()
+
+        # The same key as position_hash, with the opponent to move
+        board_hash = self._board.zobrist
+        position_hash = board_hash ^ ZOBRIST_TURN[opponent.color]
+        if self._ko_rule_move is not None:
+            position_hash ^= self._board.geometry.zobrist_ko[self._ko_rule_move]
+        if record.pushed_off is not None:
+            # Fewer marbles are left, so the history starts over and the old one is kept for undo_move
+            record.history = (self._history, self._boards)
+            self._history = {}
+            if self._boards is not None:
+                self._boards = {}
+        history = self._history
+        history[position_hash] = history.get(position_hash, 0) + 1
+        if self._boards is not None:
+            self._boards[board_hash] = self._boards.get(board_hash, 0) + 1
+        if self._repetition_limit is not None or self._move_limit is not None:
+            self.update_draw()
+        return record
+
+    def undo_move(self, record):
+        """
+        Takes back a move made by apply_move. Moves must be undone in the reverse order they were applied.
+
+        :param record: MoveRecord returned by apply_move
+        """
+
+        player = record.player
+        opponent = self.player_b if player is self.player_a else self.player_a
+
+        # The current position was counted when the move was applied, with the opponent to move
+        board_hash = self._board.zobrist
+        position_hash = board_hash ^ ZOBRIST_TURN[opponent.color]
+        if self._ko_rule_move is not None:
+            position_hash ^= self._board.geometry.zobrist_ko[self._ko_rule_move]
+        history = self._history
+        count = history[position_hash] - 1
+        if count:
+            history[position_hash] = count
         else:
-            self.player_a.is_turn = True
-            self.player_b.is_turn = False
+            del history[position_hash]
+        if self._boards is not None:
+            count = self._boards[board_hash] - 1
+            if count:
+                self._boards[board_hash] = count
+            else:
+                del self._boards[board_hash]
+        if record.history is not None:
+            self._history, self._boards = record.history
 
-        return True
+        self.board.revert_board(record.coord, record.dir, record.length, record.pushed_off)
+
+        if record.pushed_off is not None:
+            if record.pushed_off.color == 'R':
+                player.red_captured -= 1
+            elif record.pushed_off.color == opponent.color:
+                opponent.marbles_left += 1
+            else:
+                player.marbles_left += 1
+
+        self._ko_rule_move = record.ko_rule_move
+        self.player_a.is_turn = record.player_a_turn
+        self.player_b.is_turn = record.player_b_turn
+        self._move_log.pop()
+        self._version += 1
+        self.update_winner()
+        if self._repetition_limit is not None or self._move_limit is not None:
+            self.update_draw()
 
     def update_ko_rule(self, move):
         """
@@ -526,53 +1537,11 @@ class KubaGame:
         :return: self.ko_rule_move
         """
 
-        if move[1] == 'R':
-            # To iterate through column
-            col = move[0][1]
-            # Before making the move in make_move, determine when the row or col is None. This is were the marble row
-            # or column will terminate after the move is made.
-            try:
-                while self.board.board[move[0][0]][col] is not None:
-                    col += 1
-                self.ko_rule_move = ((move[0][0], col), 'L')
-                return self.ko_rule_move
-            # If move will result in marble dropping off, Ko rule doesn't apply
-            except IndexError:
-                self.ko_rule_move = None
-                return self.ko_rule_move
-
-        if move[1] == 'L':
-            col = move[0][1]
-            try:
-                while self.board.board[move[0][0]][col] is not None:
-                    col -= 1
-                self.ko_rule_move = ((move[0][0], col), 'R')
-                return self.ko_rule_move
-            except IndexError:
-                self.ko_rule_move = None
-                return self.ko_rule_move
-
-        if move[1] == 'B':
-            row = move[0][0]
-            try:
-                while self.board.board[row][move[0][1]] is not None:
-                    row += 1
-                self.ko_rule_move = ((row, move[0][1]), 'F')
-                return self.ko_rule_move
-            except IndexError:
-                self.ko_rule_move = None
-                return self.ko_rule_move
-
-        if move[1] == 'F':
-            row = move[0][0]
-            try:
-                while self.board.board[row][move[0][1]] is not None:
-                    row -= 1
-                self.ko_rule_move = ((row, move[0][1]), 'B')
-                return self.ko_rule_move
-            except IndexError:
-                self.ko_rule_move = None
-                return self.ko_rule_move
+        # The ko rule move pushes the chain back from the square it ends on. If a marble drops off, it doesn't apply
+        end = self.board.trace_push(*move)[2]
+        # Set without the property, the caller recomputes the winner once the move is on the board
+        self._ko_rule_move = None if end is None else (end, _OPPOSITE_DIRS[move[1]])
+        return self._ko_rule_move
 
     def get_winner(self):
         """
@@ -581,20 +1550,32 @@ class KubaGame:
         :return: returns the name of the winning player. If no winner, returns None
         """
 
-        if self.player_a.red_captured == 7:
-            return self.player_a.name
-        elif self.player_b.red_captured == 7:
-            return self.player_b.name
+        return self._winner
+
+    def update_winner(self):
+        """
+        Recomputes the winner from the marble counters and the cached move counts of the board. Called after every
+        applied or undone move and when the ko rule is set; call it after changing the players or the board directly.
+
+        :return: self._winner
+        """
+
+        win_reds = self.board.geometry.win_reds
+        if self.player_a.red_captured == win_reds:
+            self._winner = self.player_a.name
+        elif self.player_b.red_captured == win_reds:
+            self._winner = self.player_b.name
         elif self.player_a.marbles_left == 0 and self.player_b.marbles_left > 0:
-            return self.player_b.name
+            self._winner = self.player_b.name
         elif self.player_b.marbles_left == 0 and self.player_a.marbles_left > 0:
-            return self.player_a.name
-        elif len(self.player_a.available_moves(self.board, self.ko_rule_move)) == 0:
-            return self.player_b.name
-        elif len(self.player_b.available_moves(self.board, self.ko_rule_move)) == 0:
-            return self.player_a.name
+            self._winner = self.player_a.name
+        elif not self.board.has_moves(self.player_a.color, self.ko_rule_move):
+            self._winner = self.player_b.name
+        elif not self.board.has_moves(self.player_b.color, self.ko_rule_move):
+            self._winner = self.player_a.name
         else:
-            return None
+            self._winner = None
+        return self._winner
 
     def get_captured(self, player):
         """
@@ -617,10 +1598,11 @@ class KubaGame:
         :return: The color of marble at the coordinate or X if no marble is located at the coord.
         """
 
-        if self.board.board[coords[0]][coords[1]] is None:
+        color = self.board.get_color(coords)
+        if color is None:
             return 'X'
         else:
-            return self.board.board[coords[0]][coords[1]].color
+            return color
 
     def get_marble_count(self):
         """
@@ -637,9 +1619,67 @@ class KubaGame:
             player_white = self.player_b
 
         return (player_white.marbles_left, player_black.marbles_left,
-                13 - player_black.red_captured - player_white.red_captured)
+                self.board.geometry.reds - player_black.red_captured - player_white.red_captured)
+
+class MoveRecord:
+    """ Represents the information needed to undo a move made by KubaGame.apply_move.
+
+        Attributes:
+            coord: coordinate that was played
+            dir: direction of the push
+            player: Player that made the move
+            length: number of marbles in the pushed chain
+            ko_rule_move: the ko rule move before the move was made
+            player_a_turn: player a is_turn before the move was made
+            player_b_turn: player b is_turn before the move was made
+            pushed_off: None or the marble pushed off the board
+            history: the position and board histories before the move if it pushed a marble off, None otherwise
+    """
+
+    __slots__ = ('coord', 'dir', 'player', 'length', 'ko_rule_move', 'player_a_turn', 'player_b_turn', 'pushed_off',
+                 'history')
+
+    def __init__(self, coord, dir, player, length, ko_rule_move, player_a_turn, player_b_turn):
+        """ Initializes a move record """
+        self.coord = coord
+        self.dir = dir
+        self.player = player
+        self.length = length
+        self.ko_rule_move = ko_rule_move
+        self.player_a_turn = player_a_turn
+        self.player_b_turn = player_b_turn
+        self.pushed_off = None
+        self.history = None
+
+class MovePreview:
+    """ Represents what a move would do, from KubaGame.preview_move.
+
+        Attributes:
+            legal: True if make_move would accept the move from the player owning the marble
+            player: name of the player owning the marble, None for a red marble or an empty square
+            length: number of marbles the push moves
+            pushed_off: color of the marble the push drops off the board or None
+            ko_rule_move: ko rule move after the move, None if a marble is pushed off
+    """
+
+    __slots__ = ('legal', 'player', 'length', 'pushed_off', 'ko_rule_move')
+
+    def __init__(self, legal, player, length, pushed_off, ko_rule_move):
+        """ Initializes a move preview """
+        self.legal = legal
+        self.player = player
+        self.length = length
+        self.pushed_off = pushed_off
+        self.ko_rule_move = ko_rule_move
+
+    def __repr__(self):
+        return 'MovePreview(legal={}, player={!r}, length={}, pushed_off={!r}, ko_rule_move={})'.format(
+            self.legal, self.player, self.length, self.pushed_off, self.ko_rule_move)
 
 class InvalidName(Exception):
     """ Raised if an invalid player name is used"""
     pass
 
+class MoveCacheError(Exception):
+    """ Raised in debug mode if the cached moves of a board differ from a full rescan"""
+    pass
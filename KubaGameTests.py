@@ -1,5 +1,7 @@
 import unittest
-from KubaGame import KubaGame, Player, WhiteMarble, BlackMarble, RedMarble, InvalidName
+import random
+from KubaGame import KubaGame, Player, WhiteMarble, BlackMarble, RedMarble, InvalidName, Board, BitBoard, \
+    CompactBoard, MoveCacheError, SHARED_MARBLES, SNAPSHOT_SIZE, geometry
 
 class TestKubaGame(unittest.TestCase):
     """ Contains tests for KubaGame"""
@@ -164,5 +166,544 @@ class TestKubaGame(unittest.TestCase):
         game.make_move('Jason', (5, 5), 'F')
         self.assertEqual(game.ko_rule_move, ((0,5), 'B'))
 
+class TestBitBoard(unittest.TestCase):
+    """ Contains tests for the BitBoard representation"""
+
+    def testStartingBoard(self):
+        game = KubaGame(('Jason', 'W'), ('Sunny', 'B'))
+        bit_game = KubaGame(('Jason', 'W'), ('Sunny', 'B'), board_type=BitBoard)
+        for row in range(7):
+            for col in range(7):
+                self.assertEqual(game.get_marble((row, col)), bit_game.get_marble((row, col)))
+
+    def testBoardView(self):
+        game = KubaGame(('Jason', 'W'), ('Sunny', 'B'), board_type=BitBoard)
+        game.make_move('Jason', (5, 6), 'L')
+        self.assertEqual(game.board.board[5][4].color, 'W')
+        self.assertEqual(game.board.board[5][4].pos, (5, 4))
+        self.assertIsNone(game.board.board[5][6])
+
+    def testPushOffOwn(self):
+        game = KubaGame(('Jason', 'W'), ('Sunny', 'B'), board_type=BitBoard)
+        self.assertFalse(game.make_move('Jason', (0,1), 'L'))
+        self.assertEqual(game.get_marble((0, 0)), 'W')
+
+    def testNoMovesWin(self):
+        board = [[BlackMarble((0,0)), BlackMarble((0,1)), None, None, None, BlackMarble((0,5)), BlackMarble((0,6))],
+                       [BlackMarble((1,0)), WhiteMarble((1,1)), RedMarble((1,2)), RedMarble((1,3)), None, BlackMarble((1,5)), BlackMarble((1,6))],
+                       [None, RedMarble((2,1)), RedMarble((2,2)), RedMarble((2,3)), RedMarble((2,4)), None, None],
+                       [None, RedMarble((3,1)), RedMarble((3,2)), RedMarble((3,3)), RedMarble((3,4)), RedMarble((3,5)), None],
+                       [None, None, RedMarble((4,2)), RedMarble((4,3)), RedMarble((4,4)), None, None],
+                       [BlackMarble((5,0)), BlackMarble((5,1)), None, RedMarble((5,3)), None, BlackMarble((5,5)), BlackMarble((5,6))],
+                       [BlackMarble((6,0)), BlackMarble((6,1)), None, None, None, BlackMarble((6,5)), BlackMarble((6,6))]]
+
+        game = KubaGame(('Jason', 'W'), ('Sunny', 'B'), board, board_type=BitBoard)
+
+        self.assertEqual(game.get_winner(), 'Sunny')
+
+    def testRandomGamesMatchBoard(self):
+        rng = random.Random(7)
+        for _ in range(20):
+            game = KubaGame(('Jason', 'W'), ('Sunny', 'B'))
+            bit_game = KubaGame(('Jason', 'W'), ('Sunny', 'B'), board_type=BitBoard)
+            player = 'Jason'
+            for _ in range(200):
+                if game.get_winner() is not None:
+                    break
+                moves = game.players[player].available_moves(game.board, game.ko_rule_move)
+                bit_moves = bit_game.players[player].available_moves(bit_game.board, bit_game.ko_rule_move)
+                self.assertEqual(moves, bit_moves)
+                move = rng.choice(moves)
+                self.assertEqual(game.make_move(player, *move), bit_game.make_move(player, *move))
+                self.assertEqual(game.ko_rule_move, bit_game.ko_rule_move)
+                self.assertEqual(game.get_marble_count(), bit_game.get_marble_count())
+                player = game.get_current_turn()
+            self.assertEqual(game.get_winner(), bit_game.get_winner())
+
+class TestApplyUndo(unittest.TestCase):
+    """ Contains tests for KubaGame.apply_move and KubaGame.undo_move"""
+
+    def state(self, game):
+        cells = tuple(game.get_marble((row, col)) for row in range(7) for col in range(7))
+        players = tuple((p.red_captured, p.marbles_left, p.is_turn) for p in (game.player_a, game.player_b))
+        return cells, players, game.ko_rule_move
+
+    def checkRandomUndo(self, board_type):
+        rng = random.Random(3)
+        game = KubaGame(('Jason', 'W'), ('Sunny', 'B'), board_type=board_type)
+        history = []
+        for _ in range(150):
+            player = game.get_current_turn() or 'Jason'
+            moves = game.players[player].available_moves(game.board, game.ko_rule_move)
+            if not moves or game.get_winner():
+                break
+            before = self.state(game)
+            record = game.apply_move(*rng.choice(moves))
+            history.append((before, record))
+        while history:
+            before, record = history.pop()
+            game.undo_move(record)
+            self.assertEqual(self.state(game), before)
+
+    def testUndoBoard(self):
+        self.checkRandomUndo(Board)
+
+    def testUndoBitBoard(self):
+        self.checkRandomUndo(BitBoard)
+
+    def testUndoRestoresMarblePositions(self):
+        game = KubaGame(('Jason', 'W'), ('Sunny', 'B'))
+        record = game.apply_move((6, 6), 'F')
+        game.undo_move(record)
+        for row in range(7):
+            for col in range(7):
+                if game.board.board[row][col] is not None:
+                    self.assertEqual(game.board.board[row][col].pos, (row, col))
+
+    def testMoveLog(self):
+        game = KubaGame(('Jason', 'W'), ('Sunny', 'B'))
+        game.make_move('Jason', (5, 6), 'L')
+        game.make_move('Sunny', (6, 0), 'R')
+        self.assertFalse(game.make_move('Jason', (0, 1), 'L'))
+        self.assertEqual(game.move_log, [((5, 6), 'L'), ((6, 0), 'R')])
+        record = game.apply_move((6, 6), 'F')
+        game.undo_move(record)
+        self.assertEqual(game.move_log, [((5, 6), 'L'), ((6, 0), 'R')])
+
+    def testPushOffOwnRestoresBoard(self):
+        game = KubaGame(('Jason', 'W'), ('Sunny', 'B'))
+        before = self.state(game)
+        self.assertFalse(game.make_move('Jason', (0, 1), 'L'))
+        self.assertEqual(self.state(game)[0], before[0])
+        self.assertEqual(game.get_marble_count(), (8, 8, 13))
+
+class TestMoveCache(unittest.TestCase):
+    """ Contains tests for the cached available moves"""
+
+    def checkRandomGames(self, board_type):
+        rng = random.Random(11)
+        for _ in range(10):
+            game = KubaGame(('Jason', 'W'), ('Sunny', 'B'), board_type=board_type, debug=True)
+            for _ in range(150):
+                player = game.get_current_turn() or 'Jason'
+                if game.get_winner():
+                    break
+                moves = game.players[player].available_moves(game.board, game.ko_rule_move)
+                game.make_move(player, *rng.choice(moves))
+                self.assertEqual(game.board.available_moves('W'), game.board.scan_moves('W'))
+                self.assertEqual(game.board.available_moves('B'), game.board.scan_moves('B'))
+
+    def testRandomGamesBoard(self):
+        self.checkRandomGames(Board)
+
+    def testRandomGamesBitBoard(self):
+        self.checkRandomGames(BitBoard)
+
+    def testBoardSetterRebuildsCache(self):
+        game = KubaGame(('Jason', 'W'), ('Sunny', 'B'), debug=True)
+        board = game.board.board
+        board[2][0] = WhiteMarble((2, 0))
+        game.board.board = board
+        self.assertIn(((2, 0), 'R'), game.player_a.available_moves(game.board, game.ko_rule_move))
+
+    def testDebugDetectsStaleCache(self):
+        game = KubaGame(('Jason', 'W'), ('Sunny', 'B'), debug=True)
+        game.board.board[2][0] = WhiteMarble((2, 0))
+        with self.assertRaises(MoveCacheError):
+            game.player_a.available_moves(game.board, game.ko_rule_move)
+
+class TestPositionHash(unittest.TestCase):
+    """ Contains tests for KubaGame.position_hash"""
+
+    def checkIncrementalHash(self, board_type):
+        rng = random.Random(5)
+        game = KubaGame(('Jason', 'W'), ('Sunny', 'B'), board_type=board_type)
+        records = []
+        hashes = [game.position_hash]
+        for _ in range(120):
+            player = game.get_current_turn() or 'Jason'
+            moves = game.players[player].available_moves(game.board, game.ko_rule_move)
+            if not moves or game.get_winner():
+                break
+            records.append(game.apply_move(*rng.choice(moves)))
+            hashes.append(game.position_hash)
+            self.assertEqual(game.board.zobrist, board_type(game.board.board).zobrist)
+        while records:
+            game.undo_move(records.pop())
+            hashes.pop()
+            self.assertEqual(game.position_hash, hashes[-1])
+
+    def testIncrementalHashBoard(self):
+        self.checkIncrementalHash(Board)
+
+    def testIncrementalHashBitBoard(self):
+        self.checkIncrementalHash(BitBoard)
+
+    def testBoardTypesHashAlike(self):
+        game = KubaGame(('Jason', 'W'), ('Sunny', 'B'))
+        bit_game = KubaGame(('Jason', 'W'), ('Sunny', 'B'), board_type=BitBoard)
+        game.make_move('Jason', (5, 6), 'L')
+        bit_game.make_move('Jason', (5, 6), 'L')
+        self.assertEqual(game.position_hash, bit_game.position_hash)
+
+    def testTransposition(self):
+        game = KubaGame(('Jason', 'W'), ('Sunny', 'B'))
+        game.make_move('Jason', (6, 6), 'F')
+        game.make_move('Sunny', (6, 0), 'F')
+        game.make_move('Jason', (0, 0), 'B')
+        game.make_move('Sunny', (0, 6), 'B')
+        other = KubaGame(('Jason', 'W'), ('Sunny', 'B'))
+        other.make_move('Jason', (0, 0), 'B')
+        other.make_move('Sunny', (0, 6), 'B')
+        other.make_move('Jason', (6, 6), 'F')
+        other.make_move('Sunny', (6, 0), 'F')
+        self.assertNotEqual(game.ko_rule_move, other.ko_rule_move)
+        self.assertNotEqual(game.position_hash, other.position_hash)
+        other.ko_rule_move = game.ko_rule_move
+        self.assertEqual(game.position_hash, other.position_hash)
+
+    def testSideToMove(self):
+        game = KubaGame(('Jason', 'W'), ('Sunny', 'B'))
+        start = game.position_hash
+        game.player_a.is_turn = True
+        self.assertNotEqual(game.position_hash, start)
+
+class TestWinner(unittest.TestCase):
+    """ Contains tests for the incrementally kept winner"""
+
+    def recomputeWinner(self, game):
+        a, b = game.player_a, game.player_b
+        if a.red_captured == 7:
+            return a.name
+        if b.red_captured == 7:
+            return b.name
+        if a.marbles_left == 0 and b.marbles_left > 0:
+            return b.name
+        if b.marbles_left == 0 and a.marbles_left > 0:
+            return a.name
+        if not a.available_moves(game.board, game.ko_rule_move):
+            return b.name
+        if not b.available_moves(game.board, game.ko_rule_move):
+            return a.name
+        return None
+
+    def checkRandomGames(self, board_type):
+        rng = random.Random(13)
+        for _ in range(20):
+            game = KubaGame(('Jason', 'W'), ('Sunny', 'B'), board_type=board_type, debug=True)
+            records = []
+            winners = [game.get_winner()]
+            for _ in range(300):
+                player = game.get_current_turn() or 'Jason'
+                moves = game.players[player].available_moves(game.board, game.ko_rule_move)
+                if not moves or game.get_winner():
+                    break
+                records.append(game.apply_move(*rng.choice(moves)))
+                winners.append(game.get_winner())
+                self.assertEqual(game.get_winner(), self.recomputeWinner(game))
+            while records:
+                game.undo_move(records.pop())
+                winners.pop()
+                self.assertEqual(game.get_winner(), winners[-1])
+
+    def testRandomGamesBoard(self):
+        self.checkRandomGames(Board)
+
+    def testRandomGamesBitBoard(self):
+        self.checkRandomGames(BitBoard)
+
+    def testOneUpdatePerMove(self):
+        calls = []
+        update_winner = KubaGame.update_winner
+
+        def counted(game):
+            calls.append(game)
+            return update_winner(game)
+        game = KubaGame(('Jason', 'W'), ('Sunny', 'B'))
+        KubaGame.update_winner = counted
+        try:
+            record = game.apply_move((6, 6), 'F')
+            self.assertEqual(len(calls), 1)
+            game.undo_move(record)
+            self.assertEqual(len(calls), 2)
+            game.ko_rule_move = ((5, 6), 'B')
+            self.assertEqual(len(calls), 3)
+        finally:
+            KubaGame.update_winner = update_winner
+
+    def testUpdateAfterDirectChange(self):
+        game = KubaGame(('Jason', 'W'), ('Sunny', 'B'))
+        game.player_b.red_captured = 7
+        self.assertIsNone(game.get_winner())
+        self.assertEqual(game.update_winner(), 'Sunny')
+        self.assertEqual(game.get_winner(), 'Sunny')
+
+class TestCompactState(unittest.TestCase):
+    """ Contains tests for the slotted classes and CompactBoard"""
+
+    def testNoInstanceDicts(self):
+        game = KubaGame(('Jason', 'W'), ('Sunny', 'B'), board_type=CompactBoard)
+        record = game.apply_move((6, 6), 'F')
+        for obj in (game, game.player_a, game.board, record, WhiteMarble((0, 0)), Board(), BitBoard()):
+            self.assertFalse(hasattr(obj, '__dict__'), type(obj).__name__)
+
+    def testSharedMarbles(self):
+        game = KubaGame(('Jason', 'W'), ('Sunny', 'B'), board_type=CompactBoard)
+        self.assertIs(game.board.board[0][0], game.board.board[1][1])
+        self.assertIs(game.board.board[3][3], SHARED_MARBLES['R'])
+        self.assertIsNone(game.board.board[0][0].pos)
+        self.assertEqual(game.board.board[6][6].rgb, (255, 255, 255))
+
+    def testRandomGamesMatchBoard(self):
+        rng = random.Random(15)
+        for _ in range(10):
+            game = KubaGame(('Jason', 'W'), ('Sunny', 'B'))
+            compact = KubaGame(('Jason', 'W'), ('Sunny', 'B'), board_type=CompactBoard)
+            player = 'Jason'
+            for _ in range(200):
+                if game.get_winner() is not None:
+                    break
+                move = rng.choice(game.players[player].available_moves(game.board, game.ko_rule_move))
+                self.assertEqual(game.make_move(player, *move), compact.make_move(player, *move))
+                self.assertEqual(game.get_marble_count(), compact.get_marble_count())
+                player = game.get_current_turn()
+            for row in range(7):
+                for col in range(7):
+                    self.assertEqual(game.get_marble((row, col)), compact.get_marble((row, col)))
+            self.assertEqual(game.get_winner(), compact.get_winner())
+
+class TestSnapshot(unittest.TestCase):
+    """ Contains tests for KubaGame.snapshot and KubaGame.from_snapshot"""
+
+    def checkRoundTrip(self, board_type):
+        rng = random.Random(16)
+        game = KubaGame(('Jason', 'W'), ('Sunny', 'B'), board_type=board_type)
+        for _ in range(150):
+            snapshot = game.snapshot()
+            self.assertEqual(len(snapshot), SNAPSHOT_SIZE)
+            restored = KubaGame.from_snapshot(snapshot, ('Jason', 'W'), ('Sunny', 'B'), board_type)
+            self.assertEqual(restored.snapshot(), snapshot)
+            self.assertEqual(restored.position_hash, game.position_hash)
+            self.assertEqual(restored.get_current_turn(), game.get_current_turn())
+            self.assertEqual(restored.get_marble_count(), game.get_marble_count())
+            self.assertEqual(restored.get_winner(), game.get_winner())
+            player = game.get_current_turn() or 'Jason'
+            moves = game.players[player].available_moves(game.board, game.ko_rule_move)
+            if not moves or game.get_winner():
+                break
+            game.apply_move(*rng.choice(moves))
+
+    def testRoundTripBoard(self):
+        self.checkRoundTrip(Board)
+
+    def testRoundTripBitBoard(self):
+        self.checkRoundTrip(BitBoard)
+
+    def testIgnoresNames(self):
+        game = KubaGame(('Jason', 'W'), ('Sunny', 'B'))
+        other = KubaGame(('Sunny', 'B'), ('Jason', 'W'), board_type=CompactBoard)
+        game.make_move('Jason', (5, 6), 'L')
+        other.make_move('Jason', (5, 6), 'L')
+        self.assertEqual(game.snapshot(), other.snapshot())
+        self.assertEqual(len({game.snapshot(), other.snapshot()}), 1)
+
+    def testRestoreAndPlay(self):
+        game = KubaGame(('Jason', 'W'), ('Sunny', 'B'))
+        game.make_move('Jason', (5, 6), 'L')
+        restored = KubaGame.from_snapshot(game.snapshot(), ('Jason', 'W'), ('Sunny', 'B'))
+        self.assertFalse(restored.make_move('Jason', (0, 0), 'B'))
+        self.assertFalse(restored.make_move('Sunny', (5, 4), 'R'))
+        self.assertTrue(restored.make_move('Sunny', (6, 0), 'R'))
+
+    def testInvalidSnapshot(self):
+        with self.assertRaises(ValueError):
+            KubaGame.from_snapshot(b'\x00' * 5, ('Jason', 'W'), ('Sunny', 'B'))
+
+class TestPreviewMove(unittest.TestCase):
+    """ Contains tests for KubaGame.preview_move"""
+
+    def checkAgainstMakeMove(self, board_type):
+        rng = random.Random(21)
+        players = (('Jason', 'W'), ('Sunny', 'B'))
+        game = KubaGame(*players, board_type=board_type)
+        for _ in range(80):
+            snapshot = game.snapshot()
+            for row in range(7):
+                for col in range(7):
+                    for dir in 'FBLR':
+                        preview = game.preview_move((row, col), dir)
+                        copy = KubaGame.from_snapshot(snapshot, *players, board_type)
+                        before = copy.get_marble_count()
+                        name = preview.player or copy.get_current_turn() or 'Jason'
+                        self.assertEqual(copy.make_move(name, (row, col), dir), preview.legal)
+                        if preview.legal:
+                            self.assertEqual(copy.ko_rule_move, preview.ko_rule_move)
+                            self.assertEqual(copy.get_marble_count() != before, preview.pushed_off is not None)
+                            self.assertEqual(preview.length, game.board.chain_length((row, col), dir))
+            self.assertEqual(game.snapshot(), snapshot)
+            player = game.get_current_turn() or 'Jason'
+            moves = [move for move in game.players[player].available_moves(game.board, game.ko_rule_move)
+                     if game.preview_move(*move).legal]
+            if not moves or game.get_winner():
+                break
+            game.make_move(player, *rng.choice(moves))
+
+    def testBoard(self):
+        self.checkAgainstMakeMove(Board)
+
+    def testBitBoard(self):
+        self.checkAgainstMakeMove(BitBoard)
+
+    def testPreview(self):
+        game = KubaGame(('Jason', 'W'), ('Sunny', 'B'))
+        preview = game.preview_move((5, 6), 'L')
+        self.assertTrue(preview.legal)
+        self.assertEqual((preview.player, preview.length, preview.pushed_off), ('Jason', 2, None))
+        self.assertEqual(preview.ko_rule_move, ((5, 4), 'R'))
+        self.assertEqual(game.preview_move((0, 1), 'L').pushed_off, 'W')
+        self.assertFalse(game.preview_move((0, 1), 'L').legal)
+        self.assertFalse(game.preview_move((3, 3), 'L').legal)
+        self.assertFalse(game.preview_move((7, 0), 'L').legal)
+        game.make_move('Jason', (5, 6), 'L')
+        self.assertFalse(game.preview_move((6, 5), 'F').legal)
+        self.assertTrue(game.preview_move((6, 0), 'R').legal)
+
+class TestBoardSize(unittest.TestCase):
+    """ Contains tests for boards larger and smaller than 7x7"""
+
+    def colors(self, board):
+        return [[None if marble is None else marble.color for marble in row] for row in board.board]
+
+    def testStandardGeometry(self):
+        standard = geometry(7)
+        self.assertIs(standard, geometry(7))
+        self.assertEqual((standard.marbles, standard.reds, standard.win_reds), (8, 13, 7))
+        self.assertEqual(self.colors(Board(size=7)), self.colors(Board()))
+        self.assertEqual(KubaGame(('Jason', 'W'), ('Sunny', 'B'), size=7).get_marble_count(), (8, 8, 13))
+
+    def testCounts(self):
+        for size, counts, win_reds in ((5, (8, 8, 5), 3), (9, (18, 18, 25), 13), (11, (18, 18, 41), 21)):
+            game = KubaGame(('Jason', 'W'), ('Sunny', 'B'), size=size)
+            self.assertEqual(game.board.size, size)
+            self.assertEqual(game.get_marble_count(), counts)
+            self.assertEqual(game.board.geometry.win_reds, win_reds)
+            self.assertEqual(game.player_a.marbles_left, counts[0])
+            self.assertEqual(game.get_marble((size // 2, size // 2)), 'R')
+            self.assertEqual(game.get_marble((size - 1, 0)), 'B')
+            self.assertEqual(self.colors(BitBoard(size=size)), self.colors(Board(size=size)))
+        for size in (4, 6, 8):
+            with self.assertRaises(ValueError):
+                geometry(size)
+
+    def testBoardTypesAgree(self):
+        rng = random.Random(9)
+        players = (('Jason', 'W'), ('Sunny', 'B'))
+        games = [KubaGame(*players, board_type=board_type, size=9) for board_type in (Board, BitBoard, CompactBoard)]
+        name = 'Jason'
+        for _ in range(150):
+            moves = [sorted(game.players[name].available_moves(game.board, game.ko_rule_move)) for game in games]
+            self.assertEqual(moves[0], moves[1])
+            self.assertEqual(moves[0], moves[2])
+            self.assertEqual(len({game.position_hash for game in games}), 1)
+            moves = [move for move in moves[0] if games[0].preview_move(*move).legal]
+            if not moves or games[0].get_winner():
+                break
+            move = rng.choice(moves)
+            for game in games:
+                self.assertTrue(game.make_move(name, *move))
+            name = games[0].get_current_turn()
+        self.assertEqual(games[0].get_marble_count(), games[2].get_marble_count())
+
+    def testEdges(self):
+        game = KubaGame(('Jason', 'W'), ('Sunny', 'B'), size=9)
+        self.assertFalse(game.make_move('Jason', (9, 0), 'R'))
+        self.assertTrue(game.make_move('Jason', (0, 0), 'B'))
+        self.assertEqual(game.get_marble((3, 0)), 'W')
+        with self.assertRaises(ValueError):
+            game.snapshot()
+
+class TestRepetition(unittest.TestCase):
+    """ Contains tests for the position history, superko and draws"""
+
+    # White and Black each push a corner pair down and back up, the board repeats every 4 moves
+    CYCLE = (('Jason', (0, 0), 'B'), ('Sunny', (0, 6), 'B'), ('Jason', (2, 0), 'F'), ('Sunny', (2, 6), 'F'))
+
+    def testHistory(self):
+        for board_type in (Board, BitBoard, CompactBoard):
+            game = KubaGame(('Jason', 'W'), ('Sunny', 'B'), board_type=board_type)
+            self.assertEqual(game.repetitions(), 1)
+            for _ in range(3):
+                for player, coord, dir in self.CYCLE:
+                    self.assertTrue(game.make_move(player, coord, dir))
+            self.assertEqual(game.repetitions(), 3)
+            self.assertFalse(game.draw)
+            self.assertEqual(sum(game.history.values()), 13)
+            record = game.apply_move((0, 0), 'B')
+            history = dict(game.history)
+            game.undo_move(game.apply_move((2, 6), 'F'))
+            self.assertEqual(game.history, history)
+            game.undo_move(record)
+            self.assertEqual(game.repetitions(), 3)
+
+    def testCaptureStartsHistoryOver(self):
+        game = KubaGame(('Jason', 'W'), ('Sunny', 'B'))
+        for player, coord, dir in self.CYCLE:
+            self.assertTrue(game.make_move(player, coord, dir))
+        history = dict(game.history)
+        record = game.apply_move((1, 1), 'L')
+        self.assertEqual(game.get_marble_count()[0], 7)
+        self.assertEqual(game.history, {game.position_hash: 1})
+        game.undo_move(record)
+        self.assertEqual(game.history, history)
+        self.assertEqual(len(history), 5)
+
+    def testRepetitionDraw(self):
+        game = KubaGame(('Jason', 'W'), ('Sunny', 'B'), repetition_limit=3)
+        for _ in range(2):
+            for player, coord, dir in self.CYCLE:
+                self.assertTrue(game.make_move(player, coord, dir))
+        self.assertFalse(game.draw)
+        # The position after the first move is reached for the third time
+        self.assertTrue(game.make_move(*self.CYCLE[0]))
+        self.assertTrue(game.draw)
+        self.assertIsNone(game.get_winner())
+        self.assertFalse(game.make_move('Sunny', (0, 6), 'B'))
+        self.assertFalse(game.preview_move((0, 6), 'B').legal)
+        game.undo_move(game.apply_move((0, 6), 'B'))
+        self.assertTrue(game.draw)
+
+    def testMoveLimit(self):
+        game = KubaGame(('Jason', 'W'), ('Sunny', 'B'), move_limit=4)
+        for player, coord, dir in self.CYCLE:
+            self.assertFalse(game.draw)
+            self.assertTrue(game.make_move(player, coord, dir))
+        self.assertTrue(game.draw)
+        self.assertFalse(game.make_move('Jason', (0, 0), 'B'))
+
+    def testSuperko(self):
+        game = KubaGame(('Jason', 'W'), ('Sunny', 'B'), board_type=BitBoard, superko=True)
+        for player, coord, dir in self.CYCLE[:3]:
+            self.assertTrue(game.make_move(player, coord, dir))
+        self.assertTrue(game.repeats_position((2, 6), 'F'))
+        self.assertFalse(game.preview_move((2, 6), 'F').legal)
+        self.assertFalse(game.make_move('Sunny', (2, 6), 'F'))
+        self.assertTrue(game.make_move('Sunny', (2, 6), 'L'))
+        self.assertFalse(KubaGame(('Jason', 'W'), ('Sunny', 'B')).repeats_position((0, 0), 'B'))
+
+    def testZobristAfter(self):
+        rng = random.Random(24)
+        for board_type in (Board, BitBoard, CompactBoard):
+            game = KubaGame(('Jason', 'W'), ('Sunny', 'B'), board_type=board_type)
+            for _ in range(60):
+                moves = game.board.available_moves('W') + game.board.available_moves('B')
+                for move in moves:
+                    expected = game.board.zobrist_after(*move)
+                    record = game.apply_move(*move)
+                    self.assertEqual(game.board.zobrist, expected)
+                    game.undo_move(record)
+                if game.get_winner():
+                    break
+                game.apply_move(*rng.choice(moves))
+
 if __name__ == '__main__':
     unittest.main(exit=False)
\ No newline at end of file
@@ -0,0 +1,76 @@
+import unittest
+from KubaGame import KubaGame, BitBoard, WhiteMarble, BlackMarble, RedMarble
+import random
+from mcts import MonteCarloSearch, run_tree, _random_move
+
+class TestMonteCarloSearch(unittest.TestCase):
+    """ Contains tests for the Monte Carlo Tree Search"""
+
+    def testFindsWinningCapture(self):
+        board = [[None] * 7 for _ in range(7)]
+        board[0][0] = BlackMarble((0, 0))
+        board[6][0] = BlackMarble((6, 0))
+        board[3][5] = WhiteMarble((3, 5))
+        board[3][6] = RedMarble((3, 6))
+        board[5][3] = WhiteMarble((5, 3))
+        board[1][3] = RedMarble((1, 3))
+        game = KubaGame(('Jason', 'W'), ('Sunny', 'B'), board)
+        game.player_a.red_captured = 6
+        result = MonteCarloSearch(playouts=100, seed=3).search(game, 'Jason')
+        self.assertEqual(result.move, ((3, 5), 'R'))
+        self.assertEqual(result.win_rate, 1.0)
+
+    CYCLE = (('Jason', (0, 0), 'B'), ('Sunny', (0, 6), 'B'), ('Jason', (2, 0), 'F'), ('Sunny', (2, 6), 'F'))
+
+    def testSuperkoRollouts(self):
+        game = KubaGame(('Jason', 'W'), ('Sunny', 'B'), superko=True)
+        for player, coord, dir in self.CYCLE[:3]:
+            self.assertTrue(game.make_move(player, coord, dir))
+        # Sunny's (2, 6) F would put the marbles back as they started
+        self.assertIn(((2, 6), 'F'), game.players['Sunny'].available_moves(game.board, game.ko_rule_move))
+        rng = random.Random(0)
+        for _ in range(300):
+            self.assertNotEqual(_random_move(game, game.players['Sunny'], rng), ((2, 6), 'F'))
+
+    def testDrawIsTerminal(self):
+        game = KubaGame(('Jason', 'W'), ('Sunny', 'B'), repetition_limit=2)
+        for player, coord, dir in self.CYCLE:
+            self.assertTrue(game.make_move(player, coord, dir))
+        # Jason's (0, 0) B reaches the position after the first move a second time
+        position_hash = game.position_hash
+        tree, playouts = run_tree(game, 'Jason', 400, None, 5, max_rollout_plies=30)
+        self.assertEqual(playouts, 400)
+        self.assertEqual(game.position_hash, position_hash)
+        visits, wins = tree[((0, 0), 'B')]
+        self.assertGreater(visits, 1)
+        self.assertEqual(wins, visits / 2)
+
+        self.assertTrue(game.make_move('Jason', (0, 0), 'B'))
+        self.assertTrue(game.draw)
+        self.assertIsNone(MonteCarloSearch(playouts=20, seed=1).search(game, 'Sunny').move)
+
+    def testReproducible(self):
+        game = KubaGame(('Jason', 'W'), ('Sunny', 'B'), board_type=BitBoard)
+        first = MonteCarloSearch(playouts=40, seed=9, max_rollout_plies=30).search(game, 'Jason')
+        second = MonteCarloSearch(playouts=40, seed=9, max_rollout_plies=30).search(game, 'Jason')
+        self.assertEqual(first.visits, second.visits)
+        self.assertEqual(first.move, second.move)
+
+    def testWorkerProcesses(self):
+        game = KubaGame(('Jason', 'W'), ('Sunny', 'B'))
+        position_hash = game.position_hash
+        with MonteCarloSearch(playouts=20, workers=2, seed=1, max_rollout_plies=20) as search:
+            result = search.search(game, 'Jason')
+        self.assertEqual(result.playouts, 20)
+        self.assertEqual(sum(result.visits.values()), 20)
+        self.assertEqual(game.position_hash, position_hash)
+        self.assertTrue(game.make_move('Jason', *result.move))
+
+    def testTimeLimit(self):
+        game = KubaGame(('Jason', 'W'), ('Sunny', 'B'))
+        result = MonteCarloSearch(playouts=10 ** 9, time_limit=0.2).search(game, 'Jason')
+        self.assertLess(result.playouts, 10 ** 9)
+        self.assertIsNotNone(result.move)
+
+if __name__ == '__main__':
+    unittest.main(exit=False)
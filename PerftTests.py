@@ -0,0 +1,45 @@
+import unittest
+from KubaGame import KubaGame, Board, BitBoard
+from perft import perft, divide, position
+
+# Leaf counts of the stored positions by depth, checked against the original make_move implementation
+REFERENCE_COUNTS = {
+    'start': [8, 64, 640, 6384],
+    'opening': [12, 189, 2289, 34710],
+    'middlegame': [9, 89, 960, 9938],
+}
+
+class TestPerft(unittest.TestCase):
+    """ Contains perft reference counts, so performance work cannot change the rules"""
+
+    def checkCounts(self, board_type):
+        for name, counts in REFERENCE_COUNTS.items():
+            game, player_name = position(name, board_type)
+            position_hash = game.position_hash
+            for depth, expected in enumerate(counts, 1):
+                self.assertEqual(perft(game, depth, player_name), expected, (name, depth))
+            self.assertEqual(game.position_hash, position_hash)
+
+    def testCountsBoard(self):
+        self.checkCounts(Board)
+
+    def testCountsBitBoard(self):
+        self.checkCounts(BitBoard)
+
+    def testDivide(self):
+        game, player_name = position('opening')
+        counts = divide(game, 3, player_name)
+        self.assertEqual(len(counts), REFERENCE_COUNTS['opening'][0])
+        self.assertEqual(sum(counts.values()), REFERENCE_COUNTS['opening'][2])
+
+    def testSuperko(self):
+        game = KubaGame(('White', 'W'), ('Black', 'B'), superko=True)
+        for player_name, coord, dir in (('White', (0, 0), 'B'), ('Black', (0, 6), 'B'), ('White', (2, 0), 'F')):
+            self.assertTrue(game.make_move(player_name, coord, dir))
+        # Black's (2, 6) F would recreate the starting marbles
+        counts = divide(game, 1, 'Black')
+        self.assertNotIn(((2, 6), 'F'), counts)
+        self.assertEqual(perft(game, 1, 'Black'), len(counts))
+
+if __name__ == '__main__':
+    unittest.main(exit=False)
@@ -0,0 +1,115 @@
+import os
+import tempfile
+import unittest
+from KubaGame import KubaGame, BitBoard
+from posdb import PositionDB, ROW
+from simulate import run
+
+class TestPositionDB(unittest.TestCase):
+    """ Contains tests for the memory mapped position database"""
+
+    def setUp(self) -> None:
+        self._dir = tempfile.TemporaryDirectory()
+        self._path = os.path.join(self._dir.name, 'positions.kpd')
+
+    def tearDown(self) -> None:
+        self._dir.cleanup()
+
+    def testAppendFromSimulator(self):
+        with PositionDB(self._path, writable=True, index_slots=16) as db:
+            summary = run(8, 'random', 'random', seed=2, max_plies=60, positions=db)
+            self.assertEqual(len(db), summary['moves'])
+        self.assertEqual(os.path.getsize(self._path), 16 + summary['moves'] * ROW.size)
+
+        with PositionDB(self._path) as db:
+            plies = [row.ply for row in db]
+            self.assertEqual(plies.count(0), 8)
+            start = KubaGame(('White', 'W'), ('Black', 'B')).snapshot()
+            self.assertEqual(len(db.find(start)), 8)
+            games, wins, losses, none = db.outcomes(start)
+            self.assertEqual(games, 8)
+            self.assertEqual(wins + losses + none, 8)
+            white_games = db.outcomes(start, 'W')[0]
+            self.assertEqual(white_games + db.outcomes(start, 'B')[0], 8)
+
+    def testRowsRebuildGames(self):
+        game = KubaGame(('White', 'W'), ('Black', 'B'))
+        positions = []
+        for player, move in (('White', ((5, 6), 'L')), ('Black', ((6, 0), 'R')), ('White', ((5, 5), 'L'))):
+            positions.append((game.snapshot(), game.players[player].color))
+            game.make_move(player, *move)
+        with PositionDB(self._path, writable=True) as db:
+            db.append_game(positions, 'B')
+            for row, (snapshot, to_move) in zip(db, positions):
+                self.assertEqual(row.snapshot, snapshot)
+                self.assertEqual(row.to_move, to_move)
+                self.assertEqual(row.winner, 'B')
+                rebuilt = row.game(board_type=BitBoard)
+                self.assertEqual(rebuilt.snapshot(), snapshot)
+                board = row.board()
+                self.assertEqual([[marble and marble.color for marble in cells] for cells in board],
+                                 [[marble and marble.color for marble in cells] for cells in rebuilt.board.board])
+            self.assertEqual(db.find(positions[1][0]), [1])
+            self.assertEqual(db.find(game.snapshot()), [])
+
+    def testIndexGrowsAndReopens(self):
+        snapshots = []
+        game = KubaGame(('White', 'W'), ('Black', 'B'))
+        for red in range(7):
+            for left in range(1, 9):
+                game.player_a.red_captured = red
+                game.player_a.marbles_left = left
+                snapshots.append(game.snapshot())
+        with PositionDB(self._path, writable=True, index_slots=4) as db:
+            db.append((snapshot, 'W', None, 0) for snapshot in snapshots[:10])
+            db.append((snapshot, 'W', 'W', 1) for snapshot in snapshots)
+        with PositionDB(self._path) as db:
+            self.assertEqual(len(db), 10 + len(snapshots))
+            for index, snapshot in enumerate(snapshots):
+                self.assertEqual(db.find(snapshot), ([index] if index < 10 else []) + [10 + index])
+
+    def testDuplicatePositions(self):
+        start = KubaGame(('White', 'W'), ('Black', 'B')).snapshot()
+        other = KubaGame(('White', 'W'), ('Black', 'B'))
+        other.make_move('White', (6, 6), 'F')
+        with PositionDB(self._path, writable=True, index_slots=4) as db:
+            for _ in range(300):
+                db.append([(start, 'W', 'W', 0), (other.snapshot(), 'B', 'W', 1)])
+            self.assertEqual(db.positions, 2)
+        with PositionDB(self._path) as db:
+            self.assertEqual(db.positions, 2)
+            self.assertEqual(db.find(start), list(range(0, 600, 2)))
+            self.assertEqual(db.find(other.snapshot()), list(range(1, 600, 2)))
+            self.assertEqual(db.outcomes(start), (300, 300, 0, 0))
+
+    def testKoRuleMove(self):
+        game = KubaGame(('White', 'W'), ('Black', 'B'))
+        game.make_move('White', (6, 6), 'F')
+        self.assertIsNotNone(game.ko_rule_move)
+        with PositionDB(self._path, writable=True) as db:
+            db.append([(game.snapshot(), 'B', None, 1)])
+            row = db.row(0)
+            self.assertEqual(row.ko_rule_move, game.ko_rule_move)
+            self.assertEqual(row.game().ko_rule_move, game.ko_rule_move)
+            self.assertEqual(row.game().snapshot(), game.snapshot())
+
+    def testAppendClosesOldMap(self):
+        snapshot = KubaGame(('White', 'W'), ('Black', 'B')).snapshot()
+        with PositionDB(self._path, writable=True) as db:
+            db.append([(snapshot, 'W', None, 0)])
+            rows = db._rows()
+            db.append([(snapshot, 'B', None, 0)])
+            self.assertTrue(rows.closed)
+            self.assertEqual(db.find(snapshot), [0, 1])
+
+    def testReadOnly(self):
+        with self.assertRaises(FileNotFoundError):
+            PositionDB(self._path)
+        PositionDB(self._path, writable=True).close()
+        with PositionDB(self._path) as db:
+            self.assertEqual(list(db), [])
+            with self.assertRaises(ValueError):
+                db.append([])
+
+if __name__ == '__main__':
+    unittest.main(exit=False)
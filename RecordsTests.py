@@ -0,0 +1,79 @@
+import json
+import os
+import tempfile
+import unittest
+from KubaGame import KubaGame, BitBoard
+from records import RecordWriter, read_games, replay, replay_games, encode_move, decode_move, encode_moves, \
+    record_size
+from simulate import play_game
+
+class TestRecords(unittest.TestCase):
+    """ Contains tests for the binary game records"""
+
+    def setUp(self) -> None:
+        self._dir = tempfile.TemporaryDirectory()
+        self._path = os.path.join(self._dir.name, 'games.kgr')
+
+    def tearDown(self) -> None:
+        self._dir.cleanup()
+
+    def testMoveCodes(self):
+        codes = set()
+        for row in range(7):
+            for col in range(7):
+                for dir in 'FBLR':
+                    code = encode_move(((row, col), dir))
+                    self.assertEqual(decode_move(code), ((row, col), dir))
+                    codes.add(code)
+        self.assertEqual(codes, set(range(196)))
+
+    def testWriteAndReplay(self):
+        results = [play_game(index, 'greedy', 'random', index, max_plies=80, keep_moves=True) for index in range(5)]
+        with RecordWriter(self._path) as writer:
+            for result in results:
+                writer.write_moves(result['record'])
+        games = list(read_games(self._path))
+        self.assertEqual(games, [result['record'] for result in results])
+        for game, result in zip(replay_games(self._path, BitBoard), results):
+            self.assertEqual(len(game.move_log), result['moves'])
+            self.assertEqual(game.get_captured('White'), result['white_red_captured'])
+            self.assertEqual(game.get_captured('Black'), result['black_red_captured'])
+
+    def testAppend(self):
+        game = KubaGame(('White', 'W'), ('Black', 'B'))
+        game.make_move('Black', (6, 0), 'R')
+        with RecordWriter(self._path) as writer:
+            writer.write_game(game)
+        with RecordWriter(self._path, append=True) as writer:
+            writer.write_game(game)
+        games = [replay(data) for data in read_games(self._path)]
+        self.assertEqual(len(games), 2)
+        self.assertEqual(games[1].get_marble((6, 1)), 'B')
+        self.assertEqual(games[1].get_current_turn(), 'White')
+
+    def testSmallerThanJson(self):
+        result = play_game(0, 'random', 'random', 1, max_plies=200, keep_moves=True)
+        moves = replay(result['record']).move_log
+        self.assertLess(len(encode_moves(moves)) * 10, len(json.dumps(moves)))
+
+    def testLargerBoard(self):
+        results = [play_game(index, 'greedy', 'random', index, max_plies=60, keep_moves=True, size=9)
+                   for index in range(3)]
+        with RecordWriter(self._path, size=9) as writer:
+            for result in results:
+                writer.write_moves(result['record'])
+        self.assertEqual(record_size(self._path), 9)
+        for game, result in zip(replay_games(self._path), results):
+            self.assertEqual(game.board.size, 9)
+            self.assertEqual(len(game.move_log), result['moves'])
+            self.assertEqual(len(result['record']), 2 * result['moves'])
+            self.assertEqual(game.get_captured('White'), result['white_red_captured'])
+        with self.assertRaises(ValueError):
+            RecordWriter(self._path, append=True)
+
+    def testIllegalMove(self):
+        with self.assertRaises(ValueError):
+            replay(encode_moves([((0, 1), 'L')]))
+
+if __name__ == '__main__':
+    unittest.main(exit=False)
@@ -0,0 +1,123 @@
+import os
+import tempfile
+import unittest
+from KubaGame import KubaGame, BitBoard, WhiteMarble, BlackMarble, RedMarble
+from search import AlphaBetaSearch, TranspositionTable, LinearEvaluation, legal_moves, pushed_off_color, evaluate, \
+    position_features, EXACT, WIN_SCORE, RED_WEIGHT, MARBLE_WEIGHT, MOBILITY_WEIGHT
+
+class TestSearch(unittest.TestCase):
+    """ Contains tests for the alpha-beta search"""
+
+    def winningBoard(self):
+        board = [[None] * 7 for _ in range(7)]
+        board[0][0] = BlackMarble((0, 0))
+        board[6][0] = BlackMarble((6, 0))
+        board[3][5] = WhiteMarble((3, 5))
+        board[3][6] = RedMarble((3, 6))
+        board[5][3] = WhiteMarble((5, 3))
+        board[1][3] = RedMarble((1, 3))
+        return board
+
+    def testFindsWinningCapture(self):
+        game = KubaGame(('Jason', 'W'), ('Sunny', 'B'), self.winningBoard())
+        game.player_a.red_captured = 6
+        result = AlphaBetaSearch(max_depth=3, time_limit=None).search(game, 'Jason')
+        self.assertEqual(result.move, ((3, 5), 'R'))
+        self.assertGreater(result.score, WIN_SCORE - 1000)
+
+    def testGameUnchanged(self):
+        game = KubaGame(('Jason', 'W'), ('Sunny', 'B'), board_type=BitBoard)
+        game.make_move('Jason', (5, 6), 'L')
+        position_hash = game.position_hash
+        counts = game.get_marble_count()
+        AlphaBetaSearch(max_depth=3, time_limit=None).search(game)
+        self.assertEqual(game.position_hash, position_hash)
+        self.assertEqual(game.get_marble_count(), counts)
+        self.assertEqual(game.get_current_turn(), 'Sunny')
+
+    def testReproducible(self):
+        game = KubaGame(('Jason', 'W'), ('Sunny', 'B'))
+        first = AlphaBetaSearch(max_depth=3, time_limit=None).search(game, 'Jason')
+        second = AlphaBetaSearch(max_depth=3, time_limit=None).search(game, 'Jason')
+        self.assertEqual((first.move, first.score, first.nodes), (second.move, second.score, second.nodes))
+        self.assertTrue(game.make_move('Jason', *first.move))
+
+    def testNodeLimit(self):
+        game = KubaGame(('Jason', 'W'), ('Sunny', 'B'))
+        result = AlphaBetaSearch(max_depth=20, time_limit=None, max_nodes=500).search(game, 'Jason')
+        self.assertIsNotNone(result.move)
+        self.assertLess(result.depth, 20)
+
+    def testLegalMovesSkipSelfCapture(self):
+        game = KubaGame(('Jason', 'W'), ('Sunny', 'B'))
+        self.assertEqual(pushed_off_color(game.board, ((0, 1), 'L')), 'W')
+        self.assertNotIn(((0, 1), 'L'), legal_moves(game, game.player_a))
+        self.assertIn(((0, 0), 'B'), legal_moves(game, game.player_a))
+
+    def testRepetitionRules(self):
+        game = KubaGame(('Jason', 'W'), ('Sunny', 'B'), superko=True, move_limit=4)
+        for player, coord, dir in (('Jason', (0, 0), 'B'), ('Sunny', (0, 6), 'B'), ('Jason', (2, 0), 'F')):
+            game.make_move(player, coord, dir)
+        self.assertNotIn(((2, 6), 'F'), legal_moves(game, game.player_b))
+        result = AlphaBetaSearch(max_depth=3, time_limit=None).search(game, 'Sunny')
+        self.assertNotEqual(result.move, ((2, 6), 'F'))
+        self.assertTrue(game.make_move('Sunny', *result.move))
+        self.assertTrue(game.draw)
+        self.assertIsNone(AlphaBetaSearch(max_depth=3, time_limit=None).search(game, 'Jason').move)
+
+class TestLinearEvaluation(unittest.TestCase):
+    """ Contains tests for the feature based evaluation"""
+
+    def testFeatures(self):
+        game = KubaGame(('Jason', 'W'), ('Sunny', 'B'))
+        self.assertEqual(position_features(game, game.player_a, game.player_b), (0, 0, 0, 0, 0, 0))
+        game.make_move('Jason', (5, 6), 'L')
+        game.player_a.red_captured = 2
+        features = position_features(game, game.player_a, game.player_b)
+        self.assertEqual(features[0], 2)
+        self.assertEqual(features[3], -1)
+        self.assertEqual(features, tuple(-value for value in position_features(game, game.player_b, game.player_a)))
+
+    def testMatchesEvaluate(self):
+        evaluation = LinearEvaluation({'red_captured': RED_WEIGHT, 'marbles': MARBLE_WEIGHT,
+                                       'mobility': MOBILITY_WEIGHT})
+        game = KubaGame(('Jason', 'W'), ('Sunny', 'B'), board_type=BitBoard)
+        for player_name, move in (('Jason', ((5, 6), 'L')), ('Sunny', ((6, 0), 'R')), ('Jason', ((5, 5), 'L'))):
+            game.make_move(player_name, *move)
+            players = (game.player_a, game.player_b)
+            self.assertEqual(evaluation(game, *players), evaluate(game, *players))
+        first = AlphaBetaSearch(max_depth=3, time_limit=None).search(game, 'Sunny')
+        second = AlphaBetaSearch(max_depth=3, time_limit=None, evaluation=evaluation).search(game, 'Sunny')
+        self.assertEqual((first.move, first.score), (second.move, second.score))
+
+    def testSaveAndLoad(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'weights.json')
+            LinearEvaluation({'red_captured': 80.5, 'red_threats': 30}, {'positions': 10}).save(path)
+            evaluation = LinearEvaluation.load(path)
+        self.assertEqual(evaluation.weights['red_captured'], 80.5)
+        self.assertEqual(evaluation.weights['mobility'], 0.0)
+        self.assertEqual(evaluation.info, {'positions': 10})
+        with self.assertRaises(ValueError):
+            LinearEvaluation({'center': 1})
+
+class TestTranspositionTable(unittest.TestCase):
+    """ Contains tests for the transposition table replacement policy"""
+
+    def testDeeperEntryKept(self):
+        table = TranspositionTable(4)
+        table.store(1, 5, 10, EXACT, None)
+        table.store(5, 2, 20, EXACT, None)
+        self.assertEqual(table.probe(1), (5, 10, EXACT, None))
+        self.assertIsNone(table.probe(5))
+
+    def testOlderSearchReplaced(self):
+        table = TranspositionTable(4)
+        table.store(1, 5, 10, EXACT, None)
+        table.new_search()
+        table.store(5, 2, 20, EXACT, None)
+        self.assertEqual(table.probe(5), (2, 20, EXACT, None))
+        self.assertIsNone(table.probe(1))
+
+if __name__ == '__main__':
+    unittest.main(exit=False)
@@ -0,0 +1,93 @@
+import asyncio
+import json
+import unittest
+import loadclient
+from server import KubaServer, ServerStats
+from stats import percentile
+
+class TestServer(unittest.TestCase):
+    """ Contains tests for the asyncio game server"""
+
+    def runServer(self, client):
+        async def main():
+            server = KubaServer(port=0)
+            await server.start()
+            try:
+                return await client(server)
+            finally:
+                await server.close()
+        return asyncio.run(main())
+
+    def testLoadClient(self):
+        async def client(server):
+            summary = await loadclient.run('127.0.0.1', server.port, games=6, concurrency=3, seed=1, max_plies=60)
+            await asyncio.sleep(0.05)
+            return summary, len(server.sessions)
+        summary, active = self.runServer(client)
+        self.assertGreater(summary['moves'], 0)
+        self.assertEqual(summary['server']['moves'], summary['moves'])
+        self.assertEqual(summary['server']['sessions_created'], 6)
+        self.assertEqual(summary['server']['rejected'], 0)
+        self.assertEqual(active, 0)
+
+    def testBroadcastAndRejection(self):
+        async def client(server):
+            white = await asyncio.open_connection('127.0.0.1', server.port)
+            black = await asyncio.open_connection('127.0.0.1', server.port)
+            send = lambda connection, message: connection[1].write(json.dumps(message).encode() + b'\n')
+            read = lambda connection: connection[0].readline()
+
+            send(white, {'op': 'new', 'id': 1})
+            joined = json.loads(await read(white))
+            session = joined['session']
+            send(black, {'op': 'join', 'session': session})
+            self.assertEqual(json.loads(await read(black))['player'], 'Black')
+
+            send(white, {'op': 'move', 'session': session, 'coord': [5, 6], 'dir': 'F'})
+            rejected = json.loads(await read(white))
+
+            send(white, {'op': 'move', 'session': session, 'coord': [5, 6], 'dir': 'L', 'id': 2})
+            to_white = json.loads(await read(white))
+            to_black = json.loads(await read(black))
+            for connection in (white, black):
+                connection[1].close()
+            return joined, rejected, to_white, to_black
+        joined, rejected, to_white, to_black = self.runServer(client)
+        self.assertEqual(joined['id'], 1)
+        self.assertEqual(joined['board'][0], 'WW...BB')
+        self.assertEqual(rejected['type'], 'error')
+        self.assertEqual(to_white['type'], 'move')
+        self.assertEqual(to_white, to_black)
+        self.assertEqual(sorted(to_white['changes']), [[5, 4, 'W'], [5, 6, '.']])
+        self.assertEqual(to_white['turn'], 'Black')
+
+    def testUnknownSession(self):
+        async def client(server):
+            reader, writer = await asyncio.open_connection('127.0.0.1', server.port)
+            writer.write(b'{"op": "state", "session": "nope"}\nnot json\n')
+            replies = [json.loads(await reader.readline()) for _ in range(2)]
+            writer.close()
+            return replies
+        for reply in self.runServer(client):
+            self.assertEqual(reply['type'], 'error')
+
+    def testStats(self):
+        stats = ServerStats(window=2.0)
+        for latency in range(1, 101):
+            stats.record_move(latency / 1000, now=10.5)
+        self.assertEqual(stats.moves_per_second(now=10.5), 50.0)
+        self.assertEqual(stats.moves_per_second(now=20.0), 0.0)
+        self.assertEqual(stats.latency_percentile(99), 0.099)
+        self.assertEqual(percentile([], 99), 0.0)
+
+    def testSteadyRate(self):
+        stats = ServerStats(window=5.0)
+        for second in range(100):
+            for tenth in range(10):
+                stats.record_move(0.001, now=1000 + second + tenth / 10)
+        self.assertAlmostEqual(stats.moves_per_second(now=1099.95), 10.0)
+        self.assertAlmostEqual(stats.moves_per_second(now=1100.0), 10.0)
+        self.assertAlmostEqual(stats.moves_per_second(now=1102.0), 6.0)
+
+if __name__ == '__main__':
+    unittest.main(exit=False)
@@ -0,0 +1,76 @@
+import io
+import json
+import unittest
+from simulate import play_game, run, make_policy, random_policy
+from search import legal_moves
+from KubaGame import KubaGame
+
+# Both players push a corner pair down and back up, the position repeats every 4 moves
+CYCLE = (((0, 0), 'B'), ((0, 6), 'B'), ((2, 0), 'F'), ((2, 6), 'F'))
+
+
+def cycle_policy(seed):
+    """ Policy that plays the moves of CYCLE whenever it can """
+    fallback = random_policy(seed)
+
+    def policy(game, player_name):
+        moves = legal_moves(game, game.players[player_name])
+        for move in CYCLE:
+            if move in moves:
+                return move
+        return fallback(game, player_name)
+    return policy
+
+class TestSimulate(unittest.TestCase):
+    """ Contains tests for the headless self-play simulator"""
+
+    def testDeterministicGames(self):
+        first = play_game(0, 'greedy', 'random', 42)
+        second = play_game(0, 'greedy', 'random', 42)
+        del first['duration'], second['duration']
+        self.assertEqual(first, second)
+
+    def testStreamsResults(self):
+        output = io.StringIO()
+        summary = run(4, 'random', 'greedy', seed=3, max_plies=40, output=output)
+        lines = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual(len(lines), 4)
+        self.assertEqual(sorted(line['seed'] for line in lines), [3, 4, 5, 6])
+        self.assertEqual(summary['white_wins'] + summary['black_wins'] + summary['no_result'], 4)
+        self.assertEqual(summary['moves'], sum(line['moves'] for line in lines))
+
+    def testWorkersMatchSingleProcess(self):
+        single = io.StringIO()
+        pooled = io.StringIO()
+        run(3, 'random', 'random', seed=8, max_plies=30, output=single)
+        run(3, 'random', 'random', seed=8, workers=2, max_plies=30, output=pooled)
+        strip = lambda text: sorted((line['game'], line['winner'], line['moves'])
+                                    for line in map(json.loads, text.splitlines()))
+        self.assertEqual(strip(single.getvalue()), strip(pooled.getvalue()))
+
+    def testPolicyOptions(self):
+        game = KubaGame(('White', 'W'), ('Black', 'B'))
+        policy = make_policy('alphabeta:depth=1', 0)
+        self.assertTrue(game.make_move('White', *policy(game, 'White')))
+        policy = make_policy('simulate.random_policy', 0)
+        self.assertTrue(game.make_move('Black', *policy(game, 'Black')))
+
+    def testRepetitionDraw(self):
+        # The library draws at the third repetition by default, like the command line
+        result = play_game(0, 'SimulateTests.cycle_policy', 'SimulateTests.cycle_policy', 3)
+        self.assertIsNone(result['winner'])
+        self.assertEqual(result['draw'], 'repetition')
+        self.assertLess(result['moves'], 20)
+        result = play_game(0, 'SimulateTests.cycle_policy', 'SimulateTests.cycle_policy', 3, max_plies=50,
+                           repetitions=None)
+        self.assertEqual((result['draw'], result['moves']), ('move_limit', 50))
+
+    def testSuperko(self):
+        result = play_game(0, 'SimulateTests.cycle_policy', 'SimulateTests.cycle_policy', 3, max_plies=60,
+                           superko=True, repetitions=3)
+        self.assertGreater(result['moves'], 20)
+        summary = run(2, 'random', 'random', seed=5, max_plies=100, superko=True, repetitions=3)
+        self.assertEqual(summary['games'], 2)
+
+if __name__ == '__main__':
+    unittest.main(exit=False)
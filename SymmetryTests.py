@@ -0,0 +1,100 @@
+import random
+import unittest
+from KubaGame import KubaGame, BitBoard
+from records import PLAYERS
+from search import legal_moves
+from symmetry import TRANSFORMS, SWAP_COLORS, transform_coord, transform_move, transform_snapshot, inverse, \
+    canonical_snapshot, canonical, canonical_game, to_canonical, from_canonical
+
+
+def sample_games(count, seed=0):
+    """ Plays random games and yields a game and the name of the player to move after every move """
+    rng = random.Random(seed)
+    for _ in range(count):
+        game = KubaGame(*PLAYERS, board_type=BitBoard)
+        player_name = rng.choice(['White', 'Black'])
+        for _ in range(rng.randrange(1, 60)):
+            moves = legal_moves(game, game.players[player_name])
+            if game.get_winner() is not None or not moves:
+                break
+            game.make_move(player_name, *rng.choice(moves))
+            player_name = game.get_current_turn()
+            yield game, player_name
+
+
+def image_name(player_name, transform):
+    """ Name of the player who owns the marbles of a player in the image of a position """
+    if not transform & SWAP_COLORS:
+        return player_name
+    return 'Black' if player_name == 'White' else 'White'
+
+
+class TestSymmetry(unittest.TestCase):
+    """ Contains tests for the symmetries of positions"""
+
+    def testTransforms(self):
+        self.assertEqual(transform_coord((0, 1), 1), (1, 6))
+        self.assertEqual(transform_move(((0, 1), 'R'), 1), ((1, 6), 'B'))
+        self.assertEqual(transform_move(((2, 3), 'F'), 4 | SWAP_COLORS), ((2, 3), 'F'))
+        self.assertEqual(transform_coord((0, 0), 2, size=9), (8, 8))
+        for transform in TRANSFORMS:
+            self.assertEqual(inverse(inverse(transform)), transform)
+            for move in (((0, 1), 'R'), ((3, 5), 'F'), ((6, 2), 'L')):
+                self.assertEqual(transform_move(transform_move(move, transform), inverse(transform)), move)
+                self.assertEqual(from_canonical(to_canonical(move, transform), transform), move)
+        self.assertEqual(len({transform_coord((0, 1), transform) for transform in range(8)}), 8)
+
+    def testStartPosition(self):
+        snapshot = KubaGame(*PLAYERS).snapshot()
+        symmetric = [transform for transform in TRANSFORMS if transform_snapshot(snapshot, transform) == snapshot]
+        self.assertEqual(len(symmetric), 8)
+        self.assertIn(2, symmetric)
+        self.assertIn(1 | SWAP_COLORS, symmetric)
+
+    def testMovesCommute(self):
+        rng = random.Random(1)
+        for game, player_name in sample_games(6):
+            snapshot = game.snapshot()
+            moves = legal_moves(game, game.players[player_name])
+            for transform in TRANSFORMS:
+                image = KubaGame.from_snapshot(transform_snapshot(snapshot, transform), *PLAYERS, BitBoard)
+                name = image_name(player_name, transform)
+                self.assertEqual(sorted(legal_moves(image, image.players[name])),
+                                 sorted(transform_move(move, transform) for move in moves))
+                if not moves:
+                    continue
+                move = rng.choice(moves)
+                self.assertTrue(image.make_move(name, *transform_move(move, transform)))
+                played = KubaGame.from_snapshot(snapshot, *PLAYERS, BitBoard)
+                played.make_move(player_name, *move)
+                self.assertEqual(image.snapshot(), transform_snapshot(played.snapshot(), transform))
+                self.assertEqual(image.get_winner(), None if played.get_winner() is None else
+                                 image_name(played.get_winner(), transform))
+
+    def testCanonicalForm(self):
+        for game, player_name in sample_games(4, seed=2):
+            snapshot = game.snapshot()
+            form, transform = canonical(game)
+            self.assertEqual(transform_snapshot(snapshot, transform), form)
+            self.assertEqual(canonical_snapshot(form)[0], form)
+            for other in TRANSFORMS:
+                self.assertEqual(canonical_snapshot(transform_snapshot(snapshot, other))[0], form)
+
+    def testCanonicalGame(self):
+        game = KubaGame(*PLAYERS)
+        game.make_move('White', (6, 6), 'F')
+        image, transform = canonical_game(game)
+        self.assertEqual(image.snapshot(), canonical(game)[0])
+        name = image_name('Black', transform)
+        self.assertEqual(image.get_current_turn(), name)
+        for move in legal_moves(game, game.players['Black']):
+            self.assertIn(to_canonical(move, transform), legal_moves(image, image.players[name]))
+
+    def testBadSnapshot(self):
+        with self.assertRaises(ValueError):
+            canonical_snapshot(b'\x00' * 5)
+        with self.assertRaises(ValueError):
+            transform_snapshot(b'\x00' * 30, 1)
+
+if __name__ == '__main__':
+    unittest.main(exit=False)
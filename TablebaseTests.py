@@ -0,0 +1,207 @@
+import os
+import random
+import tempfile
+import time
+import unittest
+from KubaGame import KubaGame
+from search import AlphaBetaSearch, legal_moves, pushed_off_color, WIN_SCORE
+from tablebase import (Tablebase, build, materials, material_states, placement_rank, placement_masks, placements,
+                       tablebase_policy, forward_chunk, ko_count, decode, WIN, LOSS, DRAW, DIRS, BEHIND, _push,
+                       _ko_index, _OPPOSITE)
+
+PLAYERS = (('White', 'W'), ('Black', 'B'))
+
+def position(cells, side, ko=None):
+    """ Builds the game with a white, a black and a red marble and 6 red marbles captured by each player """
+    snapshot = b''.join((1 << cell).to_bytes(7, 'little') for cell in cells) + bytes((6, 1, 6, 1, 1 + side, 255))
+    game = KubaGame.from_snapshot(snapshot, *PLAYERS)
+    if ko is not None:
+        game.ko_rule_move = ko
+    return game
+
+def material_position(masks, material, side):
+    """ Builds the game of a placement of a material with the side to move and no ko rule move """
+    white, black, red, red_white = material
+    snapshot = (b''.join(mask.to_bytes(7, 'little') for mask in masks)
+                + bytes((red_white, white, 13 - red - red_white, black, 1 + side, 255)))
+    return KubaGame.from_snapshot(snapshot, *PLAYERS)
+
+class TestTablebase(unittest.TestCase):
+    """ Contains tests for the retrograde endgame tablebase"""
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls._dir = tempfile.TemporaryDirectory()
+        cls._checkpoint = os.path.join(cls._dir.name, 'checkpoint')
+        cls._path = os.path.join(cls._dir.name, 'kuba3.ktb')
+        cls._positions = build(3, cls._path, checkpoint=cls._checkpoint, chunk_placements=40000)
+        cls._table = Tablebase(cls._path)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls._table.close()
+        cls._dir.cleanup()
+
+    def testIndexing(self):
+        self.assertEqual(materials(3), [(1, 1, 1, 6)])
+        self.assertEqual(len(materials(4)), 5)
+        self.assertEqual(self._positions, material_states((1, 1, 1, 6)))
+        rng = random.Random(3)
+        for _ in range(200):
+            white, black, red = rng.randint(1, 3), rng.randint(1, 3), rng.randint(1, 3)
+            rank = rng.randrange(placements(white, black, red))
+            masks = placement_masks(rank, white, black, red)
+            self.assertEqual([mask.bit_count() for mask in masks], [white, black, red])
+            self.assertEqual(masks[0] & masks[1] | masks[0] & masks[2] | masks[1] & masks[2], 0)
+            self.assertEqual(placement_rank(*masks, white, black, red), rank)
+
+    def testProbeMatchesEngine(self):
+        rng = random.Random(1)
+        results = set()
+        for _ in range(300):
+            game = position(rng.sample(range(49), 3), rng.randrange(2))
+            ko_moves = [move for player in (game.player_a, game.player_b)
+                        for move in player.available_moves(game.board, None)]
+            game.ko_rule_move = rng.choice([None] + ko_moves)
+            value = self._table.probe(game)
+            player_name = game.get_current_turn()
+            winner = game.get_winner()
+            if winner is not None:
+                expected = (WIN if winner == player_name else LOSS, 0)
+            elif not legal_moves(game, game.players[player_name]):
+                expected = (LOSS, 0)
+            else:
+                expected = self._table.best_move(game)[1]
+            self.assertEqual(value, expected)
+            results.add(value[0])
+        self.assertEqual(results, {WIN, LOSS, DRAW})
+
+    def testBestPlayKeepsDistance(self):
+        rng = random.Random(5)
+        while True:
+            game = position(rng.sample(range(49), 3), 0)
+            result, distance = self._table.probe(game)
+            if result == WIN and distance >= 3:
+                break
+        policy = tablebase_policy(self._table, lambda game, player_name: None)
+        for ply in range(distance):
+            player_name = game.get_current_turn()
+            self.assertEqual(self._table.probe(game)[1], distance - ply)
+            self.assertTrue(game.make_move(player_name, *policy(game, player_name)))
+        if game.get_winner() is None:
+            self.assertEqual(legal_moves(game, game.player_b), [])
+        else:
+            self.assertEqual(game.get_winner(), 'White')
+
+    def testNotCovered(self):
+        self.assertIsNone(self._table.probe(KubaGame(*PLAYERS)))
+        game = position((0, 24, 48), 0)
+        self.assertIsNotNone(self._table.probe(game))
+        game.player_a.red_captured = 5
+        self.assertIsNone(self._table.probe(game))
+        self.assertIsNone(self._table.probe(KubaGame.from_snapshot(game.snapshot(), *reversed(PLAYERS))))
+
+    def testPushMatchesEngine(self):
+        rng = random.Random(7)
+        moves = 0
+        for _ in range(300):
+            white, black, red = rng.randint(1, 8), rng.randint(1, 8), rng.randint(1, 13)
+            cells = rng.sample(range(49), white + black + red)
+            masks = [sum(1 << cell for cell in part)
+                     for part in (cells[:white], cells[white:white + black], cells[white + black:])]
+            occupied = masks[0] | masks[1] | masks[2]
+            material = (white, black, red, 0)
+            for cell in cells[:white + black]:
+                for dir_index, dir in enumerate(DIRS):
+                    if BEHIND[cell][dir_index] >= 0 and occupied >> BEHIND[cell][dir_index] & 1:
+                        continue
+                    game = material_position(masks, material, 0)
+                    after = list(masks)
+                    pushed_off, end = _push(after, cell, dir_index)
+                    record = game.apply_move(divmod(cell, 7), dir)
+                    board = game.board.masks
+                    self.assertEqual(after, [board['W'], board['B'], board['R']])
+                    self.assertEqual(None if pushed_off is None else 'WBR'[pushed_off],
+                                     None if record.pushed_off is None else record.pushed_off.color)
+                    if end is None:
+                        self.assertIsNone(game.ko_rule_move)
+                        continue
+                    ko_move = (divmod(end, 7), DIRS[_OPPOSITE[dir_index]])
+                    self.assertEqual(game.ko_rule_move, ko_move)
+                    playable = any(ko_move in player.available_moves(game.board, None)
+                                   for player in (game.player_a, game.player_b))
+                    self.assertEqual(_ko_index(after, end, _OPPOSITE[dir_index]) != 0, playable)
+                    moves += 1
+        self.assertGreater(moves, 1000)
+
+    def testCapturesIntoSmallerMaterials(self):
+        # Building the 4 marble tables takes far too long for a test, so the moves of 4 marble positions that capture
+        # into the 3 marble table are checked against the engine, the probes of the 3 marble table and the search
+        rng = random.Random(11)
+        searched = 0
+        for material in materials(4)[1:]:
+            white, black, red, _ = material
+            kos = ko_count(white, black)
+            found = 0
+            while found < 25:
+                rank = rng.randrange(placements(white, black, red))
+                masks = placement_masks(rank, white, black, red)
+                side = rng.randrange(2)
+                game = material_position(masks, material, side)
+                player = game.players[game.get_current_turn()]
+                if game.get_winner() is not None or not any(pushed_off_color(game.board, move) is not None
+                                                            for move in legal_moves(game, player)):
+                    continue
+                found += 1
+
+                exit_win, loss_max, escape = 0, 0, False
+                for move in legal_moves(game, player):
+                    if pushed_off_color(game.board, move) is None:
+                        continue
+                    record = game.apply_move(*move)
+                    winner = game.get_winner()
+                    if winner is not None:
+                        result, distance = (WIN if winner == player.name else LOSS), 1
+                    else:
+                        reply, reply_distance = self._table.probe(game)
+                        self.assertIsNotNone(reply)
+                        result = LOSS if reply == WIN else WIN if reply == LOSS else DRAW
+                        distance = None if reply_distance is None else reply_distance + 1
+                        if reply != DRAW and reply_distance <= 5:
+                            opponent = game.players[game.get_current_turn()]
+                            if reply_distance == 0:
+                                self.assertEqual(legal_moves(game, opponent), [])
+                            else:
+                                search = AlphaBetaSearch(max_depth=reply_distance, time_limit=None)
+                                score = search.search(game).score
+                                self.assertEqual(score, (WIN_SCORE - reply_distance) * (1 if reply == WIN else -1))
+                                searched += 1
+                    game.undo_move(record)
+                    if result == WIN:
+                        exit_win = distance if not exit_win else min(exit_win, distance)
+                    elif result == LOSS:
+                        loss_max = max(loss_max, distance)
+                    else:
+                        escape = True
+
+                chunk = forward_chunk(material, rank, rank + 1, self._checkpoint)
+                local = side * kos
+                self.assertEqual(chunk['term'][local], 0)
+                self.assertEqual(chunk['exit_win'][local], exit_win)
+                self.assertEqual(chunk['loss_max'][local], loss_max)
+                self.assertEqual(chunk['escape'][local], escape)
+                if exit_win == 1:
+                    result = AlphaBetaSearch(max_depth=1, time_limit=None).search(game)
+                    self.assertEqual(result.score, WIN_SCORE - 1)
+        self.assertGreater(searched, 0)
+
+    def testResumeFromCheckpoint(self):
+        path = os.path.join(self._dir.name, 'again.ktb')
+        start = time.perf_counter()
+        build(3, path, checkpoint=self._checkpoint)
+        self.assertLess(time.perf_counter() - start, 5)
+        with open(path, 'rb') as again, open(self._path, 'rb') as first:
+            self.assertEqual(again.read(), first.read())
+
+if __name__ == '__main__':
+    unittest.main(exit=False)
@@ -0,0 +1,323 @@
+# Description: NumPy batch representation of many Kuba boards stepped in lockstep.
+
+import numpy as np
+
+from KubaGame import Board, SNAPSHOT_SIZE, geometry
+
+# Cell codes
+EMPTY = 0
+WHITE = 1
+BLACK = 2
+RED = 3
+COLOR_CODES = {'W': WHITE, 'B': BLACK, 'R': RED}
+CODE_COLORS = {WHITE: 'W', BLACK: 'B', RED: 'R'}
+
+# Direction indices, the order of the last axis of the legal move masks
+DIRS = ('F', 'B', 'L', 'R')
+DIR_INDEX = {dir: index for index, dir in enumerate(DIRS)}
+_OPPOSITE = np.array([DIR_INDEX['B'], DIR_INDEX['F'], DIR_INDEX['R'], DIR_INDEX['L']], dtype=np.int8)
+
+# Batch boards are standard 7x7 boards, the only size snapshots encode
+_GEOMETRY = geometry(7)
+SIZE = _GEOMETRY.size
+_CELLS = SIZE * SIZE
+
+# Off board cells in the ray table point at this extra column of the flattened boards
+_OFF = _CELLS
+
+
+def _ray_table():
+    """
+    Builds the flat cell indices of the line from every cell to the edge in every direction from Geometry.rays.
+
+    :return: int array [SIZE, SIZE, 4, SIZE + 1], padded with _OFF past the edge
+    """
+    rays = np.full((SIZE, SIZE, 4, SIZE + 1), _OFF, dtype=np.int64)
+    for index, (row, col) in enumerate(_GEOMETRY.coords):
+        for dir_index, dir in enumerate(DIRS):
+            for k, (r, c) in enumerate(_GEOMETRY.rays[index][dir]):
+                rays[row, col, dir_index, k] = r * SIZE + c
+    return rays
+
+
+RAYS = _ray_table()
+
+
+class BatchBoard:
+    """ Represents N independent Kuba games as NumPy arrays so moves can be generated and applied to all of them
+        at once. Player a of each game plays white. Rules match KubaGame.apply_move: legal_mask follows
+        Player.available_moves, including edge pushes and the ko rule, and apply_moves follows Board.update_board,
+        update_ko_rule and the marble counters.
+
+        Attributes:
+            cells: int8 array [N, 7, 7] of EMPTY, WHITE, BLACK or RED, only 7x7 boards are supported
+            ko: int8 array [N, 3] of the ko rule move (row, col, dir index), row -1 if there is none
+            red_captured: int16 array [N, 2] of red marbles captured by white and black
+            marbles_left: int16 array [N, 2] of white and black marbles left
+            to_move: int8 array [N] of the color code to move, EMPTY before the first move
+    """
+
+    def __init__(self, cells, ko=None, red_captured=None, marbles_left=None, to_move=None):
+        """
+        Initializes a batch from arrays
+
+        :param cells: array [N, 7, 7] of cell codes
+        :param ko: optional array [N, 3] of ko rule moves
+        :param red_captured: optional array [N, 2], defaults to no captures
+        :param marbles_left: optional array [N, 2], defaults to the marbles of a new game
+        :param to_move: optional array [N] of color codes, defaults to EMPTY
+        """
+        self.cells = np.array(cells, dtype=np.int8)
+        if self.cells.ndim != 3 or self.cells.shape[1:] != (SIZE, SIZE):
+            raise ValueError('batch boards must be {0}x{0}, got cells of shape {1}'.format(SIZE, self.cells.shape))
+        n = len(self.cells)
+        self.ko = np.full((n, 3), -1, dtype=np.int8) if ko is None else np.array(ko, dtype=np.int8)
+        self.red_captured = (np.zeros((n, 2), dtype=np.int16) if red_captured is None
+                             else np.array(red_captured, dtype=np.int16))
+        self.marbles_left = (np.full((n, 2), _GEOMETRY.marbles, dtype=np.int16) if marbles_left is None
+                             else np.array(marbles_left, dtype=np.int16))
+        self.to_move = np.zeros(n, dtype=np.int8) if to_move is None else np.array(to_move, dtype=np.int8)
+
+    def __len__(self):
+        return len(self.cells)
+
+    @classmethod
+    def initial(cls, n):
+        """
+        Creates a batch of games at the starting position
+
+        :param n: number of games
+        :return: BatchBoard
+        """
+        start = encode_board(Board().board)
+        return cls(np.repeat(start[None], n, axis=0))
+
+    @classmethod
+    def from_games(cls, games):
+        """
+        Creates a batch from KubaGame objects whose player a plays white
+
+        :param games: list of KubaGame
+        :return: BatchBoard
+        """
+        cells = [encode_board(game.board.board) for game in games]
+        ko = [encode_move(game.ko_rule_move) for game in games]
+        red_captured = [(game.player_a.red_captured, game.player_b.red_captured) for game in games]
+        marbles_left = [(game.player_a.marbles_left, game.player_b.marbles_left) for game in games]
+        to_move = []
+        for game in games:
+            turn = game.get_current_turn()
+            to_move.append(EMPTY if turn is None else COLOR_CODES[game.players[turn].color])
+        return cls(cells, ko, red_captured, marbles_left, to_move)
+
+    @classmethod
+    def from_snapshots(cls, snapshots):
+        """
+        Creates a batch from KubaGame.snapshot bytes without building the games, e.g. the rows of a position database
+
+        :param snapshots: uint8 array [N, SNAPSHOT_SIZE] or a list of snapshots
+        :return: BatchBoard
+        """
+        if isinstance(snapshots, (list, tuple)):
+            snapshots = np.frombuffer(b''.join(bytes(snapshot) for snapshot in snapshots), dtype=np.uint8)
+        snapshots = np.asarray(snapshots, dtype=np.uint8).reshape(-1, SNAPSHOT_SIZE)
+        n = len(snapshots)
+        # Three 7 byte little endian masks of the white, black and red marbles, cell (row, col) is bit row * 7 + col
+        bits = np.unpackbits(snapshots[:, :21].reshape(n, 3, 7), axis=2, bitorder='little')[:, :, :_CELLS]
+        codes = np.array([WHITE, BLACK, RED], dtype=np.int8)
+        cells = (bits.astype(np.int8) * codes[None, :, None]).sum(axis=1, dtype=np.int8).reshape(n, SIZE, SIZE)
+        counters = snapshots[:, 21:25].astype(np.int16)
+        # The snapshot turn is 0 for none, 1 for white and 2 for black, the same as the cell codes
+        to_move = snapshots[:, 25].astype(np.int8)
+        ko_code = snapshots[:, 26].astype(np.int64)
+        cell, dir_index = np.divmod(ko_code, 4)
+        ko = np.stack([cell // SIZE, cell % SIZE, dir_index], axis=1)
+        ko[ko_code == 255] = -1
+        return cls(cells, ko, counters[:, [0, 2]], counters[:, [1, 3]], to_move)
+
+    def legal_mask(self, colors, ko=True):
+        """
+        Computes the moves available to one color in every game, matching Player.available_moves
+
+        :param colors: color code per game, array [N] or a single code
+        :param ko: if False the ko rule is ignored, matching Board.available_moves
+        :return: bool array [N, 7, 7, 4] indexed by (game, row, col, dir index)
+        """
+        cells = self.cells
+        own = cells == np.asarray(colors, dtype=np.int8).reshape(-1, 1, 1)
+        empty = cells == EMPTY
+
+        # A marble can be pushed if the square behind it is empty or it is on the edge
+        behind = np.ones(cells.shape + (4,), dtype=bool)
+        behind[:, :-1, :, DIR_INDEX['F']] = empty[:, 1:, :]
+        behind[:, 1:, :, DIR_INDEX['B']] = empty[:, :-1, :]
+        behind[:, :, :-1, DIR_INDEX['L']] = empty[:, :, 1:]
+        behind[:, :, 1:, DIR_INDEX['R']] = empty[:, :, :-1]
+        mask = own[..., None] & behind
+        if not ko:
+            return mask
+
+        games = np.nonzero(self.ko[:, 0] >= 0)[0]
+        ko = self.ko[games].astype(np.int64)
+        mask[games, ko[:, 0], ko[:, 1], ko[:, 2]] = False
+        return mask
+
+    def pushed_off(self):
+        """
+        Computes which marble a push of every square in every direction would push off, matching Board.trace_push
+
+        :return: int8 array [N, 7, 7, 4] of the color code pushed off or EMPTY
+        """
+        n = len(self)
+        flat = np.concatenate([self.cells.reshape(n, _CELLS), np.full((n, 1), -1, dtype=np.int8)], axis=1)
+        lines = flat[:, RAYS]
+        # The chain ends at the first empty square or at the edge, a marble falls when it ends past the edge
+        length = np.argmax(lines <= EMPTY, axis=-1)[..., None]
+        end = np.take_along_axis(lines, length, axis=-1)[..., 0]
+        last = np.take_along_axis(lines, np.maximum(length - 1, 0), axis=-1)[..., 0]
+        return np.where(end < 0, last, EMPTY).astype(np.int8)
+
+    def push(self, rows, cols, dirs, active=None):
+        """
+        Pushes one chain in every active game, matching Board.update_board
+
+        :param rows: array [N] of rows played
+        :param cols: array [N] of columns played
+        :param dirs: array [N] of direction indices
+        :param active: optional bool array [N] of the games to change
+        :return: tuple (int8 array [N] of the color code pushed off or EMPTY, int array [N] of chain lengths)
+        """
+        n = len(self)
+        if active is None:
+            active = np.ones(n, dtype=bool)
+        games = np.nonzero(active)[0]
+        rows = np.asarray(rows, dtype=np.int64)[games]
+        cols = np.asarray(cols, dtype=np.int64)[games]
+        dirs = np.asarray(dirs, dtype=np.int64)[games]
+
+        flat = np.concatenate([self.cells.reshape(n, _CELLS), np.full((n, 1), -1, dtype=np.int8)], axis=1)
+        rays = RAYS[rows, cols, dirs]
+        line = flat[games[:, None], rays]
+
+        # The chain ends at the first empty square or at the edge
+        length = np.argmax(line <= EMPTY, axis=1)
+        falls = line[np.arange(len(games)), length] < 0
+        pushed_off = np.where(falls, line[np.arange(len(games)), np.maximum(length - 1, 0)], EMPTY)
+
+        # Every marble of the chain moves one square along the ray, the first square becomes empty
+        k = np.arange(SIZE + 1)
+        shifted = np.concatenate([np.zeros((len(games), 1), dtype=np.int8), line[:, :-1]], axis=1)
+        changed = (k[None, :] <= length[:, None]) & (rays != _OFF)
+        game_index = np.broadcast_to(games[:, None], rays.shape)
+        flat[game_index[changed], rays[changed]] = shifted[changed]
+        self.cells = np.ascontiguousarray(flat[:, :_CELLS]).reshape(n, SIZE, SIZE)
+
+        all_pushed_off = np.zeros(n, dtype=np.int8)
+        all_pushed_off[games] = pushed_off
+        all_length = np.zeros(n, dtype=np.int64)
+        all_length[games] = length
+        return all_pushed_off, all_length
+
+    def apply_moves(self, rows, cols, dirs, active=None):
+        """
+        Applies one move in every active game, matching KubaGame.apply_move. The player moving is the owner of the
+        marble played, the ko rule move, marble counters and side to move are updated.
+
+        :param rows: array [N] of rows played
+        :param cols: array [N] of columns played
+        :param dirs: array [N] of direction indices
+        :param active: optional bool array [N] of the games to change
+        :return: int8 array [N] of the color code pushed off or EMPTY
+        """
+        n = len(self)
+        if active is None:
+            active = np.ones(n, dtype=bool)
+        rows = np.asarray(rows, dtype=np.int64)
+        cols = np.asarray(cols, dtype=np.int64)
+        dirs = np.asarray(dirs, dtype=np.int64)
+        movers = np.where(active, self.cells[np.arange(n), rows, cols], EMPTY)
+
+        pushed_off, length = self.push(rows, cols, dirs, active)
+
+        # The ko rule move undoes the push from the square the chain ends on, unless a marble fell off
+        falls = active & (pushed_off != EMPTY)
+        sets_ko = active & ~falls
+        end = RAYS[rows, cols, dirs, np.minimum(length, SIZE)]
+        self.ko[falls] = -1
+        self.ko[sets_ko, 0] = end[sets_ko] // SIZE
+        self.ko[sets_ko, 1] = end[sets_ko] % SIZE
+        self.ko[sets_ko, 2] = _OPPOSITE[dirs[sets_ko]]
+
+        mover_index = np.where(movers == WHITE, 0, 1)
+        red = pushed_off == RED
+        self.red_captured[red, mover_index[red]] += 1
+        marble = falls & ~red
+        self.marbles_left[marble, np.where(pushed_off[marble] == WHITE, 0, 1)] -= 1
+
+        self.to_move = np.where(active, np.where(movers == WHITE, BLACK, WHITE), self.to_move).astype(np.int8)
+        return pushed_off
+
+    def winners(self):
+        """
+        Determines the winner of every game, matching KubaGame.get_winner
+
+        :return: int8 array [N] of WHITE, BLACK or EMPTY if there is no winner
+        """
+        red = self.red_captured
+        left = self.marbles_left
+        white_moves = self.legal_mask(WHITE).any(axis=(1, 2, 3))
+        black_moves = self.legal_mask(BLACK).any(axis=(1, 2, 3))
+        conditions = [red[:, 0] == _GEOMETRY.win_reds, red[:, 1] == _GEOMETRY.win_reds,
+                      (left[:, 0] == 0) & (left[:, 1] > 0), (left[:, 1] == 0) & (left[:, 0] > 0),
+                      ~white_moves, ~black_moves]
+        choices = [WHITE, BLACK, BLACK, WHITE, BLACK, WHITE]
+        return np.select(conditions, choices, EMPTY).astype(np.int8)
+
+    def sample_moves(self, mask, rng):
+        """
+        Picks a random move from a mask in every game
+
+        :param mask: bool array [N, 7, 7, 4] from legal_mask
+        :param rng: numpy.random.Generator
+        :return: tuple of arrays (rows, cols, dirs, has_move)
+        """
+        flat = mask.reshape(len(mask), -1)
+        scores = np.where(flat, rng.random(flat.shape), -1.0)
+        choice = np.argmax(scores, axis=1)
+        rows, rest = np.divmod(choice, SIZE * len(DIRS))
+        cols, dirs = np.divmod(rest, len(DIRS))
+        return rows, cols, dirs, flat.any(axis=1)
+
+
+def encode_board(board):
+    """
+    Converts a 2D array of marbles to cell codes
+
+    :param board: 2D array of marbles, as Board.board
+    :return: int8 array [7, 7]
+    """
+    return np.array([[EMPTY if marble is None else COLOR_CODES[marble.color] for marble in row] for row in board],
+                    dtype=np.int8)
+
+
+def encode_move(move):
+    """
+    Converts a move to (row, col, dir index)
+
+    :param move: move as tuple ((row, col), dir) or None
+    :return: tuple, (-1, -1, -1) for None
+    """
+    if move is None:
+        return -1, -1, -1
+    return move[0][0], move[0][1], DIR_INDEX[move[1]]
+
+
+def decode_move(row, col, dir_index):
+    """
+    Converts (row, col, dir index) to a move
+
+    :return: move as tuple ((row, col), dir) or None if row is negative
+    """
+    if row < 0:
+        return None
+    return (int(row), int(col)), DIRS[dir_index]
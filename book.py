@@ -0,0 +1,319 @@
+# Description: Opening book for the Kuba game built from game records.
+#
+# A book file starts with the 4 byte magic b'KUBB', a version byte, a flags byte, 2 padding bytes and the number of
+# slots as a 64 bit integer. An open addressing table of fixed width slots follows. Each slot holds the position hash,
+# the number of games the move was played in, the points the player making the move scored in them times two (a win
+# is 2 and a game without a result is 1) and the move encoded as in records.py. All moves of a position start probing
+# at the same slot, so a lookup reads the few slots from there to the next empty one straight from the memory map.
+#
+# A book built with symmetric=True sets FLAG_SYMMETRIC and keys positions by the snapshot_key of their canonical form
+# from symmetry.py, with moves stored in the canonical orientation. Positions that are rotations, reflections or color
+# swaps of each other share their entries, and OpeningBook.lookup maps the moves back to the orientation of the game.
+
+import argparse
+import functools
+import mmap
+import struct
+import sys
+
+import instrument
+from KubaGame import KubaGame, Board
+from posdb import snapshot_key
+from records import PLAYERS, read_games, record_size, encode_move, decode_move
+from search import legal_moves
+from symmetry import canonical, to_canonical, from_canonical
+
+MAGIC = b'KUBB'
+VERSION = 1
+HEADER = struct.Struct('<4sBB2xQ')
+FLAG_SYMMETRIC = 1
+SLOT = struct.Struct('<QIIB3x')
+
+
+class BookMove:
+    """ Represents the statistics of one book move.
+
+        Attributes:
+            move: move as tuple ((row, col), dir)
+            games: number of games the move was played in
+            points: points scored by the player making the move, a win is 1 and a game without a result is 0.5
+    """
+
+    __slots__ = ('move', 'games', 'points')
+
+    def __init__(self, move, games, points):
+        """ Initializes a book move """
+        self.move = move
+        self.games = games
+        self.points = points
+
+    @property
+    def win_rate(self):
+        """ Win rate property
+            :return points divided by games
+        """
+        return self.points / self.games
+
+    def __repr__(self):
+        return 'BookMove({}, games={}, win_rate={:.3f})'.format(self.move, self.games, self.win_rate)
+
+
+def _final_winner(game):
+    """
+    Determines the result of a replayed game the way simulate.play_game does
+
+    :return: winner name or None if the game has no result
+    """
+    winner = game.get_winner()
+    if winner is None:
+        player_name = game.get_current_turn()
+        if player_name is not None and not legal_moves(game, game.players[player_name]):
+            winner = PLAYERS[0][0] if player_name == PLAYERS[1][0] else PLAYERS[1][0]
+    return winner
+
+
+def book_key(game, symmetric=False):
+    """
+    Gets the key of the position of a game in a book
+
+    :param game: KubaGame
+    :param symmetric: True for the keys of books built with symmetric=True
+    :return: tuple (64 bit key, transform from the game to the orientation of the book moves)
+    """
+    if not symmetric:
+        return game.position_hash, 0
+    snapshot, transform = canonical(game)
+    return snapshot_key(snapshot), transform
+
+
+def collect(paths, plies=12, board_type=Board, symmetric=False):
+    """
+    Counts the moves played in the first plies of every recorded game
+
+    :param paths: record file paths
+    :param plies: number of moves of each game added to the book
+    :param board_type: board used to replay the games
+    :param symmetric: key positions by their canonical form and store moves in its orientation
+    :return: dictionary of [games, points times two] by (position key, move code)
+    """
+    stats = {}
+    for path in paths:
+        # Slots hold one byte move codes and symmetric keys come from 7x7 snapshots
+        size = record_size(path)
+        if size != 7:
+            raise ValueError('{} holds {}x{} games, opening books are built from 7x7 games only'.format(
+                path, size, size))
+        for data in read_games(path):
+            game = KubaGame(*PLAYERS, board_type=board_type)
+            colors = {color: name for name, color in PLAYERS}
+            played = []
+            for code in data:
+                coord, dir = decode_move(code)
+                player_name = game.get_current_turn() or colors.get(game.get_marble(coord))
+                if len(played) < plies:
+                    key, transform = book_key(game, symmetric)
+                    played.append((key, encode_move(to_canonical((coord, dir), transform)) if symmetric else code,
+                                   player_name))
+                if player_name is None or not game.make_move(player_name, coord, dir):
+                    raise ValueError('illegal move {} in game record'.format((coord, dir)))
+            winner = _final_winner(game)
+            for key in played:
+                entry = stats.setdefault(key[:2], [0, 0])
+                entry[0] += 1
+                entry[1] += 1 if winner is None else 2 if winner == key[2] else 0
+    return stats
+
+
+def write_book(stats, path, min_games=1, symmetric=False):
+    """
+    Writes move statistics as a book file with at most half of the slots used
+
+    :param stats: dictionary from collect
+    :param path: output file path
+    :param min_games: moves played in fewer games are left out
+    :param symmetric: True if the stats were collected with symmetric=True
+    :return: number of moves written
+    """
+    entries = [(key, code, games, points) for (key, code), (games, points) in sorted(stats.items())
+               if games >= min_games]
+    size = 16
+    while size < 2 * len(entries):
+        size *= 2
+    table = bytearray(size * SLOT.size)
+    for key, code, games, points in entries:
+        slot = key & (size - 1)
+        while SLOT.unpack_from(table, slot * SLOT.size)[1]:
+            slot = (slot + 1) & (size - 1)
+        SLOT.pack_into(table, slot * SLOT.size, key, games, points, code)
+    with open(path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, VERSION, FLAG_SYMMETRIC if symmetric else 0, size))
+        file.write(table)
+    return len(entries)
+
+
+def build_book(record_paths, path, plies=12, min_games=1, symmetric=False):
+    """
+    Builds a book file from record files
+
+    :param record_paths: record file paths
+    :param path: output file path
+    :param plies: number of moves of each game added to the book
+    :param min_games: moves played in fewer games are left out
+    :param symmetric: share the entries of positions that are symmetric images of each other
+    :return: number of moves written
+    """
+    return write_book(collect(record_paths, plies, symmetric=symmetric), path, min_games, symmetric)
+
+
+class OpeningBook:
+    """ Read only view of a book file through a memory map. Lookups cost a hash and a few slot reads. """
+
+    def __init__(self, path):
+        """
+        Opens a book file
+
+        :param path: file path
+        """
+        with open(path, 'rb') as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, flags, size = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError('{} is not a Kuba opening book'.format(path))
+        if version != VERSION:
+            raise ValueError('unsupported book version {}'.format(version))
+        if len(self._map) != HEADER.size + size * SLOT.size:
+            raise ValueError('truncated opening book')
+        self._size = size
+        self._symmetric = bool(flags & FLAG_SYMMETRIC)
+
+    @property
+    def symmetric(self):
+        """ Symmetric property
+            :return True if positions are keyed by their canonical form
+        """
+        return self._symmetric
+
+    def __len__(self):
+        return sum(1 for slot in range(self._size) if SLOT.unpack_from(self._map, HEADER.size + slot * SLOT.size)[1])
+
+    def probe(self, position_hash):
+        """
+        Gets the book moves stored under a key
+
+        :param position_hash: KubaGame.position_hash, or the key from book_key for symmetric books
+        :return: list of BookMove, empty if the position is not in the book
+        """
+        moves = []
+        mask = self._size - 1
+        slot = position_hash & mask
+        while True:
+            key, games, points, code = SLOT.unpack_from(self._map, HEADER.size + slot * SLOT.size)
+            if not games:
+                return moves
+            if key == position_hash:
+                moves.append(BookMove(decode_move(code), games, points / 2))
+            slot = (slot + 1) & mask
+
+    def lookup(self, game):
+        """
+        Gets the book moves of the position of a game, in the orientation of the game
+
+        :param game: KubaGame
+        :return: list of BookMove, empty if the position is not in the book
+        """
+        key, transform = book_key(game, self._symmetric)
+        moves = self.probe(key)
+        if transform:
+            for book_move in moves:
+                book_move.move = from_canonical(book_move.move, transform)
+        return moves
+
+    def choose(self, game, player_name, min_games=1):
+        """
+        Picks the book move with the best win rate that is legal for the player, ties go to the most played move
+
+        :param game: KubaGame
+        :param player_name: name of the player to move
+        :param min_games: moves played in fewer games are not picked
+        :return: move as tuple ((row, col), dir) or None if the book has no move for the position
+        """
+        candidates = self.lookup(game)
+        if not candidates:
+            return None
+        # Checking legality also guards against hash collisions
+        legal = set(legal_moves(game, game.players[player_name]))
+        best = None
+        for book_move in candidates:
+            if book_move.games < min_games or book_move.move not in legal:
+                continue
+            if best is None or (book_move.win_rate, book_move.games) > (best.win_rate, best.games):
+                best = book_move
+        return None if best is None else best.move
+
+    def close(self):
+        """ Closes the memory map """
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+@functools.lru_cache(maxsize=None)
+def load_book(path):
+    """
+    Opens a book file once per process, used by the simulator policies
+
+    :param path: file path
+    :return: OpeningBook
+    """
+    return OpeningBook(path)
+
+
+def book_policy(book, fallback, min_games=1):
+    """
+    Wraps a policy so it plays the book move when there is one
+
+    :param book: OpeningBook
+    :param fallback: policy function (game, player_name) -> move used out of the book
+    :param min_games: book moves played in fewer games are not picked
+    :return: policy function (game, player_name) -> move
+    """
+
+    def policy(game, player_name):
+        move = book.choose(game, player_name, min_games)
+        if move is None:
+            return fallback(game, player_name)
+        return move
+    return policy
+
+
+def main(argv=None):
+    instrument.enable_from_environment()
+    parser = argparse.ArgumentParser(description='Build or inspect a Kuba opening book.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build', help='build a book from record files')
+    build.add_argument('records', nargs='+', help='record files written by simulate.py --records')
+    build.add_argument('-o', '--output', required=True, help='book file')
+    build.add_argument('--plies', type=int, default=12, help='moves of each game added to the book')
+    build.add_argument('--min-games', type=int, default=1, help='leave out moves played in fewer games')
+    build.add_argument('--symmetric', action='store_true',
+                       help='share the entries of rotated, reflected and color swapped positions')
+    show = commands.add_parser('show', help='print the book moves of the starting position')
+    show.add_argument('book', help='book file')
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        print('{} book moves'.format(build_book(args.records, args.output, args.plies, args.min_games,
+                                                args.symmetric)))
+    else:
+        with OpeningBook(args.book) as book:
+            game = KubaGame(*PLAYERS)
+            for book_move in sorted(book.lookup(game), key=lambda book_move: -book_move.games):
+                print('{} {} games, win rate {:.3f}'.format(book_move.move, book_move.games, book_move.win_rate))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,181 @@
+# Description: Vectorized evaluation features of Kuba positions and offline fitting of linear evaluation weights.
+#
+# extract computes the search.FEATURES of every game of a BatchBoard at once, with the same values as
+# search.position_features. The fitting pipeline reads the positions of position databases written by
+# simulate.py --positions straight from the row files, labels every position of a game with a result by whether the
+# side to move went on to win, and fits logistic regression weights of the features with Newton's method. The weights
+# are scaled from logits to evaluation points and saved as a search.LinearEvaluation file:
+#
+#     python simulate.py --games 5000 --white greedy --black greedy --positions positions.kpd
+#     python features.py positions.kpd --output weights.json
+#     python simulate.py --white alphabeta:depth=3,weights=weights.json --black alphabeta:depth=3
+
+import argparse
+import sys
+
+import numpy as np
+
+from batch import BatchBoard, EMPTY, WHITE, BLACK, RED
+from KubaGame import SNAPSHOT_SIZE
+from posdb import PositionDB, HEADER, ROW
+from search import FEATURES, LinearEvaluation
+
+# Evaluation points per logit of the win probability, a red marble weighs about 100 points in search.evaluate
+SCALE = 100
+
+_EDGES = np.ones((7, 7), dtype=bool)
+_EDGES[1:-1, 1:-1] = False
+
+
+def extract(batch, colors=None):
+    """
+    Computes the FEATURES of every game of a batch from the point of view of one color
+
+    :param batch: BatchBoard
+    :param colors: color code per game, array [N] or a single code, batch.to_move if None
+    :return: float array [N, len(FEATURES)]
+    """
+    n = len(batch)
+    colors = np.broadcast_to(np.asarray(batch.to_move if colors is None else colors, dtype=np.int8), (n,))
+    if np.any(colors == EMPTY):
+        raise ValueError('every game needs a color to move')
+    opponents = np.where(colors == WHITE, BLACK, WHITE).astype(np.int8)
+    games = np.arange(n)
+    side = (colors == BLACK).astype(np.int64)
+
+    own_moves = batch.legal_mask(colors, ko=False)
+    other_moves = batch.legal_mask(opponents, ko=False)
+    red_off = batch.pushed_off() == RED
+    own = batch.cells == colors[:, None, None]
+    other = batch.cells == opponents[:, None, None]
+
+    features = np.empty((n, len(FEATURES)))
+    features[:, 0] = batch.red_captured[games, side] - batch.red_captured[games, 1 - side]
+    features[:, 1] = batch.marbles_left[games, side] - batch.marbles_left[games, 1 - side]
+    features[:, 2] = own_moves.sum(axis=(1, 2, 3)) - other_moves.sum(axis=(1, 2, 3))
+    features[:, 3] = (own & _EDGES).sum(axis=(1, 2)) - (other & _EDGES).sum(axis=(1, 2))
+    features[:, 4] = (own_moves & red_off).sum(axis=(1, 2, 3)) - (other_moves & red_off).sum(axis=(1, 2, 3))
+    features[:, 5] = (np.sign(own.sum(axis=2) - other.sum(axis=2)).sum(axis=1)
+                      + np.sign(own.sum(axis=1) - other.sum(axis=1)).sum(axis=1))
+    return features
+
+
+def position_rows(path, limit=None):
+    """
+    Maps the rows of a position database as an array without copying them
+
+    :param path: position database file path
+    :param limit: maximum number of rows or None for all
+    :return: uint8 array [rows, ROW.size]
+    """
+    with PositionDB(path) as db:
+        count = len(db) if limit is None else min(len(db), limit)
+    if not count:
+        return np.zeros((0, ROW.size), dtype=np.uint8)
+    return np.memmap(path, dtype=np.uint8, mode='r', offset=HEADER.size, shape=(count, ROW.size))
+
+
+def dataset(paths, limit=None, chunk=1 << 16):
+    """
+    Builds the training set of the positions of games with a result
+
+    :param paths: list of position database file paths
+    :param limit: maximum number of rows read from each file or None for all
+    :param chunk: number of rows turned into a BatchBoard at a time
+    :return: tuple (float array [N, len(FEATURES)] of features, bool array [N] True where the side to move won)
+    """
+    features = [np.zeros((0, len(FEATURES)))]
+    outcomes = [np.zeros(0, dtype=bool)]
+    for path in paths:
+        rows = position_rows(path, limit)
+        for start in range(0, len(rows), chunk):
+            part = np.asarray(rows[start:start + chunk])
+            # The database color codes are 1 for white and 2 for black, the same as the cell codes
+            to_move = part[:, SNAPSHOT_SIZE].astype(np.int8)
+            winner = part[:, SNAPSHOT_SIZE + 1].astype(np.int8)
+            keep = (winner != EMPTY) & (to_move != EMPTY)
+            if not keep.any():
+                continue
+            batch = BatchBoard.from_snapshots(part[keep, :SNAPSHOT_SIZE])
+            features.append(extract(batch, to_move[keep]))
+            outcomes.append(winner[keep] == to_move[keep])
+    return np.concatenate(features), np.concatenate(outcomes)
+
+
+def fit(features, outcomes, l2=1.0, iterations=50, tolerance=1e-9):
+    """
+    Fits L2 regularized logistic regression weights by Newton's method. There is no intercept: every feature is the
+    value of the side to move minus the value of the opponent, so a position and its color swap score as opposites.
+
+    :param features: float array [N, F]
+    :param outcomes: bool array [N]
+    :param l2: regularization strength, keeps the weights finite when a feature never varies
+    :param iterations: maximum Newton steps
+    :param tolerance: stops when no weight moves more than this
+    :return: float array [F] of weights in logits per feature unit
+    """
+    x = np.asarray(features, dtype=np.float64)
+    y = np.asarray(outcomes, dtype=np.float64)
+    weights = np.zeros(x.shape[1])
+    penalty = l2 * np.eye(x.shape[1])
+    for _ in range(iterations):
+        p = 1.0 / (1.0 + np.exp(-(x @ weights)))
+        gradient = x.T @ (p - y) + l2 * weights
+        hessian = (x * (p * (1.0 - p))[:, None]).T @ x + penalty
+        step = np.linalg.solve(hessian, gradient)
+        weights -= step
+        if np.abs(step).max() < tolerance:
+            break
+    return weights
+
+
+def accuracy(features, outcomes, weights):
+    """
+    Fraction of positions where the sign of the evaluation agrees with the result, evaluations of 0 count as wrong
+
+    :return: float
+    """
+    if not len(outcomes):
+        return 0.0
+    scores = np.asarray(features) @ np.asarray(weights)
+    return float(np.mean(np.where(outcomes, scores > 0, scores < 0)))
+
+
+def fit_evaluation(paths, limit=None, l2=1.0, scale=SCALE):
+    """
+    Runs the pipeline from position databases to an evaluation
+
+    :param paths: list of position database file paths
+    :param limit: maximum number of rows read from each file or None for all
+    :param l2: regularization strength
+    :param scale: evaluation points per logit
+    :return: LinearEvaluation
+    """
+    features, outcomes = dataset(paths, limit)
+    if not len(outcomes):
+        raise ValueError('no positions of games with a result')
+    weights = fit(features, outcomes, l2)
+    info = {'positions': int(len(outcomes)), 'l2': l2, 'scale': scale,
+            'accuracy': round(accuracy(features, outcomes, weights), 4)}
+    return LinearEvaluation({name: round(float(weight) * scale, 3) for name, weight in zip(FEATURES, weights)}, info)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Fit Kuba evaluation weights from position databases.')
+    parser.add_argument('positions', nargs='+', help='position database files written by simulate.py --positions')
+    parser.add_argument('-o', '--output', default='weights.json', help='evaluation file to write')
+    parser.add_argument('--limit', type=int, help='maximum rows read from each file')
+    parser.add_argument('--l2', type=float, default=1.0, help='regularization strength')
+    parser.add_argument('--scale', type=float, default=SCALE, help='evaluation points per logit')
+    args = parser.parse_args(argv)
+
+    evaluation = fit_evaluation(args.positions, args.limit, args.l2, args.scale)
+    evaluation.save(args.output)
+    for name, weight in evaluation.weights.items():
+        print('{:<13} {:10.3f}'.format(name, weight))
+    print('{positions} positions, accuracy {accuracy:.3f}'.format(**evaluation.info))
+    return evaluation
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
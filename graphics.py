@@ -3,6 +3,7 @@ import sys
 from pygame.locals import *
 from KubaGame import KubaGame, Player
 import random
+from collections import OrderedDict
 
 ## COLORS ##
 GRAY = (176, 179, 184)
@@ -16,14 +17,18 @@ class Game:
 
     :param playerw is the white marble player
     :param playerb is the black marble player
+    :param size is the board size
     """
-    def __init__(self, playerw, playerb):
-        self._game = KubaGame(playerw, playerb)
+    def __init__(self, playerw, playerb, size=7):
+        self._game = KubaGame(playerw, playerb, size=size)
         self._playerw = playerw
         self._playerb = playerb
-        self._graphics = Graphics()
+        self._graphics = Graphics(size)
         self._marble_target = None
         self._marble_dir = None
+        self._drawn_version = None
+        self._drawn_moves = 0
+        self._drawn_status = None
 
     @property
     def game(self):
@@ -105,9 +110,28 @@ class Game:
 
     def update(self):
         """
-        Updates the graphics
+        Updates the graphics. Frames where neither the game version nor the status changed are skipped, after a single
+        move only the row or column of the push is redrawn. An undone move also changes the version by one but leaves
+        the move log shorter, so it redraws the whole window.
         """
-        self._graphics.update_display(self.game.board.board, self.game.get_current_turn(), self.game.players[self._playerw[0]].red_captured, self.game.players[self._playerb[0]].red_captured, self.game.get_winner())
+        version = self.game.version
+        moves = len(self.game.move_log)
+        status = (self.game.get_current_turn(), self.game.players[self._playerw[0]].red_captured,
+                  self.game.players[self._playerb[0]].red_captured)
+        if version == self._drawn_version and status == self._drawn_status:
+            return
+
+        dirty = None
+        if self._drawn_version is not None and version == self._drawn_version + 1 and moves == self._drawn_moves + 1:
+            dirty = self._graphics.line_cells(*self.game.move_log[-1])
+        elif version == self._drawn_version:
+            dirty = []
+
+        self._graphics.update_display(self.game.board.board, status[0], status[1], status[2], self.game.get_winner(),
+                                      dirty)
+        self._drawn_version = version
+        self._drawn_moves = moves
+        self._drawn_status = status
 
     def main(self):
         """
@@ -116,19 +140,75 @@ class Game:
         self.game_loop()
         self.update()
 
+class TextCache:
+    """
+    Least recently used cache of rendered text surfaces keyed by (string, color)
+
+    :param font: pygame font used to render
+    :param max_size: number of surfaces kept
+    """
+    def __init__(self, font, max_size=64):
+        self._font = font
+        self._max_size = max_size
+        self._surfaces = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+
+    @property
+    def hits(self):
+        """
+        Hits property
+        :return: self._hits
+        """
+        return self._hits
+
+    @property
+    def misses(self):
+        """
+        Misses property
+        :return: self._misses
+        """
+        return self._misses
+
+    def render(self, text, color):
+        """
+        Renders text, reusing the surface if the same string and color were rendered recently
+        :return: pygame.Surface
+        """
+        key = (text, color)
+        surface = self._surfaces.get(key)
+        if surface is not None:
+            self._surfaces.move_to_end(key)
+            self._hits += 1
+            return surface
+
+        self._misses += 1
+        surface = self._font.render(text, True, color)
+        self._surfaces[key] = surface
+        if len(self._surfaces) > self._max_size:
+            self._surfaces.popitem(last=False)
+        return surface
+
+    def __len__(self):
+        return len(self._surfaces)
+
 class Graphics:
     """
-    Graphics for the game
+    Graphics for the game, the window is about the same size for every board size
     """
-    def __init__(self):
-        self._width = 602
-        self._height = 700
-        self._rows = 7
-        self._cols = 7
-        self._marble_size = self._width // self._cols
+    def __init__(self, size=7):
+        self._rows = size
+        self._cols = size
+        self._marble_size = 602 // size
+        self._width = self._marble_size * self._cols
+        self._height = self._width + 98
         self._caption = "Kuba Game"
         self._screen = pygame.display.set_mode((self._width,self._height))
-        self._background = self._screen.fill(GRAY)
+        self._screen.fill(GRAY)
+        self._board_height = self._rows * self._marble_size
+        self._status_rect = pygame.Rect(0, self._board_height, self._width, self._height - self._board_height)
+        self._background = self._render_background()
+        self._text_cache = None
         self._playerw_name = None
         self._playerb_name = None
         self._playerb_score = None
@@ -157,36 +237,105 @@ class Graphics:
         """
         pygame.init()
         pygame.display.set_caption(self._caption)
+        self.load_font()
+
+    def load_font(self):
+        """
+        Loads the status font once and creates the text cache for it
+        """
+        if not pygame.font.get_init():
+            pygame.font.init()
+        self._text_cache = TextCache(pygame.font.SysFont('arial', 20))
+
+    @property
+    def text_cache(self):
+        """
+        Text cache property, loads the font if set_up_window was not called
+        :return: self._text_cache
+        """
+        if self._text_cache is None:
+            self.load_font()
+        return self._text_cache
 
-    def draw_board_squares(self):
+    def draw_board_squares(self, surface=None):
         """
         Takes a board object and draws the squares to the display
         """
-        for x in range(0, 602, 86):
-            for y in range(0, 602, 86):
-                rect = pygame.Rect(x, y, 86, 86)
-                pygame.draw.rect(self._screen, BLACK, rect, 1)
+        if surface is None:
+            surface = self._screen
+        size = self._marble_size
+        for x in range(0, self._cols * size, size):
+            for y in range(0, self._rows * size, size):
+                rect = pygame.Rect(x, y, size, size)
+                pygame.draw.rect(surface, BLACK, rect, 1)
+
+    def _render_background(self):
+        """
+        Renders the empty board once, so redrawing a square or the status bar is a blit instead of redrawing the grid
+        :return: pygame.Surface
+        """
+        background = pygame.Surface((self._width, self._height))
+        background.fill(GRAY)
+        self.draw_board_squares(background)
+        return background
 
-    def update_display(self, board, turn, playerw_captured, playerb_captured, winner):
+    def cell_rect(self, row, col):
+        """
+        Screen rectangle of a square
+        :return: pygame.Rect
+        """
+        return pygame.Rect(col * self._marble_size, row * self._marble_size, self._marble_size, self._marble_size)
+
+    def line_cells(self, coord, dir):
+        """
+        Squares a push can change, the whole row for a left or right push and the whole column otherwise
+        :return: list of (row, col)
+        """
+        if dir in ('L', 'R'):
+            return [(coord[0], col) for col in range(self._cols)]
+        return [(row, coord[1]) for row in range(self._rows)]
+
+    def update_display(self, board, turn, playerw_captured, playerb_captured, winner, dirty=None):
         """
         Updates the display board
+
+        :param dirty: list of (row, col) squares to redraw, None to redraw the whole window
         """
 
-        self.screen.fill(GRAY)
-        self.draw_board_squares()
-        self.draw_marbles(board)
+        if dirty is None:
+            self.screen.blit(self._background, (0, 0))
+            self.draw_marbles(board)
+            self.display_status(turn, playerw_captured, playerb_captured, winner)
+            pygame.display.update()
+            return
+
+        rects = []
+        for row, col in dirty:
+            rect = self.cell_rect(row, col)
+            self.screen.blit(self._background, rect, rect)
+            self.draw_marble(board, row, col)
+            rects.append(rect)
+
+        self.screen.blit(self._background, self._status_rect, self._status_rect)
         self.display_status(turn, playerw_captured, playerb_captured, winner)
-        pygame.display.update()
+        rects.append(self._status_rect)
+        pygame.display.update(rects)
 
     def draw_marbles(self, board):
         """
         Draws the marbles from board object
         """
-        for i in range(7):
-            for j in range(7):
-                if board[i][j] != None:
-                    pygame.draw.circle(self._screen, board[i][j].rgb, (j * self._marble_size + self._marble_size / 2, i * self._marble_size + self._marble_size / 2),
-                                       self._marble_size / 2.5)
+        for i in range(self._rows):
+            for j in range(self._cols):
+                self.draw_marble(board, i, j)
+
+    def draw_marble(self, board, i, j):
+        """
+        Draws the marble on one square of the board object, if there is one
+        """
+        if board[i][j] != None:
+            pygame.draw.circle(self._screen, board[i][j].rgb, (j * self._marble_size + self._marble_size / 2, i * self._marble_size + self._marble_size / 2),
+                               self._marble_size / 2.5)
 
     def board_coords(self, px):
         """
@@ -201,31 +350,31 @@ class Graphics:
         """
         Draws game status to the board
         """
-        font_obj = pygame.font.SysFont('arial',20)
+        text_cache = self.text_cache
 
-        turn_text = font_obj.render(turn + "'s turn", True, (0,0,0))
+        turn_text = text_cache.render(turn + "'s turn", (0,0,0))
         turn_text_rect = turn_text.get_rect()
-        turn_text_rect.move_ip(50, 640)
+        turn_text_rect.move_ip(50, self._board_height + 38)
         self._screen.blit(turn_text, turn_text_rect)
 
-        playerb_text = font_obj.render("Black " + str(playerb_captured), True, (0,0,0))
+        playerb_text = text_cache.render("Black " + str(playerb_captured), (0,0,0))
         playerb_text_rect = playerb_text.get_rect()
-        playerb_text_rect.move_ip(280, 640)
+        playerb_text_rect.move_ip(280, self._board_height + 38)
         self._screen.blit(playerb_text, playerb_text_rect)
 
-        playerw_text = font_obj.render("White " + str(playerw_captured), True, (0,0,0))
+        playerw_text = text_cache.render("White " + str(playerw_captured), (0,0,0))
         playerw_text_rect = playerw_text.get_rect()
-        playerw_text_rect.move_ip(450, 640)
+        playerw_text_rect.move_ip(450, self._board_height + 38)
         self._screen.blit(playerw_text, playerw_text_rect)
 
         if winner:
-            win_player = font_obj.render(str(winner) + " Wins!", True, (0, 0, 0))
+            win_player = text_cache.render(str(winner) + " Wins!", (0, 0, 0))
             win_player_text_rect = win_player.get_rect()
-            win_player_text_rect.move_ip(250, 610)
+            win_player_text_rect.move_ip(250, self._board_height + 8)
             self._screen.blit(win_player, win_player_text_rect)
 
-def main():
-    game = Game(('White', 'W'),('Black', 'B'))
+def main(size=7):
+    game = Game(('White', 'W'),('Black', 'B'), size)
     game.setup()
     clock = pygame.time.Clock()
     while True:
@@ -233,4 +382,4 @@ def main():
         game.main()
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 7)
\ No newline at end of file
@@ -0,0 +1,60 @@
+# Description: Frame time benchmark of the Kuba graphics under the SDL dummy video driver.
+
+import os
+import sys
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import pygame
+import instrument
+from graphics import Graphics
+from KubaGame import KubaGame
+
+
+class UncachedGraphics(Graphics):
+    """
+    Draws the status the way display_status did before the text cache, looking up the font and rendering every
+    string on every frame
+    """
+    def display_status(self, turn, playerw_captured, playerb_captured, winner):
+        font_obj = pygame.font.SysFont('arial', 20)
+        for text, pos in ((turn + "'s turn", (50, 640)), ("Black " + str(playerb_captured), (280, 640)),
+                          ("White " + str(playerw_captured), (450, 640))):
+            surface = font_obj.render(text, True, (0, 0, 0))
+            rect = surface.get_rect()
+            rect.move_ip(*pos)
+            self.screen.blit(surface, rect)
+
+
+def frame_times(graphics_type, frames):
+    """
+    Times full redraws of the starting board
+
+    :param graphics_type: Graphics or UncachedGraphics
+    :param frames: number of frames
+    :return: mean frame time in milliseconds
+    """
+    graphics = graphics_type()
+    graphics.set_up_window()
+    board = KubaGame(('White', 'W'), ('Black', 'B')).board.board
+    start = time.perf_counter()
+    for _ in range(frames):
+        graphics.update_display(board, 'White', 0, 0, None)
+    return (time.perf_counter() - start) * 1000 / frames
+
+
+def main(argv=None):
+    instrument.enable_from_environment()
+    frames = int(argv[0]) if argv else 300
+    uncached = frame_times(UncachedGraphics, frames)
+    cached = frame_times(Graphics, frames)
+    print('uncached font and text: {:.3f} ms/frame'.format(uncached))
+    print('cached font and text:   {:.3f} ms/frame'.format(cached))
+    print('speedup: {:.1f}x'.format(uncached / cached if cached > 0 else float('inf')))
+    pygame.quit()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
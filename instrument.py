@@ -0,0 +1,328 @@
+# Description: Opt in instrumentation of the KubaGame hot paths.
+#
+# While enabled the methods listed in TARGETS are replaced on their classes by wrappers that count calls and time
+# them, and with memory=True also measure the bytes they retain through tracemalloc: the growth of the traced memory
+# from the start to the end of each call. Memory allocated and freed within a call is not counted, so this shows which
+# methods keep memory alive, not how much garbage they churn through. Disabling puts the original functions back, so
+# there is no cost at all when instrumentation is off.
+#
+# Enable it around a block of code:
+#
+#     with instrumented() as stats:
+#         play()
+#     print(stats.report())
+#
+# or for a whole process with the environment variable KUBA_INSTRUMENT=1 (KUBA_INSTRUMENT=memory to also measure
+# retained bytes), which the command line entry points check with enable_from_environment and their process pools with
+# enable_worker_from_environment. The report is written at exit to stderr, or to the file named by
+# KUBA_INSTRUMENT_OUTPUT, in the Prometheus text format if the file name ends in .prom. {pid} in the file name is
+# replaced by the process id.
+
+import atexit
+import collections
+import contextlib
+import functools
+import multiprocessing.util
+import os
+import sys
+import time
+import tracemalloc
+
+from KubaGame import KubaGame, Player, Board, BitBoard
+from stats import percentile
+
+TARGETS = {
+    KubaGame: ('make_move', 'apply_move', 'undo_move', 'update_ko_rule', 'update_winner', 'get_winner'),
+    Player: ('available_moves',),
+    Board: ('available_moves', 'has_moves', 'scan_moves', 'chain_length', 'update_board', 'revert_board'),
+    BitBoard: ('scan_moves', 'cell_moves'),
+}
+QUANTILES = (50, 90, 99)
+
+_active = None
+
+
+class MethodStats:
+    """ Counters of one instrumented method.
+
+        Attributes:
+            calls: number of calls
+            seconds: total time spent in the method, including the methods it calls
+            max_seconds: longest call
+            retained: bytes the calls left allocated, the traced memory at return less the traced memory at the
+                      call, a call that frees more than it allocates counts as 0. Only counted with memory tracing
+                      and, like the time, includes the methods it calls
+    """
+
+    __slots__ = ('calls', 'seconds', 'max_seconds', 'retained', '_samples')
+
+    def __init__(self, samples=10000):
+        """
+        Initializes the counters
+
+        :param samples: number of most recent call times kept for the percentiles
+        """
+        self.calls = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.retained = 0
+        self._samples = collections.deque(maxlen=samples)
+
+    def record(self, seconds, retained=0):
+        """ Counts one call """
+        self.calls += 1
+        self.seconds += seconds
+        if seconds > self.max_seconds:
+            self.max_seconds = seconds
+        self.retained += retained
+        self._samples.append(seconds)
+
+    def clear(self):
+        """ Sets the counters back to zero """
+        self.calls = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.retained = 0
+        self._samples.clear()
+
+    def percentile(self, percent):
+        """
+        Call time percentile over the most recent calls
+
+        :param percent: percentile from 0 to 100
+        :return: seconds, 0.0 before the first call
+        """
+        return percentile(self._samples, percent)
+
+
+class Instrumentation:
+    """ Patches the KubaGame hot paths with timing wrappers while enabled. Only one can be enabled at a time. """
+
+    def __init__(self, memory=False, samples=10000, targets=None):
+        """
+        Initializes the instrumentation, disabled
+
+        :param memory: if True retained bytes are measured with tracemalloc, which slows everything down
+        :param samples: number of most recent call times kept per method for the percentiles
+        :param targets: dictionary of method names by class, TARGETS if None
+        """
+        self._memory = memory
+        self._samples = samples
+        self._targets = TARGETS if targets is None else targets
+        self._originals = []
+        self._started_tracing = False
+        self._stats = {}
+
+    @property
+    def enabled(self):
+        """ Enabled property
+            :return True while the methods are patched
+        """
+        return bool(self._originals)
+
+    @property
+    def stats(self):
+        """ Stats property
+            :return dictionary of MethodStats by 'Class.method'
+        """
+        return self._stats
+
+    def _wrap(self, function, stats):
+        """ Builds the timing wrapper of a function """
+        clock = time.perf_counter
+
+        if not self._memory:
+            @functools.wraps(function)
+            def timed(*args, **kwargs):
+                start = clock()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    stats.record(clock() - start)
+            return timed
+
+        traced = tracemalloc.get_traced_memory
+
+        @functools.wraps(function)
+        def traced_timed(*args, **kwargs):
+            before = traced()[0]
+            start = clock()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                seconds = clock() - start
+                stats.record(seconds, max(0, traced()[0] - before))
+        return traced_timed
+
+    def enable(self):
+        """
+        Patches the target methods
+
+        :return: self
+        """
+        global _active
+        if self.enabled:
+            return self
+        if _active is not None:
+            raise RuntimeError('instrumentation is already enabled')
+        if self._memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        for cls, names in self._targets.items():
+            for name in names:
+                # Only methods defined on the class itself, inherited ones are patched on their own class
+                function = cls.__dict__.get(name)
+                if function is None:
+                    continue
+                label = '{}.{}'.format(cls.__name__, name)
+                stats = self._stats.setdefault(label, MethodStats(self._samples))
+                self._originals.append((cls, name, function))
+                setattr(cls, name, self._wrap(function, stats))
+        _active = self
+        return self
+
+    def disable(self):
+        """ Puts the original methods back """
+        global _active
+        for cls, name, function in reversed(self._originals):
+            setattr(cls, name, function)
+        self._originals = []
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        if _active is self:
+            _active = None
+
+    def reset(self):
+        """ Clears the counters """
+        for stats in self._stats.values():
+            stats.clear()
+
+    def report(self):
+        """
+        Formats the counters as a table, the methods with the most total time first
+
+        :return: string
+        """
+        columns = ['method', 'calls', 'total ms', 'p50 us', 'p90 us', 'p99 us', 'max us']
+        if self._memory:
+            columns.append('retained KiB')
+        rows = []
+        for label, stats in sorted(self._stats.items(), key=lambda item: -item[1].seconds):
+            if not stats.calls:
+                continue
+            row = [label, str(stats.calls), '{:.2f}'.format(stats.seconds * 1e3)]
+            row += ['{:.2f}'.format(stats.percentile(percent) * 1e6) for percent in QUANTILES]
+            row.append('{:.2f}'.format(stats.max_seconds * 1e6))
+            if self._memory:
+                row.append('{:.1f}'.format(stats.retained / 1024))
+            rows.append(row)
+        widths = [max(len(row[i]) for row in rows + [columns]) for i in range(len(columns))]
+        lines = []
+        for row in [columns] + rows:
+            lines.append('  '.join(cell.ljust(width) if i == 0 else cell.rjust(width)
+                                   for i, (cell, width) in enumerate(zip(row, widths))))
+        return '\n'.join(lines)
+
+    def prometheus(self, prefix='kuba'):
+        """
+        Formats the counters in the Prometheus text exposition format
+
+        :param prefix: metric name prefix
+        :return: string
+        """
+        calls = ['# HELP {}_method_calls_total Calls of instrumented methods.'.format(prefix),
+                 '# TYPE {}_method_calls_total counter'.format(prefix)]
+        seconds = ['# HELP {}_method_seconds Time spent in instrumented methods.'.format(prefix),
+                   '# TYPE {}_method_seconds summary'.format(prefix)]
+        retained = ['# HELP {}_method_retained_bytes_total Bytes left allocated by instrumented methods.'.format(
+                    prefix), '# TYPE {}_method_retained_bytes_total counter'.format(prefix)]
+        for label, stats in sorted(self._stats.items()):
+            method = 'method="{}"'.format(label)
+            calls.append('{}_method_calls_total{{{}}} {}'.format(prefix, method, stats.calls))
+            for percent in QUANTILES:
+                seconds.append('{}_method_seconds{{{},quantile="{}"}} {!r}'.format(prefix, method, percent / 100,
+                                                                                   stats.percentile(percent)))
+            seconds.append('{}_method_seconds_sum{{{}}} {!r}'.format(prefix, method, stats.seconds))
+            seconds.append('{}_method_seconds_count{{{}}} {}'.format(prefix, method, stats.calls))
+            retained.append('{}_method_retained_bytes_total{{{}}} {}'.format(prefix, method, stats.retained))
+        lines = calls + seconds
+        if self._memory:
+            lines += retained
+        return '\n'.join(lines) + '\n'
+
+    def __enter__(self):
+        return self.enable()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.disable()
+
+
+@contextlib.contextmanager
+def instrumented(memory=False, samples=10000):
+    """
+    Instruments the KubaGame hot paths for the duration of a with block
+
+    :param memory: if True retained bytes are measured with tracemalloc
+    :param samples: number of most recent call times kept per method for the percentiles
+    :return: Instrumentation with the counters, still readable after the block
+    """
+    instrumentation = Instrumentation(memory, samples)
+    with instrumentation:
+        yield instrumentation
+
+
+def active():
+    """
+    Gets the enabled instrumentation
+
+    :return: Instrumentation or None
+    """
+    return _active
+
+
+def _write_report(instrumentation, output):
+    """ Writes the report of the process wide instrumentation at exit """
+    instrumentation.disable()
+    if not output:
+        print(instrumentation.report(), file=sys.stderr)
+        return
+    with open(output.replace('{pid}', str(os.getpid())), 'w') as file:
+        file.write(instrumentation.prometheus() if output.endswith('.prom') else instrumentation.report() + '\n')
+
+
+def enable_from_environment(environ=os.environ):
+    """
+    Enables instrumentation for the whole process when KUBA_INSTRUMENT is set, reported at exit
+
+    :param environ: mapping of environment variables
+    :return: Instrumentation or None if the variable is not set
+    """
+    mode = environ.get('KUBA_INSTRUMENT', '')
+    if mode in ('', '0') or _active is not None:
+        return None
+    instrumentation = Instrumentation(memory=mode == 'memory').enable()
+    atexit.register(_write_report, instrumentation, environ.get('KUBA_INSTRUMENT_OUTPUT'))
+    return instrumentation
+
+
+def enable_worker_from_environment(environ=os.environ):
+    """
+    Process pool initializer that instruments a worker process when KUBA_INSTRUMENT is set. Pool workers leave through
+    os._exit, which skips atexit, so the report is written by a multiprocessing finalizer. A forked worker inherits
+    the instrumentation of its parent and starts its counters over.
+
+    :param environ: mapping of environment variables
+    :return: Instrumentation or None if the variable is not set
+    """
+    mode = environ.get('KUBA_INSTRUMENT', '')
+    if mode in ('', '0'):
+        return None
+    instrumentation = _active
+    if instrumentation is None:
+        instrumentation = Instrumentation(memory=mode == 'memory').enable()
+    else:
+        instrumentation.reset()
+    multiprocessing.util.Finalize(None, _write_report, (instrumentation, environ.get('KUBA_INSTRUMENT_OUTPUT')),
+                                  exitpriority=0)
+    return instrumentation
@@ -0,0 +1,129 @@
+# Description: Load generator for server.py. Plays many random games against a Kuba server at once.
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+
+import instrument
+from KubaGame import KubaGame
+from search import legal_moves
+from server import PLAYERS
+from stats import percentile
+
+
+async def _request(reader, writer, message):
+    """
+    Sends one request and reads the reply
+
+    :return: decoded reply
+    """
+    writer.write(json.dumps(message, separators=(',', ':')).encode() + b'\n')
+    await writer.drain()
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError('server closed the connection')
+    return json.loads(line)
+
+
+async def play_game(host, port, seed, max_plies=200):
+    """
+    Opens a connection, takes both seats of a new session and plays random legal moves until the game ends. A local
+    KubaGame mirrors the session so the moves sent are always legal.
+
+    :param host: server address
+    :param port: server port
+    :param seed: random seed of the moves and the starting player
+    :param max_plies: the game is left after this many moves
+    :return: list of move round trip times in seconds
+    """
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+    latencies = []
+    try:
+        joined = await _request(reader, writer, {'op': 'new'})
+        session = joined['session']
+        await _request(reader, writer, {'op': 'join', 'session': session})
+        # The mirror game takes the board size of the session
+        game = KubaGame(*PLAYERS, size=len(joined['board']))
+        player_name = rng.choice([name for name, _ in PLAYERS])
+        for _ in range(max_plies):
+            moves = legal_moves(game, game.players[player_name])
+            if game.get_winner() is not None or not moves:
+                break
+            coord, dir = rng.choice(moves)
+            start = time.perf_counter()
+            reply = await _request(reader, writer, {'op': 'move', 'session': session, 'player': player_name,
+                                                    'coord': coord, 'dir': dir})
+            latencies.append(time.perf_counter() - start)
+            if reply['type'] != 'move' or not game.make_move(player_name, coord, dir):
+                raise ValueError('move {} was not accepted: {}'.format((coord, dir), reply))
+            player_name = game.get_current_turn()
+    finally:
+        writer.close()
+    return latencies
+
+
+async def server_stats(host, port):
+    """
+    Reads the counters of a server
+
+    :return: dictionary
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        return await _request(reader, writer, {'op': 'stats'})
+    finally:
+        writer.close()
+
+
+async def run(host, port, games, concurrency, seed=0, max_plies=200):
+    """
+    Plays a number of games with at most concurrency of them open at once
+
+    :param host: server address
+    :param port: server port
+    :param games: number of games
+    :param concurrency: number of games played at the same time
+    :param seed: base seed, game i uses seed + i
+    :param max_plies: move cap of each game
+    :return: dictionary with the client side results and the server counters
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited(index):
+        async with semaphore:
+            return await play_game(host, port, seed + index, max_plies)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(limited(index) for index in range(games)))
+    elapsed = time.perf_counter() - start
+    latencies = [latency for result in results for latency in result]
+    return {'games': games, 'moves': len(latencies), 'elapsed': elapsed,
+            'moves_per_second': len(latencies) / elapsed if elapsed > 0 else 0.0,
+            'p50_latency_ms': percentile(latencies, 50) * 1000, 'p99_latency_ms': percentile(latencies, 99) * 1000,
+            'server': await server_stats(host, port)}
+
+
+def main(argv=None):
+    instrument.enable_from_environment()
+    parser = argparse.ArgumentParser(description='Play random Kuba games against a server.')
+    parser.add_argument('--host', default='127.0.0.1', help='server address')
+    parser.add_argument('--port', type=int, default=8765, help='server port')
+    parser.add_argument('-n', '--games', type=int, default=100, help='number of games')
+    parser.add_argument('-c', '--concurrency', type=int, default=50, help='games played at the same time')
+    parser.add_argument('--seed', type=int, default=0, help='base seed, game i uses seed + i')
+    parser.add_argument('--max-plies', type=int, default=200, help='move cap per game')
+    args = parser.parse_args(argv)
+
+    summary = asyncio.run(run(args.host, args.port, args.games, args.concurrency, args.seed, args.max_plies))
+    print('{games} games, {moves} moves, {elapsed:.2f} s, {moves_per_second:.0f} moves/s, '
+          'p50 {p50_latency_ms:.2f} ms, p99 {p99_latency_ms:.2f} ms'.format(**summary))
+    print('server: {}'.format(json.dumps(summary['server'])))
+    return summary
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,338 @@
+# Description: Monte Carlo Tree Search for computer play of the Kuba game. Uses only KubaGame, so it runs headless.
+
+import math
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from search import legal_moves, pushed_off_color
+
+
+class MCTSNode:
+    """ Represents a node of the search tree.
+
+        Attributes:
+            move: move that leads to the node, None at the root
+            parent: parent node
+            player_name: name of the player that made move
+            children: expanded child nodes
+            untried: legal moves not expanded yet
+            visits: number of playouts through the node
+            wins: playouts through the node won by player_name, draws count half
+    """
+
+    def __init__(self, move, parent, player_name, untried):
+        """ Initializes a node """
+        self.move = move
+        self.parent = parent
+        self.player_name = player_name
+        self.children = []
+        self.untried = untried
+        self.visits = 0
+        self.wins = 0.0
+
+    def select_child(self, exploration):
+        """
+        Selects the child with the highest UCT value
+
+        :param exploration: UCT exploration constant
+        :return: MCTSNode
+        """
+        log_visits = math.log(self.visits)
+        return max(self.children,
+                   key=lambda child: child.wins / child.visits + exploration * math.sqrt(log_visits / child.visits))
+
+
+class MCTSResult:
+    """ Represents the result of a search.
+
+        Attributes:
+            move: most visited move as tuple ((row, col), dir) or None if the player has no legal move
+            visits: dictionary of root visit counts by move
+            win_rate: win rate of the chosen move for the player
+            playouts: number of playouts run by all workers
+            elapsed: search time in seconds
+    """
+
+    def __init__(self, move, visits, win_rate, playouts, elapsed):
+        """ Initializes a search result """
+        self._move = move
+        self._visits = visits
+        self._win_rate = win_rate
+        self._playouts = playouts
+        self._elapsed = elapsed
+
+    @property
+    def move(self):
+        """ Move property
+            :return self._move
+        """
+        return self._move
+
+    @property
+    def visits(self):
+        """ Visits property
+            :return self._visits
+        """
+        return self._visits
+
+    @property
+    def win_rate(self):
+        """ Win rate property
+            :return self._win_rate
+        """
+        return self._win_rate
+
+    @property
+    def playouts(self):
+        """ Playouts property
+            :return self._playouts
+        """
+        return self._playouts
+
+    @property
+    def elapsed(self):
+        """ Elapsed property
+            :return self._elapsed
+        """
+        return self._elapsed
+
+    @property
+    def playouts_per_second(self):
+        """ Playouts per second property
+            :return playouts divided by elapsed
+        """
+        if self._elapsed <= 0:
+            return 0.0
+        return self._playouts / self._elapsed
+
+    def __repr__(self):
+        return 'MCTSResult(move={}, win_rate={:.3f}, playouts={}, pps={:.0f})'.format(
+            self._move, self._win_rate, self._playouts, self.playouts_per_second)
+
+
+def _other(game, player):
+    """ Returns the opponent of a player """
+    return game.player_b if player is game.player_a else game.player_a
+
+
+def _result(game, player):
+    """
+    Determines if the game is over with player to move
+
+    :return: tuple (True if the game is over, name of the winner or None for a draw)
+    """
+    if game.draw:
+        return True, None
+    winner = game.get_winner()
+    if winner is not None:
+        return True, winner
+    # A player whose only moves push off their own marbles cannot move and loses
+    if not legal_moves(game, player):
+        return True, _other(game, player).name
+    return False, None
+
+
+def _random_move(game, player, rng):
+    """
+    Picks a random legal move, checking for self captures and superko repeats only on the picked moves
+
+    :return: move or None if the player has no legal move
+    """
+    moves = player.available_moves(game.board, game.ko_rule_move)
+    superko = game.superko
+    while moves:
+        move = moves.pop(rng.randrange(len(moves)))
+        if pushed_off_color(game.board, move) != player.color and not (superko and game.repeats_position(*move)):
+            return move
+    return None
+
+
+def run_tree(game, player_name, playouts, time_limit, seed, exploration=1.4, max_rollout_plies=100):
+    """
+    Grows one search tree from a position. The game is searched in place with apply_move and undo_move and is left
+    unchanged. Module level so it can run in a worker process.
+
+    :param game: KubaGame
+    :param player_name: name of the player to move
+    :param playouts: number of playouts
+    :param time_limit: wall clock budget in seconds or None
+    :param seed: random seed of the rollouts
+    :param exploration: UCT exploration constant
+    :param max_rollout_plies: rollouts longer than this count as a draw
+    :return: tuple (dictionary of (visits, wins) by root move, number of playouts run)
+    """
+    rng = random.Random(seed)
+    deadline = None if time_limit is None else time.perf_counter() + time_limit
+    root_player = game.players[player_name]
+    root = MCTSNode(None, None, _other(game, root_player).name, [] if game.draw else legal_moves(game, root_player))
+
+    done = 0
+    while done < playouts:
+        if deadline is not None and time.perf_counter() > deadline:
+            break
+        node = root
+        player = root_player
+        records = []
+
+        # Selection
+        while not node.untried and node.children:
+            node = node.select_child(exploration)
+            records.append(game.apply_move(*node.move))
+            player = _other(game, player)
+
+        # Expansion
+        if node.untried and not _result(game, player)[0]:
+            move = node.untried.pop(rng.randrange(len(node.untried)))
+            records.append(game.apply_move(*move))
+            child = MCTSNode(move, node, player.name, None)
+            player = _other(game, player)
+            # A drawn position is a leaf, the search does not look past the adjudication
+            child.untried = [] if game.draw else legal_moves(game, player)
+            node.children.append(child)
+            node = child
+
+        # Rollout, a drawn game scores like a rollout cut off at max_rollout_plies
+        rollout = []
+        winner = game.get_winner()
+        while winner is None and not game.draw and len(rollout) < max_rollout_plies:
+            move = _random_move(game, player, rng)
+            if move is None:
+                winner = _other(game, player).name
+                break
+            rollout.append(game.apply_move(*move))
+            player = _other(game, player)
+            winner = game.get_winner()
+        while rollout:
+            game.undo_move(rollout.pop())
+
+        # Backpropagation
+        while node is not None:
+            node.visits += 1
+            if winner is None:
+                node.wins += 0.5
+            elif winner == node.player_name:
+                node.wins += 1
+            node = node.parent
+
+        while records:
+            game.undo_move(records.pop())
+        done += 1
+
+    return {child.move: (child.visits, child.wins) for child in root.children}, done
+
+
+class MonteCarloSearch:
+    """ Monte Carlo Tree Search with root parallelism. Each worker process grows its own tree from the position with
+        its own seed and the root statistics of all trees are summed. With a fixed seed and no time limit the result
+        is reproducible.
+
+        Attributes:
+            playouts: number of playouts per move, split between the workers
+            time_limit: wall clock budget per move in seconds or None
+            workers: number of worker processes, 1 runs in the calling process
+            seed: base random seed
+    """
+
+    def __init__(self, playouts=2000, time_limit=None, workers=1, seed=0, exploration=1.4, max_rollout_plies=100):
+        """
+        Initializes the search
+
+        :param playouts: number of playouts per move
+        :param time_limit: wall clock budget per move in seconds, None for no limit
+        :param workers: number of worker processes
+        :param seed: base random seed
+        :param exploration: UCT exploration constant
+        :param max_rollout_plies: rollouts longer than this count as a draw
+        """
+        self._playouts = playouts
+        self._time_limit = time_limit
+        self._workers = max(1, workers)
+        self._seed = seed
+        self._exploration = exploration
+        self._max_rollout_plies = max_rollout_plies
+        self._executor = None
+
+    @property
+    def playouts(self):
+        """ Playouts property
+            :return self._playouts
+        """
+        return self._playouts
+
+    @property
+    def time_limit(self):
+        """ Time limit property
+            :return self._time_limit
+        """
+        return self._time_limit
+
+    @property
+    def workers(self):
+        """ Workers property
+            :return self._workers
+        """
+        return self._workers
+
+    @property
+    def seed(self):
+        """ Seed property
+            :return self._seed
+        """
+        return self._seed
+
+    def close(self):
+        """ Shuts down the worker processes """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def search(self, game, player_name=None):
+        """
+        Searches for the best move. The game is left unchanged.
+
+        :param game: KubaGame
+        :param player_name: name of the player to move, defaults to the current turn
+        :return: MCTSResult
+        """
+        if player_name is None:
+            player_name = game.get_current_turn()
+
+        start = time.perf_counter()
+        shares = [self._playouts // self._workers + (1 if i < self._playouts % self._workers else 0)
+                  for i in range(self._workers)]
+        args = [(game, player_name, shares[i], self._time_limit, self._seed + i, self._exploration,
+                 self._max_rollout_plies) for i in range(self._workers)]
+
+        if self._workers == 1:
+            trees = [run_tree(*args[0])]
+        else:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(self._workers)
+            trees = list(self._executor.map(run_tree, *zip(*args)))
+
+        visits = {}
+        wins = {}
+        playouts = 0
+        for tree, done in trees:
+            playouts += done
+            for move, (move_visits, move_wins) in tree.items():
+                visits[move] = visits.get(move, 0) + move_visits
+                wins[move] = wins.get(move, 0.0) + move_wins
+
+        best_move = None
+        win_rate = 0.0
+        # Ties go to the first move in the order of the legal moves, so the choice is reproducible
+        for move in legal_moves(game, game.players[player_name]):
+            if move in visits and (best_move is None or visits[move] > visits[best_move]):
+                best_move = move
+        if best_move is not None:
+            win_rate = wins[best_move] / visits[best_move]
+
+        return MCTSResult(best_move, visits, win_rate, playouts, time.perf_counter() - start)
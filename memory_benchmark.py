@@ -0,0 +1,63 @@
+# Description: Bytes per live game of each board representation, measured with tracemalloc.
+
+import gc
+import random
+import sys
+import tracemalloc
+
+import instrument
+from KubaGame import KubaGame, Board, BitBoard, CompactBoard
+from search import legal_moves
+
+BOARD_TYPES = (Board, BitBoard, CompactBoard)
+
+
+def play(game, plies, rng):
+    """ Plays random legal moves """
+    player_name = rng.choice(['White', 'Black'])
+    for _ in range(plies):
+        moves = legal_moves(game, game.players[player_name])
+        if game.get_winner() is not None or not moves:
+            break
+        game.make_move(player_name, *rng.choice(moves))
+        player_name = game.get_current_turn()
+
+
+def bytes_per_game(board_type, games=500, plies=30, seed=0):
+    """
+    Measures the memory held by live games after some random moves, with the board view built as the display and
+    the server do. The move logs are cleared so only the game state is counted.
+
+    :param board_type: Board, BitBoard or CompactBoard
+    :param games: number of games held at once
+    :param plies: random moves played in each game
+    :param seed: random seed
+    :return: bytes per game
+    """
+    rng = random.Random(seed)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        held = []
+        for _ in range(games):
+            game = KubaGame(('White', 'W'), ('Black', 'B'), board_type=board_type)
+            play(game, plies, rng)
+            game.move_log.clear()
+            game.board.board
+            held.append(game)
+        gc.collect()
+        current, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return current / games
+
+
+def main(argv=None):
+    instrument.enable_from_environment()
+    games = int(argv[0]) if argv else 500
+    for board_type in BOARD_TYPES:
+        print('{:<13} {:7.0f} bytes per game'.format(board_type.__name__, bytes_per_game(board_type, games)))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
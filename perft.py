@@ -0,0 +1,132 @@
+# Description: Perft move generation counts and benchmark for the Kuba game.
+
+import argparse
+import sys
+import time
+
+import instrument
+from KubaGame import KubaGame, Board, BitBoard
+import search
+
+BOARD_TYPES = {'list': Board, 'bit': BitBoard}
+
+# Stored positions as (player to move first, moves played from the starting board)
+POSITIONS = {
+    'start': ('White', []),
+    'opening': ('White', [((5, 6), 'L'), ((6, 0), 'R'), ((5, 5), 'L'), ((6, 1), 'R'), ((0, 0), 'B'),
+                          ((0, 6), 'B')]),
+    'middlegame': ('White', [((5, 6), 'L'), ((6, 0), 'R'), ((5, 5), 'L'), ((6, 1), 'R'), ((5, 4), 'L'),
+                             ((0, 5), 'B'), ((5, 3), 'L'), ((2, 5), 'L'), ((5, 2), 'L'), ((2, 4), 'L'),
+                             ((5, 0), 'R'), ((2, 3), 'L'), ((5, 1), 'R'), ((2, 2), 'L')]),
+}
+
+
+def position(name, board_type=Board):
+    """
+    Builds a stored position
+
+    :param name: key of POSITIONS
+    :param board_type: Board or BitBoard
+    :return: tuple (KubaGame, name of the player to move)
+    """
+    first, moves = POSITIONS[name]
+    game = KubaGame(('White', 'W'), ('Black', 'B'), board_type=board_type)
+    player_name = first
+    for coord, dir in moves:
+        if not game.make_move(player_name, coord, dir):
+            raise ValueError('stored position {} has illegal move {}'.format(name, (coord, dir)))
+        player_name = game.get_current_turn()
+    return game, player_name
+
+
+def legal_moves(game, player):
+    """
+    Determines the moves make_move accepts: search.legal_moves, and no moves once there is a winner
+
+    :param game: KubaGame
+    :param player: Player to move
+    :return: list of moves
+    """
+    if game.get_winner() is not None:
+        return []
+    return search.legal_moves(game, player)
+
+
+def perft(game, depth, player_name=None):
+    """
+    Counts the positions reached after exactly depth moves. The game is walked in place with apply_move and
+    undo_move and is left unchanged.
+
+    :param game: KubaGame
+    :param depth: number of moves
+    :param player_name: name of the player to move, defaults to the current turn
+    :return: number of leaf positions
+    """
+    if player_name is None:
+        player_name = game.get_current_turn()
+    player = game.players[player_name]
+    opponent = game.player_b if player is game.player_a else game.player_a
+    return _perft(game, depth, player, opponent)
+
+
+def _perft(game, depth, player, opponent):
+    """ Recursive part of perft """
+    if depth == 0:
+        return 1
+    moves = legal_moves(game, player)
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        record = game.apply_move(*move)
+        nodes += _perft(game, depth - 1, opponent, player)
+        game.undo_move(record)
+    return nodes
+
+
+def divide(game, depth, player_name=None):
+    """
+    Counts the leaf positions below each move of the root, for finding where two move generators differ
+
+    :param game: KubaGame
+    :param depth: number of moves, at least 1
+    :param player_name: name of the player to move, defaults to the current turn
+    :return: dictionary of leaf counts by move
+    """
+    if player_name is None:
+        player_name = game.get_current_turn()
+    player = game.players[player_name]
+    opponent = game.player_b if player is game.player_a else game.player_a
+    counts = {}
+    for move in legal_moves(game, player):
+        record = game.apply_move(*move)
+        counts[move] = _perft(game, depth - 1, opponent, player)
+        game.undo_move(record)
+    return counts
+
+
+def main(argv=None):
+    instrument.enable_from_environment()
+    parser = argparse.ArgumentParser(description='Count Kuba move generation leaf positions.')
+    parser.add_argument('-d', '--depth', type=int, default=3, help='deepest depth to count')
+    parser.add_argument('-p', '--position', choices=sorted(POSITIONS), action='append',
+                        help='stored position, may be repeated, defaults to all')
+    parser.add_argument('--board', choices=sorted(BOARD_TYPES), default='bit', help='board representation')
+    parser.add_argument('--divide', action='store_true', help='print the counts below each root move')
+    args = parser.parse_args(argv)
+
+    for name in args.position or sorted(POSITIONS):
+        game, player_name = position(name, BOARD_TYPES[args.board])
+        for depth in range(1, args.depth + 1):
+            start = time.perf_counter()
+            nodes = perft(game, depth, player_name)
+            elapsed = time.perf_counter() - start
+            print('{} depth {} nodes {} time {:.3f} s {:.0f} nodes/s'.format(
+                name, depth, nodes, elapsed, nodes / elapsed if elapsed > 0 else 0.0))
+        if args.divide:
+            for move, nodes in divide(game, args.depth, player_name).items():
+                print('  {} {}'.format(move, nodes))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
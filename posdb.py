@@ -0,0 +1,431 @@
+# Description: Memory mapped database of Kuba positions and game outcomes.
+#
+# The row file starts with the 4 byte magic b'KUBP', a version byte, 3 padding bytes and the number of rows as a 64 bit
+# integer. Rows follow, 32 bytes each: the 27 byte KubaGame.snapshot, the color to move, the winner of the game the
+# position was played in, a padding byte and the ply as a 16 bit integer. Colors are 1 for white, 2 for black and 0 for
+# none. The ko rule move is part of the snapshot, so a row rebuilds the exact game state.
+#
+# The index file next to it, path + '.idx', starts with the magic b'KUBI', the version, the number of slots and the
+# number of distinct positions. An open addressing table of (key, first row + 1, last row + 1) slots follows, one slot
+# per distinct snapshot keyed by a 64 bit hash of it and kept at most half full. Then comes one link per row, the next
+# row of the same position plus one or 0 for the last, so the rows of a position form a list and a position played in
+# many games costs no more probes than any other. When the table fills up it is rebuilt from its own slots, and the
+# links are copied over as they are.
+
+import argparse
+import hashlib
+import mmap
+import os
+import struct
+import sys
+
+import instrument
+from KubaGame import KubaGame, Board, MARBLE_TYPES, SHARED_MARBLES, SNAPSHOT_SIZE
+
+MAGIC = b'KUBP'
+VERSION = 2
+HEADER = struct.Struct('<4sB3xQ')
+ROW = struct.Struct('<{}sBBxH'.format(SNAPSHOT_SIZE))
+INDEX_HEADER = struct.Struct('<4sB3xQQ')
+INDEX_MAGIC = b'KUBI'
+INDEX_SLOT = struct.Struct('<QQQ')
+INDEX_LINK = struct.Struct('<Q')
+COLOR_CODES = {None: 0, 'W': 1, 'B': 2}
+CODE_COLORS = {code: color for color, code in COLOR_CODES.items()}
+
+
+def snapshot_key(snapshot):
+    """
+    Hashes a snapshot for the index
+
+    :param snapshot: bytes from KubaGame.snapshot
+    :return: 64 bit int
+    """
+    return int.from_bytes(hashlib.blake2b(snapshot, digest_size=8).digest(), 'little')
+
+
+def snapshot_ko_rule_move(snapshot):
+    """
+    Reads the ko rule move of a snapshot
+
+    :param snapshot: bytes or memoryview from KubaGame.snapshot
+    :return: move as tuple ((row, col), dir) or None
+    """
+    ko = snapshot[SNAPSHOT_SIZE - 1]
+    if ko == 255:
+        return None
+    cell, dir_index = divmod(ko, 4)
+    return divmod(cell, 7), 'FBLR'[dir_index]
+
+
+def snapshot_board(snapshot, shared=True):
+    """
+    Builds a 2D array of marbles from a snapshot, accepted by the board property and KubaGame
+
+    :param snapshot: bytes or memoryview from KubaGame.snapshot
+    :param shared: if True the squares hold the marbles of SHARED_MARBLES instead of new Marble objects
+    :return: 2D array of marbles
+    """
+    board = [[None] * 7 for _ in range(7)]
+    for offset, color in ((0, 'W'), (7, 'B'), (14, 'R')):
+        mask = int.from_bytes(snapshot[offset:offset + 7], 'little')
+        while mask:
+            low = mask & -mask
+            row, col = divmod(low.bit_length() - 1, 7)
+            board[row][col] = SHARED_MARBLES[color] if shared else MARBLE_TYPES[color]((row, col))
+            mask ^= low
+    return board
+
+
+class PositionRow:
+    """ Represents one row of a PositionDB without copying it out of the memory map. Valid until the next append to
+        the database or until it is closed.
+
+        Attributes:
+            snapshot: memoryview of the KubaGame.snapshot bytes
+            to_move: color to move, 'W' or 'B'
+            winner: color that won the game, None if the game had no result
+            ko_rule_move: move forbidden by the ko rule in the position, None if there is none
+            ply: number of moves played before the position
+    """
+
+    __slots__ = ('_view',)
+
+    def __init__(self, view):
+        """ Initializes a row over a memoryview of ROW.size bytes """
+        self._view = view
+
+    @property
+    def snapshot(self):
+        """ Snapshot property
+            :return memoryview of the snapshot bytes
+        """
+        return self._view[:SNAPSHOT_SIZE]
+
+    @property
+    def to_move(self):
+        """ To move property
+            :return 'W' or 'B'
+        """
+        return CODE_COLORS[self._view[SNAPSHOT_SIZE]]
+
+    @property
+    def winner(self):
+        """ Winner property
+            :return 'W', 'B' or None
+        """
+        return CODE_COLORS[self._view[SNAPSHOT_SIZE + 1]]
+
+    @property
+    def ko_rule_move(self):
+        """ Ko rule move property
+            :return move as tuple ((row, col), dir) or None
+        """
+        return snapshot_ko_rule_move(self._view)
+
+    @property
+    def ply(self):
+        """ Ply property
+            :return ply of the position
+        """
+        return self._view[SNAPSHOT_SIZE + 3] | self._view[SNAPSHOT_SIZE + 4] << 8
+
+    def board(self, shared=True):
+        """
+        Builds the 2D array of marbles of the position
+
+        :param shared: if True the squares hold the marbles of SHARED_MARBLES
+        :return: 2D array of marbles
+        """
+        return snapshot_board(self._view, shared)
+
+    def game(self, player_a=('White', 'W'), player_b=('Black', 'B'), board_type=Board):
+        """
+        Rebuilds the game of the position with KubaGame.from_snapshot, ko rule move included
+
+        :return: KubaGame
+        """
+        return KubaGame.from_snapshot(bytes(self.snapshot), player_a, player_b, board_type)
+
+
+class PositionDB:
+    """ Fixed width store of positions and game outcomes. Reads go through a memory map of the row file, so scans
+        and lookups never load the file into memory.
+    """
+
+    def __init__(self, path, writable=False, index_slots=1 << 16):
+        """
+        Opens a database, creating it if it is writable and does not exist
+
+        :param path: row file path, the index is path + '.idx'
+        :param writable: if True rows can be appended
+        :param index_slots: number of index slots of a new database, a power of two, one per distinct position
+        """
+        self._path = path
+        self._index_path = path + '.idx'
+        self._writable = writable
+        if not os.path.exists(path):
+            if not writable:
+                raise FileNotFoundError(path)
+            with open(path, 'wb') as file:
+                file.write(HEADER.pack(MAGIC, VERSION, 0))
+            self._write_index(index_slots, 0)
+
+        self._file = open(path, 'r+b' if writable else 'rb')
+        magic, version, count = HEADER.unpack(self._file.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError('{} is not a Kuba position database'.format(path))
+        if version != VERSION:
+            raise ValueError('unsupported position database version {}'.format(version))
+        self._count = count
+        self._map = None
+        self._index_file = open(self._index_path, 'r+b' if writable else 'rb')
+        self._index = None
+        self._index_slots = 0
+        self._positions = 0
+        self._links = 0
+        self._map_index()
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def positions(self):
+        """ Positions property
+            :return number of distinct positions in the index
+        """
+        return self._positions
+
+    def _rows(self):
+        """ Memory map of the row file, mapped again after appends """
+        if self._map is None and self._count:
+            self._map = mmap.mmap(self._file.fileno(), HEADER.size + self._count * ROW.size, access=mmap.ACCESS_READ)
+        return self._map
+
+    def _close_rows(self):
+        """ Closes the memory map of the row file, mapped again on the next read """
+        if self._map is not None:
+            try:
+                self._map.close()
+            except BufferError:
+                # Rows still referenced keep the map open until they are collected
+                pass
+            self._map = None
+
+    def _map_index(self):
+        """ Maps the index file """
+        self._index = mmap.mmap(self._index_file.fileno(), 0,
+                                access=mmap.ACCESS_WRITE if self._writable else mmap.ACCESS_READ)
+        magic, version, slots, positions = INDEX_HEADER.unpack_from(self._index, 0)
+        if magic != INDEX_MAGIC:
+            raise ValueError('{} is not a position index'.format(self._index_path))
+        if version != VERSION:
+            raise ValueError('unsupported position index version {}'.format(version))
+        self._index_slots = slots
+        self._positions = positions
+        self._links = INDEX_HEADER.size + slots * INDEX_SLOT.size
+
+    def _write_index(self, slots, positions, table=None, links=None):
+        """
+        Writes a whole index file
+
+        :param slots: number of slots
+        :param positions: number of distinct positions in the table
+        :param table: slot table bytes, empty if None
+        :param links: index map whose row links are copied, none if None
+        """
+        path = self._index_path + '.tmp'
+        with open(path, 'wb') as file:
+            file.write(INDEX_HEADER.pack(INDEX_MAGIC, VERSION, slots, positions))
+            file.write(bytearray(slots * INDEX_SLOT.size) if table is None else table)
+            if links is not None:
+                for start in range(self._links, len(links), 1 << 20):
+                    file.write(links[start:start + (1 << 20)])
+        os.replace(path, self._index_path)
+
+    def _slot(self, key, snapshot):
+        """
+        Finds the index slot of a position
+
+        :return: tuple (slot offset in the index file, first row + 1, last row + 1), rows 0 if the slot is empty
+        """
+        mask = self._index_slots - 1
+        slot = key & mask
+        while True:
+            offset = INDEX_HEADER.size + slot * INDEX_SLOT.size
+            stored, first, last = INDEX_SLOT.unpack_from(self._index, offset)
+            if not first or (stored == key and self.row(first - 1).snapshot == snapshot):
+                return offset, first, last
+            slot = (slot + 1) & mask
+
+    def _insert(self, key, snapshot, row):
+        """ Adds a row to the index at the end of the row list of its position """
+        offset, first, last = self._slot(key, snapshot)
+        if first:
+            INDEX_LINK.pack_into(self._index, self._links + (last - 1) * INDEX_LINK.size, row + 1)
+            INDEX_SLOT.pack_into(self._index, offset, key, first, row + 1)
+            return
+        INDEX_SLOT.pack_into(self._index, offset, key, row + 1, row + 1)
+        self._positions += 1
+        if 2 * self._positions > self._index_slots:
+            self._grow_index(2 * self._index_slots)
+
+    def _grow_index(self, slots):
+        """ Rebuilds the slot table with a number of slots from the current slots, keeping the row links """
+        table = bytearray(slots * INDEX_SLOT.size)
+        for slot in range(self._index_slots):
+            key, first, last = INDEX_SLOT.unpack_from(self._index, INDEX_HEADER.size + slot * INDEX_SLOT.size)
+            if not first:
+                continue
+            new = key & (slots - 1)
+            while INDEX_SLOT.unpack_from(table, new * INDEX_SLOT.size)[1]:
+                new = (new + 1) & (slots - 1)
+            INDEX_SLOT.pack_into(table, new * INDEX_SLOT.size, key, first, last)
+        self._write_index(slots, self._positions, table, self._index)
+        self._index.close()
+        self._index_file.close()
+        self._index_file = open(self._index_path, 'r+b')
+        self._map_index()
+
+    def append(self, rows):
+        """
+        Appends rows in one write
+
+        :param rows: iterable of (snapshot, to_move, winner, ply), colors as 'W', 'B' or None
+        :return: number of rows appended
+        """
+        if not self._writable:
+            raise ValueError('position database is read only')
+        data = bytearray()
+        snapshots = []
+        for snapshot, to_move, winner, ply in rows:
+            data += ROW.pack(snapshot, COLOR_CODES[to_move], COLOR_CODES[winner], ply)
+            snapshots.append(snapshot)
+        if not snapshots:
+            return 0
+
+        self._file.seek(HEADER.size + self._count * ROW.size)
+        self._file.write(data)
+        first = self._count
+        self._count += len(snapshots)
+        self._file.seek(0)
+        self._file.write(HEADER.pack(MAGIC, VERSION, self._count))
+        self._file.flush()
+        self._close_rows()
+
+        # Room for the links of the new rows, then the rows join the lists of their positions
+        size = len(self._index)
+        self._index.close()
+        os.ftruncate(self._index_file.fileno(), size + len(snapshots) * INDEX_LINK.size)
+        self._map_index()
+        for offset, snapshot in enumerate(snapshots):
+            self._insert(snapshot_key(snapshot), snapshot, first + offset)
+        INDEX_HEADER.pack_into(self._index, 0, INDEX_MAGIC, VERSION, self._index_slots, self._positions)
+        return len(snapshots)
+
+    def append_game(self, positions, winner):
+        """
+        Appends the positions of one game
+
+        :param positions: list of (snapshot, color to move) in the order they were played
+        :param winner: color that won, None if the game had no result
+        :return: number of rows appended
+        """
+        return self.append((snapshot, to_move, winner, ply) for ply, (snapshot, to_move) in enumerate(positions))
+
+    def row(self, index):
+        """
+        Gets one row
+
+        :param index: row number
+        :return: PositionRow
+        """
+        if not 0 <= index < self._count:
+            raise IndexError(index)
+        start = HEADER.size + index * ROW.size
+        return PositionRow(memoryview(self._rows())[start:start + ROW.size])
+
+    def __iter__(self):
+        """ Iterates over the rows as PositionRow views of the memory map """
+        if not self._count:
+            return
+        view = memoryview(self._rows())
+        for start in range(HEADER.size, HEADER.size + self._count * ROW.size, ROW.size):
+            yield PositionRow(view[start:start + ROW.size])
+
+    def find(self, snapshot):
+        """
+        Finds the rows of a position through the index
+
+        :param snapshot: bytes from KubaGame.snapshot
+        :return: list of row numbers in the order they were appended
+        """
+        rows = []
+        row = self._slot(snapshot_key(snapshot), snapshot)[1]
+        while row:
+            rows.append(row - 1)
+            row = INDEX_LINK.unpack_from(self._index, self._links + (row - 1) * INDEX_LINK.size)[0]
+        return rows
+
+    def outcomes(self, snapshot, to_move=None):
+        """
+        Counts the outcomes of the games a position was played in, for the side to move
+
+        :param snapshot: bytes from KubaGame.snapshot
+        :param to_move: color to move, needed for positions before the first move whose snapshot has no turn
+        :return: tuple (games, wins, losses, no result)
+        """
+        wins = losses = none = 0
+        for index in self.find(snapshot):
+            row = self.row(index)
+            if to_move is not None and row.to_move != to_move:
+                continue
+            if row.winner is None:
+                none += 1
+            elif row.winner == row.to_move:
+                wins += 1
+            else:
+                losses += 1
+        return wins + losses + none, wins, losses, none
+
+    def close(self):
+        """ Closes the maps and the files. Rows from iteration must not be used afterwards. """
+        self._close_rows()
+        if self._index is not None:
+            self._index.close()
+            self._index = None
+        self._file.close()
+        self._index_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def main(argv=None):
+    instrument.enable_from_environment()
+    parser = argparse.ArgumentParser(description='Inspect a Kuba position database.')
+    parser.add_argument('path', help='position database written by simulate.py --positions')
+    args = parser.parse_args(argv)
+
+    with PositionDB(args.path) as db:
+        wins = none = 0
+        for row in db:
+            winner = row.winner
+            if winner is None:
+                none += 1
+            elif winner == row.to_move:
+                wins += 1
+        print('{} positions, {} distinct, side to move won {}, lost {}, no result {}'.format(
+            len(db), db.positions, wins, len(db) - wins - none, none))
+        start = KubaGame(('White', 'W'), ('Black', 'B')).snapshot()
+        for color in ('W', 'B'):
+            games, wins, losses, none = db.outcomes(start, color)
+            print('start with {} to move: {} games, won {}, lost {}, no result {}'.format(color, games, wins, losses,
+                                                                                       none))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
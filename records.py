@@ -0,0 +1,255 @@
+# Description: Compact binary game records for the Kuba game.
+#
+# A record file starts with the 4 byte magic b'KUBR' and a version byte. Version 1 files hold 7x7 games, version 2
+# files are followed by a board size byte. Each game follows as a varint byte count and the moves, each move encoded
+# as (row * size + col) * 4 + direction index in one byte up to 7x7 and two little endian bytes on larger boards.
+# Games always start from the standard starting board of the size, the player making the first move is the owner of
+# the first marble pushed and turns alternate after that.
+
+from KubaGame import KubaGame, Board
+
+MAGIC = b'KUBR'
+VERSION = 1
+SIZED_VERSION = 2
+DIRS = ('F', 'B', 'L', 'R')
+DIR_INDEX = {dir: index for index, dir in enumerate(DIRS)}
+PLAYERS = (('White', 'W'), ('Black', 'B'))
+
+
+def move_width(size=7):
+    """
+    Number of bytes of an encoded move
+
+    :param size: board size
+    :return: 1 up to 7x7, 2 on larger boards
+    """
+    return 1 if size * size * 4 <= 256 else 2
+
+
+def encode_move(move, size=7):
+    """
+    Encodes a move as an int value
+
+    :param move: move as tuple ((row, col), dir)
+    :param size: board size
+    :return: int in range(size * size * 4), range(196) on the standard board
+    """
+    (row, col), dir = move
+    return (row * size + col) * 4 + DIR_INDEX[dir]
+
+
+def decode_move(code, size=7):
+    """
+    Decodes a move value
+
+    :param code: int from encode_move
+    :param size: board size
+    :return: move as tuple ((row, col), dir)
+    """
+    cell, dir_index = divmod(code, 4)
+    return divmod(cell, size), DIRS[dir_index]
+
+
+def encode_moves(moves, size=7):
+    """
+    Encodes a list of moves
+
+    :param moves: list of moves, as KubaGame.move_log
+    :param size: board size
+    :return: bytes, move_width(size) per move
+    """
+    if move_width(size) == 1:
+        return bytes(encode_move(move, size) for move in moves)
+    return b''.join(encode_move(move, size).to_bytes(2, 'little') for move in moves)
+
+
+def decode_moves(data, size=7):
+    """
+    Decodes a list of moves
+
+    :param data: bytes from encode_moves or read_games
+    :param size: board size
+    :return: list of moves as tuple ((row, col), dir)
+    """
+    if move_width(size) == 1:
+        return [decode_move(code, size) for code in data]
+    return [decode_move(int.from_bytes(data[i:i + 2], 'little'), size) for i in range(0, len(data), 2)]
+
+
+def _write_varint(file, value):
+    """ Writes an unsigned LEB128 integer """
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return file.write(out)
+
+
+def _read_varint(file):
+    """
+    Reads an unsigned LEB128 integer
+
+    :return: int or None at the end of the file
+    """
+    value = 0
+    shift = 0
+    while True:
+        byte = file.read(1)
+        if not byte:
+            if shift:
+                raise ValueError('truncated game record')
+            return None
+        value |= (byte[0] & 0x7F) << shift
+        if byte[0] < 0x80:
+            return value
+        shift += 7
+
+
+class RecordWriter:
+    """ Appends games to a record file. Games are written as soon as they are added, nothing is buffered beyond the
+        file object.
+
+        Attributes:
+            games: number of games written by this writer
+    """
+
+    def __init__(self, path, append=False, size=7):
+        """
+        Opens a record file for writing
+
+        :param path: file path
+        :param append: if True games are added to an existing file, which must hold games of the same board size
+        :param size: board size of the games
+        """
+        self._file = open(path, 'ab' if append else 'wb')
+        if self._file.tell() == 0:
+            self._file.write(MAGIC + bytes([VERSION]) if size == 7 else MAGIC + bytes([SIZED_VERSION, size]))
+        elif record_size(path) != size:
+            self._file.close()
+            raise ValueError('{} holds games of another board size'.format(path))
+        self._size = size
+        self._games = 0
+
+    @property
+    def games(self):
+        """ Games property
+            :return self._games
+        """
+        return self._games
+
+    def write_moves(self, moves):
+        """
+        Writes one game
+
+        :param moves: list of moves as tuple ((row, col), dir), or bytes already encoded with encode_moves
+        """
+        data = moves if isinstance(moves, (bytes, bytearray)) else encode_moves(moves, self._size)
+        _write_varint(self._file, len(data))
+        self._file.write(data)
+        self._games += 1
+
+    def write_game(self, game):
+        """
+        Writes the move log of a game played from the starting board
+
+        :param game: KubaGame
+        """
+        self.write_moves(game.move_log)
+
+    def flush(self):
+        """ Flushes the file """
+        self._file.flush()
+
+    def close(self):
+        """ Closes the file """
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def _read_header(file, path):
+    """
+    Reads the header of a record file
+
+    :return: board size of the games
+    """
+    header = file.read(len(MAGIC) + 1)
+    if header[:len(MAGIC)] != MAGIC:
+        raise ValueError('{} is not a Kuba record file'.format(path))
+    if header[len(MAGIC)] == VERSION:
+        return 7
+    if header[len(MAGIC)] == SIZED_VERSION:
+        size = file.read(1)
+        if not size:
+            raise ValueError('truncated record header')
+        return size[0]
+    raise ValueError('unsupported record version {}'.format(header[len(MAGIC)]))
+
+
+def record_size(path):
+    """
+    Reads the board size of the games of a record file
+
+    :param path: file path
+    :return: board size
+    """
+    with open(path, 'rb') as file:
+        return _read_header(file, path)
+
+
+def read_games(path):
+    """
+    Reads the games of a record file one at a time
+
+    :param path: file path
+    :return: generator of bytes, decoded by decode_moves with the size from record_size
+    """
+    with open(path, 'rb') as file:
+        _read_header(file, path)
+        while True:
+            count = _read_varint(file)
+            if count is None:
+                return
+            data = file.read(count)
+            if len(data) != count:
+                raise ValueError('truncated game record')
+            yield data
+
+
+def replay(data, board_type=Board, size=7):
+    """
+    Replays an encoded game through make_move
+
+    :param data: bytes from encode_moves or read_games
+    :param board_type: Board or BitBoard
+    :param size: board size
+    :return: KubaGame after the last move
+    """
+    game = KubaGame(*PLAYERS, board_type=board_type, size=size)
+    colors = {color: name for name, color in PLAYERS}
+    for coord, dir in decode_moves(data, size):
+        player_name = game.get_current_turn() or colors.get(game.get_marble(coord))
+        if player_name is None or not game.make_move(player_name, coord, dir):
+            raise ValueError('illegal move {} in game record'.format((coord, dir)))
+    return game
+
+
+def replay_games(path, board_type=Board):
+    """
+    Replays every game of a record file without loading the file into memory
+
+    :param path: file path
+    :param board_type: Board or BitBoard
+    :return: generator of KubaGame
+    """
+    size = record_size(path)
+    for data in read_games(path):
+        yield replay(data, board_type, size)
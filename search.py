@@ -0,0 +1,592 @@
+# Description: Alpha-beta search for computer play of the Kuba game.
+
+import functools
+import json
+import random
+import time
+
+# Score of a won position, wins found sooner score higher
+WIN_SCORE = 100000
+
+# Weights of the static evaluation
+RED_WEIGHT = 100
+MARBLE_WEIGHT = 60
+MOBILITY_WEIGHT = 1
+
+# Features of a position for LinearEvaluation, each one the value of the player to move minus the value of the
+# opponent: red marbles captured, marbles left, available moves, marbles on the edge, available moves that push off a
+# red marble, and rows and columns holding more of the player's marbles than of the opponent's
+FEATURES = ('red_captured', 'marbles', 'mobility', 'edge_marbles', 'red_threats', 'line_control')
+EVALUATION_VERSION = 1
+
+# Transposition table entry types
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+# The Zobrist position hash does not cover how the captured red marbles are split between the players, the
+# transposition table keys add one of these per player, enough for the red marbles of boards up to 17x17
+_capture_random = random.Random(0x52454453)
+_CAPTURE_KEYS = [[_capture_random.getrandbits(64) for _ in range(128)] for _ in range(2)]
+
+
+def pushed_off_color(board, move):
+    """
+    Determines which marble a move would push off the board without making the move.
+
+    :param board: KubaGame.Board or KubaGame.BitBoard
+    :param move: move as tuple ((row, col), dir)
+    :return: color of the marble that would be pushed off or None
+    """
+    return board.trace_push(*move)[1]
+
+
+def legal_moves(game, player):
+    """
+    Determines the moves make_move would accept from a player, the available moves that do not push off one of the
+    player's own marbles, nor recreate an earlier position when the game plays the superko rule.
+
+    :param game: KubaGame
+    :param player: Player to move
+    :return: list of moves as tuple ((row, col), dir)
+    """
+    moves = [move for move in player.available_moves(game.board, game.ko_rule_move)
+             if pushed_off_color(game.board, move) != player.color]
+    if game.superko:
+        moves = [move for move in moves if not game.repeats_position(*move)]
+    return moves
+
+
+def _to_table(score, ply):
+    """ Converts a win or loss score from distance to the root to distance to the stored position """
+    if score > WIN_SCORE - 1000:
+        return score + ply
+    if score < 1000 - WIN_SCORE:
+        return score - ply
+    return score
+
+
+def _from_table(score, ply):
+    """ Converts a stored win or loss score back to distance to the root """
+    if score > WIN_SCORE - 1000:
+        return score - ply
+    if score < 1000 - WIN_SCORE:
+        return score + ply
+    return score
+
+
+def evaluate(game, player, opponent):
+    """
+    Static evaluation of a position from the point of view of the player to move.
+
+    :param game: KubaGame
+    :param player: Player to move
+    :param opponent: the other Player
+    :return: score, higher is better for player
+    """
+    return (RED_WEIGHT * (player.red_captured - opponent.red_captured)
+            + MARBLE_WEIGHT * (player.marbles_left - opponent.marbles_left)
+            + MOBILITY_WEIGHT * (len(game.board.available_moves(player.color))
+                                 - len(game.board.available_moves(opponent.color))))
+
+
+def position_features(game, player, opponent):
+    """
+    Computes the FEATURES of a position. features.extract computes the same values for a batch of positions.
+
+    :param game: KubaGame
+    :param player: Player to move
+    :param opponent: the other Player
+    :return: tuple of ints in the order of FEATURES
+    """
+    board = game.board
+    geometry = board.geometry
+    masks = board.masks
+    own = masks[player.color]
+    other = masks[opponent.color]
+    own_moves = board.available_moves(player.color)
+    other_moves = board.available_moves(opponent.color)
+    threats = (sum(1 for move in own_moves if board.trace_push(*move)[1] == 'R')
+               - sum(1 for move in other_moves if board.trace_push(*move)[1] == 'R'))
+    control = 0
+    for line in geometry.lines:
+        own_count = (own & line).bit_count()
+        other_count = (other & line).bit_count()
+        control += (own_count > other_count) - (own_count < other_count)
+    return (player.red_captured - opponent.red_captured,
+            player.marbles_left - opponent.marbles_left,
+            len(own_moves) - len(other_moves),
+            (own & geometry.edges).bit_count() - (other & geometry.edges).bit_count(),
+            threats,
+            control)
+
+
+class LinearEvaluation:
+    """ Static evaluation as a weighted sum of the FEATURES of a position. Weights are fitted offline from game
+        outcomes by features.py and saved as a small JSON file, load_evaluation reads it once per process. An
+        instance can be called like evaluate.
+
+        Attributes:
+            weights: dictionary of the weight of each feature
+            info: dictionary of details saved with the weights, e.g. how they were fitted
+    """
+
+    __slots__ = ('_weights', '_info')
+
+    def __init__(self, weights, info=None):
+        """
+        Initializes the evaluation
+
+        :param weights: dictionary of weights by feature name, missing features weigh 0
+        :param info: optional dictionary of details saved with the weights
+        """
+        unknown = set(weights) - set(FEATURES)
+        if unknown:
+            raise ValueError('unknown evaluation features {}'.format(sorted(unknown)))
+        self._weights = tuple(float(weights.get(name, 0.0)) for name in FEATURES)
+        self._info = dict(info or {})
+
+    @property
+    def weights(self):
+        """ Weights property
+            :return dictionary of the weight of each feature
+        """
+        return dict(zip(FEATURES, self._weights))
+
+    @property
+    def info(self):
+        """ Info property
+            :return self._info
+        """
+        return self._info
+
+    def __call__(self, game, player, opponent):
+        """
+        Static evaluation of a position from the point of view of the player to move.
+
+        :param game: KubaGame
+        :param player: Player to move
+        :param opponent: the other Player
+        :return: score, higher is better for player
+        """
+        return sum(weight * value for weight, value in zip(self._weights, position_features(game, player, opponent)))
+
+    def save(self, path):
+        """
+        Writes the weights to a JSON file
+
+        :param path: file path
+        """
+        with open(path, 'w') as file:
+            json.dump({'version': EVALUATION_VERSION, 'weights': self.weights, 'info': self._info}, file, indent=2)
+            file.write('\n')
+
+    @classmethod
+    def load(cls, path):
+        """
+        Reads the weights from a JSON file written by save
+
+        :param path: file path
+        :return: LinearEvaluation
+        """
+        with open(path) as file:
+            data = json.load(file)
+        if data.get('version') != EVALUATION_VERSION:
+            raise ValueError('unsupported evaluation version {}'.format(data.get('version')))
+        return cls(data['weights'], data.get('info'))
+
+
+@functools.lru_cache(maxsize=None)
+def load_evaluation(path):
+    """
+    Reads an evaluation file once per process, used by the simulator policies
+
+    :param path: file path
+    :return: LinearEvaluation
+    """
+    return LinearEvaluation.load(path)
+
+
+class TranspositionTable:
+    """ Represents a bounded transposition table. Entries are stored in a fixed number of slots indexed by the low
+        bits of the position key. A slot is replaced when it holds the same position, when it was stored by an earlier
+        search, or when the new entry was searched at least as deep.
+
+        Attributes:
+            size: number of slots, a power of two
+            stores: number of entries written
+            hits: number of successful probes
+    """
+
+    def __init__(self, size=1 << 18):
+        """
+        Initializes an empty table
+
+        :param size: number of slots, rounded down to a power of two
+        """
+        self._size = 1 << (max(size, 1).bit_length() - 1)
+        self._mask = self._size - 1
+        self._slots = [None] * self._size
+        self._generation = 0
+        self._stores = 0
+        self._hits = 0
+
+    @property
+    def size(self):
+        """ Size property
+            :return self._size
+        """
+        return self._size
+
+    @property
+    def stores(self):
+        """ Stores property
+            :return self._stores
+        """
+        return self._stores
+
+    @property
+    def hits(self):
+        """ Hits property
+            :return self._hits
+        """
+        return self._hits
+
+    def new_search(self):
+        """ Marks the entries stored so far as belonging to an earlier search """
+        self._generation += 1
+
+    def clear(self):
+        """ Removes all entries """
+        self._slots = [None] * self._size
+        self._stores = 0
+        self._hits = 0
+
+    def probe(self, key):
+        """
+        Looks up a position
+
+        :param key: position key
+        :return: tuple (depth, score, flag, move) or None
+        """
+        entry = self._slots[key & self._mask]
+        if entry is not None and entry[0] == key:
+            self._hits += 1
+            return entry[1:5]
+        return None
+
+    def store(self, key, depth, score, flag, move):
+        """
+        Stores a position, following the replacement policy
+
+        :param key: position key
+        :param depth: remaining depth the position was searched to
+        :param score: score of the position
+        :param flag: EXACT, LOWER or UPPER bound
+        :param move: best move found or None
+        """
+        index = key & self._mask
+        entry = self._slots[index]
+        if entry is None or entry[0] == key or entry[5] != self._generation or depth >= entry[1]:
+            self._slots[index] = (key, depth, score, flag, move, self._generation)
+            self._stores += 1
+
+
+class SearchResult:
+    """ Represents the result of a search.
+
+        Attributes:
+            move: best move found as tuple ((row, col), dir) or None if the player has no legal move
+            score: score of the best move from the point of view of the player
+            depth: deepest completed iteration
+            nodes: number of positions visited
+            elapsed: search time in seconds
+            nodes_per_second: search speed
+    """
+
+    def __init__(self, move, score, depth, nodes, elapsed):
+        """ Initializes a search result """
+        self._move = move
+        self._score = score
+        self._depth = depth
+        self._nodes = nodes
+        self._elapsed = elapsed
+
+    @property
+    def move(self):
+        """ Move property
+            :return self._move
+        """
+        return self._move
+
+    @property
+    def score(self):
+        """ Score property
+            :return self._score
+        """
+        return self._score
+
+    @property
+    def depth(self):
+        """ Depth property
+            :return self._depth
+        """
+        return self._depth
+
+    @property
+    def nodes(self):
+        """ Nodes property
+            :return self._nodes
+        """
+        return self._nodes
+
+    @property
+    def elapsed(self):
+        """ Elapsed property
+            :return self._elapsed
+        """
+        return self._elapsed
+
+    @property
+    def nodes_per_second(self):
+        """ Nodes per second property
+            :return nodes divided by elapsed
+        """
+        if self._elapsed <= 0:
+            return 0.0
+        return self._nodes / self._elapsed
+
+    def __repr__(self):
+        return 'SearchResult(move={}, score={}, depth={}, nodes={}, nps={:.0f})'.format(
+            self._move, self._score, self._depth, self._nodes, self.nodes_per_second)
+
+
+class SearchTimeout(Exception):
+    """ Raised inside the search when the time budget or node limit is used up """
+    pass
+
+
+class AlphaBetaSearch:
+    """ Iterative deepening negamax search with alpha-beta pruning and a transposition table.
+
+        Moves are searched in a fixed order, the transposition table move first, then moves that push off a red marble,
+        then moves that push off an opponent marble, then the rest in the order of Player.available_moves. With a
+        depth or node limit the search is reproducible, a time budget only changes how many iterations complete.
+
+        Attributes:
+            max_depth: deepest iteration to search
+            time_limit: time budget per move in seconds or None
+            max_nodes: node budget per move or None
+            table: TranspositionTable
+    """
+
+    def __init__(self, max_depth=6, time_limit=1.0, max_nodes=None, table_size=1 << 18, evaluation=None):
+        """
+        Initializes the search
+
+        :param max_depth: deepest iteration to search
+        :param time_limit: time budget per move in seconds, None for no limit
+        :param max_nodes: node budget per move, None for no limit
+        :param table_size: number of transposition table slots
+        :param evaluation: static evaluation function (game, player, opponent) -> score, e.g. a LinearEvaluation,
+                           evaluate if None
+        """
+        self._evaluate = evaluate if evaluation is None else evaluation
+        self._max_depth = max_depth
+        self._time_limit = time_limit
+        self._max_nodes = max_nodes
+        self._table = TranspositionTable(table_size)
+        self._nodes = 0
+        self._deadline = None
+
+    @property
+    def max_depth(self):
+        """ Max depth property
+            :return self._max_depth
+        """
+        return self._max_depth
+
+    @property
+    def time_limit(self):
+        """ Time limit property
+            :return self._time_limit
+        """
+        return self._time_limit
+
+    @property
+    def max_nodes(self):
+        """ Max nodes property
+            :return self._max_nodes
+        """
+        return self._max_nodes
+
+    @property
+    def table(self):
+        """ Table property
+            :return self._table
+        """
+        return self._table
+
+    def search(self, game, player_name=None):
+        """
+        Searches for the best move. The game is searched in place with apply_move and undo_move and is left unchanged.
+
+        :param game: KubaGame
+        :param player_name: name of the player to move, defaults to the current turn
+        :return: SearchResult
+        """
+        if player_name is None:
+            player_name = game.get_current_turn()
+        player = game.players[player_name]
+        opponent = game.player_b if player is game.player_a else game.player_a
+
+        start = time.perf_counter()
+        self._deadline = None if self._time_limit is None else start + self._time_limit
+        self._nodes = 0
+        self._table.new_search()
+
+        best_move = None
+        best_score = 0
+        depth_done = 0
+        moves = legal_moves(game, player)
+        if moves and game.get_winner() is None and not game.draw:
+            best_move = moves[0]
+            for depth in range(1, self._max_depth + 1):
+                try:
+                    score, move = self._root(game, player, opponent, depth)
+                except SearchTimeout:
+                    break
+                best_score, best_move, depth_done = score, move, depth
+                # A forced win or loss will not change with deeper search
+                if abs(score) > WIN_SCORE - 1000:
+                    break
+
+        return SearchResult(best_move, best_score, depth_done, self._nodes, time.perf_counter() - start)
+
+    def _key(self, game):
+        """ Transposition table key of the current position """
+        return (game.position_hash ^ _CAPTURE_KEYS[0][game.player_a.red_captured]
+                ^ _CAPTURE_KEYS[1][game.player_b.red_captured])
+
+    def _ordered_moves(self, game, player, table_move):
+        """
+        Orders the legal moves of a player for searching
+
+        :param game: KubaGame
+        :param player: Player to move
+        :param table_move: best move stored in the transposition table or None
+        :return: list of moves
+        """
+        first = []
+        reds = []
+        captures = []
+        others = []
+        board = game.board
+        for move in legal_moves(game, player):
+            color = pushed_off_color(board, move)
+            if move == table_move:
+                first.append(move)
+            elif color == 'R':
+                reds.append(move)
+            elif color is not None:
+                captures.append(move)
+            else:
+                others.append(move)
+        return first + reds + captures + others
+
+    def _root(self, game, player, opponent, depth):
+        """
+        Searches the root position to a fixed depth
+
+        :return: tuple (score, best move)
+        """
+        entry = self._table.probe(self._key(game))
+        moves = self._ordered_moves(game, player, entry[3] if entry else None)
+        alpha = -WIN_SCORE - 1
+        best_move = moves[0]
+        for move in moves:
+            record = game.apply_move(*move)
+            try:
+                score = -self._negamax(game, opponent, player, depth - 1, -WIN_SCORE - 1, -alpha, 1)
+            finally:
+                game.undo_move(record)
+            if score > alpha:
+                alpha = score
+                best_move = move
+        self._table.store(self._key(game), depth, alpha, EXACT, best_move)
+        return alpha, best_move
+
+    def _negamax(self, game, player, opponent, depth, alpha, beta, ply):
+        """
+        Negamax search with alpha-beta pruning
+
+        :param game: KubaGame
+        :param player: Player to move
+        :param opponent: the other Player
+        :param depth: remaining depth
+        :param alpha: lower bound
+        :param beta: upper bound
+        :param ply: distance from the root
+        :return: score from the point of view of player
+        """
+        self._nodes += 1
+        if self._nodes & 1023 == 0:
+            if self._deadline is not None and time.perf_counter() > self._deadline:
+                raise SearchTimeout
+        if self._max_nodes is not None and self._nodes > self._max_nodes:
+            raise SearchTimeout
+
+        winner = game.get_winner()
+        if winner is not None:
+            return WIN_SCORE - ply if winner == player.name else ply - WIN_SCORE
+        # Drawn by the repetition or move limit of the game
+        if game.draw:
+            return 0
+
+        if depth <= 0:
+            return self._evaluate(game, player, opponent)
+
+        key = self._key(game)
+        entry = self._table.probe(key)
+        table_move = None
+        if entry is not None:
+            entry_depth, entry_score, flag, table_move = entry
+            entry_score = _from_table(entry_score, ply)
+            if entry_depth >= depth:
+                if flag == EXACT:
+                    return entry_score
+                if flag == LOWER and entry_score >= beta:
+                    return entry_score
+                if flag == UPPER and entry_score <= alpha:
+                    return entry_score
+
+        moves = self._ordered_moves(game, player, table_move)
+        # A player whose only moves push off their own marbles cannot move and loses
+        if not moves:
+            return ply - WIN_SCORE
+
+        original_alpha = alpha
+        best_score = -WIN_SCORE - 1
+        best_move = None
+        for move in moves:
+            record = game.apply_move(*move)
+            try:
+                score = -self._negamax(game, opponent, player, depth - 1, -beta, -alpha, ply + 1)
+            finally:
+                game.undo_move(record)
+            if score > best_score:
+                best_score = score
+                best_move = move
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                break
+
+        if best_score <= original_alpha:
+            flag = UPPER
+        elif best_score >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self._table.store(key, depth, _to_table(best_score, ply), flag, best_move)
+        return best_score
@@ -0,0 +1,396 @@
+# Description: Asyncio server hosting many Kuba games over TCP with a line delimited JSON protocol.
+#
+# Every request and reply is one JSON object per line. Requests carry an 'op' and may carry an 'id' that is echoed in
+# the direct reply:
+#
+#   {"op": "new"}                                          create a session and take the White seat
+#   {"op": "join", "session": s}                           take the free seat of a session
+#   {"op": "move", "session": s, "coord": [r, c], "dir": "L"}
+#   {"op": "state", "session": s}                          full state of a session
+#   {"op": "stats"}                                        server counters
+#
+# A connection may hold seats in many sessions, and both seats of a session. Accepted moves are broadcast to every
+# connection seated in the session as a 'move' message with the squares that changed.
+
+import argparse
+import asyncio
+import collections
+import itertools
+import json
+import sys
+import time
+
+import instrument
+from KubaGame import KubaGame, Board, BitBoard, CompactBoard, geometry
+from stats import percentile
+
+PLAYERS = (('White', 'W'), ('Black', 'B'))
+BOARD_TYPES = {'list': Board, 'bit': BitBoard, 'compact': CompactBoard}
+EMPTY = '.'
+
+
+class ServerStats:
+    """ Counters of a server.
+
+        Attributes:
+            moves: number of accepted moves
+            rejected: number of rejected moves
+            sessions_created: number of sessions created
+    """
+
+    def __init__(self, window=5.0, samples=10000):
+        """
+        Initializes the counters
+
+        :param window: seconds of moves averaged by moves_per_second
+        :param samples: number of most recent move latencies kept for the percentiles
+        """
+        self._window = window
+        self._latencies = collections.deque(maxlen=samples)
+        self._buckets = collections.deque()
+        self.moves = 0
+        self.rejected = 0
+        self.sessions_created = 0
+
+    def record_move(self, latency, now=None):
+        """
+        Counts an accepted move
+
+        :param latency: seconds from reading the request to queueing the broadcast
+        :param now: time.monotonic() of the move, defaults to the current time
+        """
+        if now is None:
+            now = time.monotonic()
+        self.moves += 1
+        self._latencies.append(latency)
+        second = int(now)
+        if self._buckets and self._buckets[-1][0] == second:
+            self._buckets[-1][1] += 1
+        else:
+            self._buckets.append([second, 1])
+        self._prune(now)
+
+    def _prune(self, now):
+        """ Drops the per second move counts that start before the window """
+        while self._buckets and self._buckets[0][0] < now - self._window:
+            self._buckets.popleft()
+
+    def moves_per_second(self, now=None):
+        """
+        Average rate of accepted moves over the window. Only the seconds that start inside the window are counted, the
+        second the window starts in would add up to one second of moves too many.
+
+        :param now: time.monotonic(), defaults to the current time
+        :return: float
+        """
+        if now is None:
+            now = time.monotonic()
+        self._prune(now)
+        return sum(count for second, count in self._buckets) / self._window
+
+    def latency_percentile(self, percent):
+        """
+        Move latency percentile over the most recent moves
+
+        :param percent: percentile from 0 to 100
+        :return: seconds, 0.0 before the first move
+        """
+        return percentile(self._latencies, percent)
+
+
+class Session:
+    """ Represents one hosted game.
+
+        Attributes:
+            id: session id
+            game: KubaGame between White and Black
+            seats: dictionary of the connection seated as each player name
+    """
+
+    def __init__(self, session_id, board_type=Board, size=7):
+        """ Initializes a session with an empty game """
+        self.id = session_id
+        self.game = KubaGame(*PLAYERS, board_type=board_type, size=size)
+        self.seats = {}
+
+    def free_seat(self):
+        """
+        Finds a free player name
+
+        :return: player name or None if both seats are taken
+        """
+        for name, _ in PLAYERS:
+            if name not in self.seats:
+                return name
+        return None
+
+    def state(self):
+        """
+        Full state of the game
+
+        :return: JSON serializable dictionary
+        """
+        game = self.game
+        return {'board': board_rows(game), 'turn': game.get_current_turn(), 'winner': game.get_winner(),
+                'ko': game.ko_rule_move, 'captured': {name: game.get_captured(name) for name, _ in PLAYERS},
+                'marbles': game.get_marble_count()}
+
+
+def board_rows(game):
+    """
+    Encodes the board as one string of 'W', 'B', 'R' and '.' per row
+
+    :param game: KubaGame
+    :return: list of str
+    """
+    return [''.join(marble.color if marble is not None else EMPTY for marble in row) for row in game.board.board]
+
+
+def line_cells(coord, dir, size=7):
+    """
+    Squares a push can change, from the pushed marble to the edge
+
+    :param coord: (row, col)
+    :param dir: direction
+    :param size: board size
+    :return: list of (row, col)
+    """
+    return list(geometry(size).rays[coord[0] * size + coord[1]][dir])
+
+
+class Connection:
+    """ Represents one client connection. Writes are queued so a slow client never blocks the games of others. """
+
+    def __init__(self, reader, writer):
+        """ Initializes a connection """
+        self.reader = reader
+        self.writer = writer
+        self.sessions = set()
+
+    def send(self, message):
+        """ Queues one message """
+        self.writer.write(json.dumps(message, separators=(',', ':')).encode() + b'\n')
+
+
+class KubaServer:
+    """ Hosts many KubaGame sessions. Moves are checked by KubaGame.make_move, so the server accepts exactly the moves
+        the game accepts.
+
+        Attributes:
+            sessions: dictionary of the active sessions by id
+            stats: ServerStats
+    """
+
+    def __init__(self, host='127.0.0.1', port=8765, board_type=Board, size=7):
+        """
+        Initializes the server
+
+        :param host: address to listen on
+        :param port: port to listen on, 0 picks a free port
+        :param board_type: board representation of the games
+        :param size: board size of the games
+        """
+        self._host = host
+        self._port = port
+        self._board_type = board_type
+        self._size = size
+        self._server = None
+        self._connections = set()
+        self._handlers = set()
+        self._ids = itertools.count(1)
+        self.sessions = {}
+        self.stats = ServerStats()
+
+    @property
+    def port(self):
+        """ Port property
+            :return the port listened on once started
+        """
+        if self._server is not None:
+            return self._server.sockets[0].getsockname()[1]
+        return self._port
+
+    async def start(self):
+        """ Starts listening """
+        self._server = await asyncio.start_server(self._handle, self._host, self._port)
+
+    async def serve_forever(self):
+        """ Starts listening if needed and serves until cancelled """
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        """ Stops listening, closes the open connections and waits for their handlers to finish """
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        for connection in list(self._connections):
+            connection.writer.close()
+        await asyncio.gather(*self._handlers, return_exceptions=True)
+
+    def counters(self):
+        """
+        Current counters
+
+        :return: JSON serializable dictionary
+        """
+        return {'active_sessions': len(self.sessions), 'sessions_created': self.stats.sessions_created,
+                'moves': self.stats.moves, 'rejected': self.stats.rejected,
+                'moves_per_second': self.stats.moves_per_second(),
+                'p50_latency_ms': self.stats.latency_percentile(50) * 1000,
+                'p99_latency_ms': self.stats.latency_percentile(99) * 1000}
+
+    async def _handle(self, reader, writer):
+        """ Serves one connection """
+        connection = Connection(reader, writer)
+        self._connections.add(connection)
+        self._handlers.add(asyncio.current_task())
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                start = time.monotonic()
+                request = {}
+                try:
+                    request = json.loads(line)
+                    reply = self.dispatch(connection, request, start)
+                except (ValueError, TypeError, KeyError) as error:
+                    request = request if isinstance(request, dict) else {}
+                    reply = {'type': 'error', 'error': str(error) or type(error).__name__}
+                if reply is not None:
+                    if 'id' in request:
+                        reply['id'] = request['id']
+                    connection.send(reply)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self._leave(connection)
+            self._connections.discard(connection)
+            self._handlers.discard(asyncio.current_task())
+            writer.close()
+
+    def dispatch(self, connection, request, start=None):
+        """
+        Handles one request
+
+        :param connection: Connection the request came from
+        :param request: decoded request
+        :param start: time.monotonic() the request was read
+        :return: reply dictionary or None if the reply was broadcast
+        """
+        if not isinstance(request, dict):
+            raise ValueError('request must be an object')
+        op = request.get('op')
+        if op == 'new':
+            session = Session('s{}'.format(next(self._ids)), self._board_type, self._size)
+            self.sessions[session.id] = session
+            self.stats.sessions_created += 1
+            return self._seat(connection, session, PLAYERS[0][0])
+        if op == 'stats':
+            return dict(self.counters(), type='stats')
+
+        session = self.sessions.get(request.get('session'))
+        if session is None:
+            return {'type': 'error', 'error': 'unknown session'}
+        if op == 'join':
+            name = session.free_seat()
+            if name is None:
+                return {'type': 'error', 'session': session.id, 'error': 'session is full'}
+            return self._seat(connection, session, name)
+        if op == 'state':
+            return dict(session.state(), type='state', session=session.id)
+        if op == 'move':
+            return self._move(connection, session, request, time.monotonic() if start is None else start)
+        return {'type': 'error', 'error': 'unknown op {!r}'.format(op)}
+
+    def _seat(self, connection, session, name):
+        """ Seats a connection in a session """
+        session.seats[name] = connection
+        connection.sessions.add(session.id)
+        return dict(session.state(), type='joined', session=session.id, player=name)
+
+    def _move(self, connection, session, request, start):
+        """ Plays a move for the seat of the connection and broadcasts it """
+        names = [name for name, seated in session.seats.items() if seated is connection]
+        if not names:
+            return {'type': 'error', 'session': session.id, 'error': 'not seated'}
+        # A connection holding both seats plays for the player whose turn it is
+        turn = session.game.get_current_turn()
+        name = request.get('player') or (turn if turn in names else names[0])
+        if name not in names:
+            return {'type': 'error', 'session': session.id, 'error': 'not seated as {}'.format(name)}
+
+        row, col = request['coord']
+        coord = (int(row), int(col))
+        dir = request['dir']
+        game = session.game
+        size = game.board.size
+        if dir not in Board._STEPS or not (0 <= coord[0] < size and 0 <= coord[1] < size):
+            accepted = False
+        else:
+            cells = line_cells(coord, dir, size)
+            before = [game.get_marble(cell) for cell in cells]
+            accepted = game.make_move(name, coord, dir)
+        if not accepted:
+            self.stats.rejected += 1
+            return {'type': 'error', 'session': session.id, 'error': 'illegal move',
+                    'move': [list(coord), dir]}
+
+        changes = [[row, col, marble if marble != 'X' else EMPTY]
+                   for (row, col), old, marble in zip(cells, before, map(game.get_marble, cells)) if marble != old]
+        message = {'type': 'move', 'session': session.id, 'player': name, 'move': [list(coord), dir],
+                   'changes': changes, 'turn': game.get_current_turn(), 'winner': game.get_winner(),
+                   'captured': {player: game.get_captured(player) for player, _ in PLAYERS}}
+        if 'id' in request:
+            message['id'] = request['id']
+        for seated in set(session.seats.values()):
+            seated.send(message)
+        self.stats.record_move(time.monotonic() - start)
+        return None
+
+    def _leave(self, connection):
+        """ Frees the seats of a closed connection and drops sessions nobody is seated in """
+        for session_id in connection.sessions:
+            session = self.sessions.get(session_id)
+            if session is None:
+                continue
+            for name in [name for name, seated in session.seats.items() if seated is connection]:
+                del session.seats[name]
+            if not session.seats:
+                del self.sessions[session_id]
+
+
+def main(argv=None):
+    instrument.enable_from_environment()
+    parser = argparse.ArgumentParser(description='Host Kuba games over TCP.')
+    parser.add_argument('--host', default='127.0.0.1', help='address to listen on')
+    parser.add_argument('--port', type=int, default=8765, help='port to listen on')
+    parser.add_argument('--board', choices=sorted(BOARD_TYPES), default='compact', help='board representation')
+    parser.add_argument('--size', type=int, default=7, help='board size, odd and at least 5')
+    parser.add_argument('--stats-interval', type=float, default=0, help='print the counters every this many seconds')
+    args = parser.parse_args(argv)
+
+    async def serve():
+        server = KubaServer(args.host, args.port, BOARD_TYPES[args.board], args.size)
+        await server.start()
+        print('listening on {}:{}'.format(args.host, server.port))
+        if args.stats_interval > 0:
+            async def report():
+                while True:
+                    await asyncio.sleep(args.stats_interval)
+                    print(json.dumps(server.counters()))
+            asyncio.ensure_future(report())
+        await server.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
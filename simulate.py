@@ -0,0 +1,297 @@
+# Description: Headless batch self-play of the Kuba game between move selection policies.
+
+import argparse
+import importlib
+import json
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import instrument
+from KubaGame import KubaGame, Board, BitBoard
+from search import AlphaBetaSearch, legal_moves, evaluate, load_evaluation
+from mcts import MonteCarloSearch
+from records import RecordWriter, encode_moves
+from book import load_book, book_policy
+from tablebase import load_tablebase, tablebase_policy
+from posdb import PositionDB
+
+BOARD_TYPES = {'list': Board, 'bit': BitBoard}
+# Games are drawn at the third repetition of a position unless asked otherwise
+REPETITION_LIMIT = 3
+
+
+def random_policy(seed):
+    """
+    Policy that plays a random legal move
+
+    :param seed: random seed
+    :return: policy function (game, player_name) -> move
+    """
+    rng = random.Random(seed)
+
+    def policy(game, player_name):
+        return rng.choice(legal_moves(game, game.players[player_name]))
+    return policy
+
+
+def greedy_policy(seed, weights=None):
+    """
+    Policy that plays the legal move with the best static evaluation one ply ahead, ties broken at random
+
+    :param seed: random seed
+    :param weights: evaluation file written by features.py, search.evaluate if None
+    :return: policy function (game, player_name) -> move
+    """
+    rng = random.Random(seed)
+    score_position = evaluate if weights is None else load_evaluation(weights)
+
+    def policy(game, player_name):
+        player = game.players[player_name]
+        opponent = game.player_b if player is game.player_a else game.player_a
+        best_moves = []
+        best_score = None
+        for move in legal_moves(game, player):
+            record = game.apply_move(*move)
+            winner = game.get_winner()
+            score = float('inf') if winner == player_name else score_position(game, player, opponent)
+            game.undo_move(record)
+            if best_score is None or score > best_score:
+                best_moves = [move]
+                best_score = score
+            elif score == best_score:
+                best_moves.append(move)
+        return rng.choice(best_moves)
+    return policy
+
+
+def alphabeta_policy(seed, depth=3, time=None, nodes=None, weights=None):
+    """
+    Policy that plays the move found by AlphaBetaSearch
+
+    :param seed: unused, the search is deterministic
+    :param depth: search depth
+    :param time: time budget per move in seconds
+    :param nodes: node budget per move
+    :param weights: evaluation file written by features.py, search.evaluate if None
+    :return: policy function (game, player_name) -> move
+    """
+    search = AlphaBetaSearch(max_depth=int(depth), time_limit=None if time is None else float(time),
+                             max_nodes=None if nodes is None else int(nodes),
+                             evaluation=None if weights is None else load_evaluation(weights))
+
+    def policy(game, player_name):
+        return search.search(game, player_name).move
+    return policy
+
+
+def mcts_policy(seed, playouts=200, time=None, rollout=100):
+    """
+    Policy that plays the move found by MonteCarloSearch in the calling process
+
+    :param seed: random seed
+    :param playouts: playouts per move
+    :param time: time budget per move in seconds
+    :param rollout: maximum rollout length
+    :return: policy function (game, player_name) -> move
+    """
+    rng = random.Random(seed)
+
+    def policy(game, player_name):
+        search = MonteCarloSearch(playouts=int(playouts), time_limit=None if time is None else float(time),
+                                  seed=rng.getrandbits(32), max_rollout_plies=int(rollout))
+        return search.search(game, player_name).move
+    return policy
+
+
+POLICIES = {'random': random_policy, 'greedy': greedy_policy, 'alphabeta': alphabeta_policy, 'mcts': mcts_policy}
+
+
+def make_policy(spec, seed):
+    """
+    Builds a policy from a specification string. The specification is a name from POLICIES or an importable
+    'module.factory', optionally followed by ':' and comma separated key=value options passed to the factory,
+    e.g. 'alphabeta:depth=4,time=0.5'. A factory takes the seed and the options and returns a policy function
+    (game, player_name) -> move. The options book=path and book_min_games=n are handled here for every policy, the
+    policy plays the move of the opening book file when the position is in it. Likewise with tablebase=path the
+    policy plays the best move of the tablebase file when the position is in the tables.
+
+    :param spec: policy specification
+    :param seed: random seed of the policy
+    :return: policy function
+    """
+    name, _, options = spec.partition(':')
+    kwargs = dict(option.split('=', 1) for option in options.split(',') if option)
+    book = kwargs.pop('book', None)
+    book_min_games = int(kwargs.pop('book_min_games', 1))
+    tablebase = kwargs.pop('tablebase', None)
+    if name in POLICIES:
+        factory = POLICIES[name]
+    else:
+        module, _, attr = name.rpartition('.')
+        factory = getattr(importlib.import_module(module), attr)
+    policy = factory(seed, **kwargs)
+    if book is not None:
+        policy = book_policy(load_book(book), policy, book_min_games)
+    if tablebase is not None:
+        policy = tablebase_policy(load_tablebase(tablebase), policy)
+    return policy
+
+
+def play_game(index, white, black, seed, max_plies=500, board_type='bit', keep_moves=False, keep_positions=False,
+              size=7, repetitions=REPETITION_LIMIT, superko=False):
+    """
+    Plays one game between two policies. Module level so it can run in a worker process.
+
+    :param index: game number
+    :param white: policy specification of the white player
+    :param black: policy specification of the black player
+    :param seed: seed of the game, the starting player and both policies are derived from it
+    :param max_plies: games still going after this many moves are drawn
+    :param board_type: 'bit' or 'list'
+    :param keep_moves: if True the result has the moves encoded by records.encode_moves under 'record'
+    :param keep_positions: if True the result has the (snapshot, color to move) of every position before a move under
+                           'positions', 7x7 boards only
+    :param size: board size
+    :param repetitions: games are drawn when a position is reached this many times, None for no limit
+    :param superko: if True moves may not recreate an earlier position
+    :return: dictionary with the game result, 'draw' is 'repetition' or 'move_limit' for games without a winner
+    """
+    start = time.perf_counter()
+    rng = random.Random(seed)
+    game = KubaGame(('White', 'W'), ('Black', 'B'), board_type=BOARD_TYPES[board_type], size=size, superko=superko,
+                    repetition_limit=repetitions, move_limit=max_plies)
+    policies = {'White': make_policy(white, rng.getrandbits(32)), 'Black': make_policy(black, rng.getrandbits(32))}
+    player_name = rng.choice(['White', 'Black'])
+
+    moves = 0
+    winner = None
+    positions = []
+    while not game.draw:
+        winner = game.get_winner()
+        if winner is not None:
+            break
+        if not legal_moves(game, game.players[player_name]):
+            # Only moves that push off an own marble are left, the player cannot move
+            winner = 'Black' if player_name == 'White' else 'White'
+            break
+        move = policies[player_name](game, player_name)
+        if keep_positions:
+            positions.append((game.snapshot(), game.players[player_name].color))
+        if not game.make_move(player_name, *move):
+            raise ValueError('policy {} played illegal move {}'.format(
+                white if player_name == 'White' else black, move))
+        moves += 1
+        player_name = game.get_current_turn()
+
+    draw = None
+    if winner is None:
+        draw = 'repetition' if repetitions is not None and game.repetitions() >= repetitions else 'move_limit'
+    result = {'game': index, 'seed': seed, 'white': white, 'black': black, 'winner': winner, 'draw': draw,
+              'moves': moves, 'white_red_captured': game.player_a.red_captured,
+              'black_red_captured': game.player_b.red_captured,
+              'duration': time.perf_counter() - start}
+    if keep_moves:
+        result['record'] = encode_moves(game.move_log, size)
+    if keep_positions:
+        result['positions'] = positions
+    return result
+
+
+def run(games, white, black, workers=1, seed=0, max_plies=500, board_type='bit', output=None, records=None,
+        positions=None, size=7, repetitions=REPETITION_LIMIT, superko=False):
+    """
+    Plays a batch of games and streams the results as JSON lines as games finish
+
+    :param games: number of games
+    :param white: policy specification of the white player
+    :param black: policy specification of the black player
+    :param workers: number of worker processes, 1 plays in the calling process
+    :param seed: base seed, game i is played with seed + i
+    :param max_plies: move cap of each game
+    :param board_type: 'bit' or 'list'
+    :param output: writable text file for the JSON lines or None
+    :param records: records.RecordWriter for the moves of each game or None
+    :param positions: writable posdb.PositionDB for the positions of each game or None
+    :param size: board size
+    :param repetitions: games are drawn when a position is reached this many times, None for no limit
+    :param superko: if True moves may not recreate an earlier position
+    :return: dictionary with the aggregate results
+    """
+    start = time.perf_counter()
+    wins = {'White': 0, 'Black': 0, None: 0}
+    repetition_draws = 0
+    total_moves = 0
+    args = [(index, white, black, seed + index, max_plies, board_type, records is not None, positions is not None,
+             size, repetitions, superko) for index in range(games)]
+
+    def record(result):
+        nonlocal total_moves, repetition_draws
+        if records is not None:
+            records.write_moves(result.pop('record'))
+        if positions is not None:
+            winner = None if result['winner'] is None else 'W' if result['winner'] == 'White' else 'B'
+            positions.append_game(result.pop('positions'), winner)
+        wins[result['winner']] += 1
+        repetition_draws += result['draw'] == 'repetition'
+        total_moves += result['moves']
+        if output is not None:
+            output.write(json.dumps(result) + '\n')
+            output.flush()
+
+    if workers <= 1:
+        for game_args in args:
+            record(play_game(*game_args))
+    else:
+        with ProcessPoolExecutor(workers, initializer=instrument.enable_worker_from_environment) as executor:
+            for future in as_completed([executor.submit(play_game, *game_args) for game_args in args]):
+                record(future.result())
+
+    elapsed = time.perf_counter() - start
+    return {'games': games, 'white_wins': wins['White'], 'black_wins': wins['Black'], 'no_result': wins[None],
+            'repetition_draws': repetition_draws, 'moves': total_moves, 'elapsed': elapsed,
+            'games_per_second': games / elapsed if elapsed > 0 else 0.0}
+
+
+def main(argv=None):
+    instrument.enable_from_environment()
+    parser = argparse.ArgumentParser(description='Play Kuba games between bots without a display.')
+    parser.add_argument('-n', '--games', type=int, default=100, help='number of games')
+    parser.add_argument('--white', default='random', help='white policy, e.g. random, greedy, alphabeta:depth=3')
+    parser.add_argument('--black', default='random', help='black policy, e.g. mcts:playouts=200')
+    parser.add_argument('-w', '--workers', type=int, default=1, help='number of worker processes')
+    parser.add_argument('--seed', type=int, default=0, help='base seed, game i uses seed + i')
+    parser.add_argument('--max-plies', type=int, default=500, help='move cap per game')
+    parser.add_argument('--repetitions', type=int, default=REPETITION_LIMIT,
+                        help='draw a game when a position is reached this many times, 0 for no limit')
+    parser.add_argument('--superko', action='store_true', help='forbid moves that recreate an earlier position')
+    parser.add_argument('--board', choices=sorted(BOARD_TYPES), default='bit', help='board representation')
+    parser.add_argument('--size', type=int, default=7, help='board size, odd and at least 5')
+    parser.add_argument('-o', '--output', help='JSON lines file for the per game results')
+    parser.add_argument('--records', help='binary record file for the moves of each game')
+    parser.add_argument('--positions', help='position database the positions of each game are appended to')
+    args = parser.parse_args(argv)
+
+    output = open(args.output, 'w') if args.output else None
+    records = RecordWriter(args.records, size=args.size) if args.records else None
+    positions = PositionDB(args.positions, writable=True) if args.positions else None
+    try:
+        summary = run(args.games, args.white, args.black, args.workers, args.seed, args.max_plies, args.board, output,
+                      records, positions, args.size, args.repetitions or None, args.superko)
+    finally:
+        if positions is not None:
+            positions.close()
+        if output is not None:
+            output.close()
+        if records is not None:
+            records.close()
+
+    print('{games} games, white {white_wins}, black {black_wins}, no result {no_result} ({repetition_draws} by '
+          'repetition), {moves} moves'.format(**summary))
+    print('{:.2f} s, {:.2f} games/s'.format(summary['elapsed'], summary['games_per_second']))
+    return summary
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
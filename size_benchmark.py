@@ -0,0 +1,95 @@
+# Description: Cost of the game operations as the board grows, for each board representation.
+
+import random
+import sys
+import time
+
+import instrument
+from KubaGame import KubaGame, Board, BitBoard, CompactBoard
+from search import legal_moves
+
+BOARD_TYPES = (Board, BitBoard, CompactBoard)
+SIZES = (7, 9, 11)
+
+
+def sample_positions(size, count=50, plies=20, seed=0):
+    """
+    Plays random games and keeps the move logs of the positions reached, so every board type is timed on the same
+    positions
+
+    :param size: board size
+    :param count: number of positions
+    :param plies: random moves played to reach each position
+    :param seed: random seed
+    :return: list of (move log, player name to move)
+    """
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        game = KubaGame(('White', 'W'), ('Black', 'B'), size=size)
+        player_name = rng.choice(['White', 'Black'])
+        for _ in range(plies):
+            moves = legal_moves(game, game.players[player_name])
+            if game.get_winner() is not None or not moves:
+                break
+            game.make_move(player_name, *rng.choice(moves))
+            player_name = game.get_current_turn()
+        else:
+            positions.append((list(game.move_log), player_name))
+    return positions
+
+
+def time_operations(board_type, size, positions, repeat=20):
+    """
+    Times move generation, apply and undo of every legal move and the winner check over the sampled positions
+
+    :param board_type: Board, BitBoard or CompactBoard
+    :param size: board size
+    :param positions: list from sample_positions
+    :param repeat: passes over the positions
+    :return: dictionary of microseconds per operation by 'moves', 'apply_undo' and 'winner'
+    """
+    games = []
+    for move_log, player_name in positions:
+        game = KubaGame(('White', 'W'), ('Black', 'B'), board_type=board_type, size=size)
+        for coord, dir in move_log:
+            game.apply_move(coord, dir)
+        games.append((game, game.players[player_name]))
+
+    clock = time.perf_counter
+    seconds = {'moves': 0.0, 'apply_undo': 0.0, 'winner': 0.0}
+    counts = {'moves': 0, 'apply_undo': 0, 'winner': 0}
+    for _ in range(repeat):
+        for game, player in games:
+            start = clock()
+            moves = legal_moves(game, player)
+            seconds['moves'] += clock() - start
+            counts['moves'] += 1
+
+            start = clock()
+            for move in moves:
+                game.undo_move(game.apply_move(*move))
+            seconds['apply_undo'] += clock() - start
+            counts['apply_undo'] += len(moves)
+
+            start = clock()
+            game.update_winner()
+            seconds['winner'] += clock() - start
+            counts['winner'] += 1
+    return {name: seconds[name] / counts[name] * 1e6 if counts[name] else 0.0 for name in seconds}
+
+
+def main(argv=None):
+    instrument.enable_from_environment()
+    sizes = [int(size) for size in argv] if argv else SIZES
+    print('{:<5} {:<13} {:>10} {:>14} {:>10}'.format('size', 'board', 'moves us', 'apply+undo us', 'winner us'))
+    for size in sizes:
+        positions = sample_positions(size)
+        for board_type in BOARD_TYPES:
+            times = time_operations(board_type, size, positions)
+            print('{:<5} {:<13} {:10.2f} {:14.2f} {:10.2f}'.format(size, board_type.__name__, times['moves'],
+                                                                   times['apply_undo'], times['winner']))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
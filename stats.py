@@ -0,0 +1,16 @@
+# Description: Small statistics helpers shared by the server, the load client and the instrumentation.
+
+
+def percentile(values, percent):
+    """
+    Nearest rank percentile
+
+    :param values: iterable of numbers
+    :param percent: percentile from 0 to 100
+    :return: value, 0.0 if there are no values
+    """
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = max(1, -(-len(ordered) * percent // 100))
+    return ordered[int(rank) - 1]
@@ -0,0 +1,241 @@
+# Description: Symmetries of Kuba positions and canonical forms of positions.
+#
+# The rules do not change when the board is rotated or reflected, nor when the white and black marbles trade places
+# along with their counters and the turn, and the starting board is one of its own images under 8 of these moves. A
+# transform is an int from 0 to 15: the low 3 bits pick one of the 8 rotations and reflections in GEOMETRIC, adding
+# SWAP_COLORS swaps the colors. The canonical form of a position is its smallest image under the 16 transforms, so
+# caches and position stores keyed by canonical snapshots hold one entry for up to 16 equivalent positions. Moves are
+# mapped into the canonical orientation with to_canonical and back with from_canonical. The one rule that sees colors
+# is the winner check of a position where neither side can move, which KubaGame.update_winner settles for player b.
+
+from KubaGame import KubaGame, SNAPSHOT_SIZE
+
+GEOMETRIC = ('identity', 'rotate 90', 'rotate 180', 'rotate 270', 'mirror columns', 'mirror rows', 'transpose',
+             'anti transpose')
+SWAP_COLORS = 8
+TRANSFORMS = tuple(range(2 * len(GEOMETRIC)))
+
+DIRS = ('F', 'B', 'L', 'R')
+_STEPS = {'F': (-1, 0), 'B': (1, 0), 'L': (0, -1), 'R': (0, 1)}
+_DIRS_BY_STEP = {step: dir for dir, step in _STEPS.items()}
+_NO_KO = 255
+_SWAP_TURNS = (0, 2, 1)
+
+
+def _geometric(index, row, col, last):
+    """ Image of a square under one of the GEOMETRIC transforms of a board whose last row and column are last """
+    return ((row, col), (col, last - row), (last - row, last - col), (last - col, row),
+            (row, last - col), (last - row, col), (col, row), (last - col, last - row))[index]
+
+
+def transform_coord(coord, transform, size=7):
+    """
+    Maps a square to its image under a transform
+
+    :param coord: (row, col)
+    :param transform: int from TRANSFORMS
+    :param size: board size
+    :return: (row, col)
+    """
+    return _geometric(transform & 7, coord[0], coord[1], size - 1)
+
+
+def transform_dir(dir, transform):
+    """
+    Maps a push direction to its image under a transform
+
+    :param dir: 'F', 'B', 'L' or 'R'
+    :param transform: int from TRANSFORMS
+    :return: direction
+    """
+    d_row, d_col = _STEPS[dir]
+    # The image of a step is the difference of the images of two squares one step apart
+    start = _geometric(transform & 7, 1, 1, 2)
+    end = _geometric(transform & 7, 1 + d_row, 1 + d_col, 2)
+    return _DIRS_BY_STEP[(end[0] - start[0], end[1] - start[1])]
+
+
+def transform_move(move, transform, size=7):
+    """
+    Maps a move to its image under a transform. Swapping the colors does not move any square.
+
+    :param move: move as tuple ((row, col), dir) or None
+    :param transform: int from TRANSFORMS
+    :param size: board size
+    :return: move or None
+    """
+    if move is None:
+        return None
+    return transform_coord(move[0], transform, size), transform_dir(move[1], transform)
+
+
+def _inverse_table():
+    """ Finds the transform that undoes each transform """
+    inverses = []
+    for transform in TRANSFORMS:
+        for candidate in range(len(GEOMETRIC)):
+            if all(_geometric(candidate, *_geometric(transform & 7, row, col, 6), 6) == (row, col)
+                   for row, col in ((0, 1), (2, 5))):
+                inverses.append(candidate | (transform & SWAP_COLORS))
+                break
+    return tuple(inverses)
+
+
+_INVERSES = _inverse_table()
+
+
+def inverse(transform):
+    """
+    Gets the transform that undoes a transform
+
+    :param transform: int from TRANSFORMS
+    :return: int from TRANSFORMS
+    """
+    return _INVERSES[transform]
+
+
+def to_canonical(move, transform, size=7):
+    """
+    Maps a move of a position into the orientation of its canonical form
+
+    :param move: move as tuple ((row, col), dir)
+    :param transform: transform returned with the canonical form
+    :param size: board size
+    :return: move
+    """
+    return transform_move(move, transform, size)
+
+
+def from_canonical(move, transform, size=7):
+    """
+    Maps a move of a canonical form back into the orientation of the position it came from
+
+    :param move: move as tuple ((row, col), dir)
+    :param transform: transform returned with the canonical form
+    :param size: board size
+    :return: move
+    """
+    return transform_move(move, _INVERSES[transform], size)
+
+
+def _mask_tables():
+    """
+    Builds the image of every byte of a 7x7 snapshot mask under every geometric transform, so a mask is mapped with 7
+    lookups
+
+    :return: list by geometric transform of lists by byte of 256 masks
+    """
+    tables = []
+    for index in range(len(GEOMETRIC)):
+        images = [1 << (row * 7 + col) for row, col in
+                  (_geometric(index, cell // 7, cell % 7, 6) for cell in range(49))]
+        table = []
+        for byte in range(7):
+            values = [0] * 256
+            for value in range(1, 256):
+                low = value & -value
+                cell = byte * 8 + low.bit_length() - 1
+                values[value] = values[value ^ low] | (images[cell] if cell < 49 else 0)
+            table.append(values)
+        tables.append(table)
+    return tables
+
+
+def _ko_tables():
+    """ Builds the image of every snapshot ko byte under every geometric transform """
+    tables = []
+    for index in range(len(GEOMETRIC)):
+        table = [_NO_KO] * 256
+        for code in range(49 * 4):
+            cell, dir_index = divmod(code, 4)
+            (row, col), dir = transform_move((divmod(cell, 7), DIRS[dir_index]), index)
+            table[code] = (row * 7 + col) * 4 + DIRS.index(dir)
+        tables.append(table)
+    return tables
+
+
+_MASK_TABLES = _mask_tables()
+_KO_TABLES = _ko_tables()
+
+
+def _map_mask(table, data):
+    """ Maps a 7 byte snapshot mask with the byte tables of one geometric transform """
+    return (table[0][data[0]] | table[1][data[1]] | table[2][data[2]] | table[3][data[3]] | table[4][data[4]]
+            | table[5][data[5]] | table[6][data[6]])
+
+
+def _pack(white, black, red, counters, turn, ko):
+    """ Builds snapshot bytes """
+    return (white.to_bytes(7, 'little') + black.to_bytes(7, 'little') + red.to_bytes(7, 'little')
+            + bytes(counters) + bytes((turn, ko)))
+
+
+def transform_snapshot(snapshot, transform):
+    """
+    Maps a position to its image under a transform
+
+    :param snapshot: bytes from KubaGame.snapshot
+    :param transform: int from TRANSFORMS
+    :return: snapshot bytes
+    """
+    if len(snapshot) != SNAPSHOT_SIZE:
+        raise ValueError('snapshot must be {} bytes'.format(SNAPSHOT_SIZE))
+    table = _MASK_TABLES[transform & 7]
+    white = _map_mask(table, snapshot[0:7])
+    black = _map_mask(table, snapshot[7:14])
+    red = _map_mask(table, snapshot[14:21])
+    ko = _KO_TABLES[transform & 7][snapshot[26]]
+    if transform & SWAP_COLORS:
+        return _pack(black, white, red, snapshot[23:25] + snapshot[21:23], _SWAP_TURNS[snapshot[25]], ko)
+    return _pack(white, black, red, snapshot[21:25], snapshot[25], ko)
+
+
+def canonical_snapshot(snapshot):
+    """
+    Finds the canonical form of a position, its smallest image under the 16 transforms. Images are compared by the
+    white, black and red masks as integers, then by the counters, turn and ko move. When several transforms give the
+    canonical form the lowest one is returned.
+
+    :param snapshot: bytes from KubaGame.snapshot
+    :return: tuple (canonical snapshot bytes, transform from the position to the canonical form)
+    """
+    if len(snapshot) != SNAPSHOT_SIZE:
+        raise ValueError('snapshot must be {} bytes'.format(SNAPSHOT_SIZE))
+    counters = tuple(snapshot[21:25])
+    swapped_counters = counters[2:] + counters[:2]
+    turn = snapshot[25]
+    best = None
+    for index in range(len(GEOMETRIC)):
+        table = _MASK_TABLES[index]
+        white = _map_mask(table, snapshot[0:7])
+        black = _map_mask(table, snapshot[7:14])
+        red = _map_mask(table, snapshot[14:21])
+        ko = _KO_TABLES[index][snapshot[26]]
+        for image in ((white, black, red, counters, turn, ko, index),
+                      (black, white, red, swapped_counters, _SWAP_TURNS[turn], ko, index | SWAP_COLORS)):
+            if best is None or image < best:
+                best = image
+    return _pack(*best[:6]), best[6]
+
+
+def canonical(game):
+    """
+    Finds the canonical form of the position of a 7x7 game
+
+    :param game: KubaGame
+    :return: tuple (canonical snapshot bytes, transform from the game to the canonical form)
+    """
+    return canonical_snapshot(game.snapshot())
+
+
+def canonical_game(game, player_a=('White', 'W'), player_b=('Black', 'B')):
+    """
+    Rebuilds the canonical form of a position as a game
+
+    :param game: KubaGame
+    :param player_a: tuple (player name, marble color) of the new game
+    :param player_b: tuple (player name, marble color) of the new game
+    :return: tuple (KubaGame, transform from the game to the canonical form)
+    """
+    snapshot, transform = canonical(game)
+    return KubaGame.from_snapshot(snapshot, player_a, player_b, type(game.board)), transform
@@ -0,0 +1,690 @@
+# Description: Retrograde endgame tablebase for Kuba positions with few marbles on the board.
+#
+# A table is solved for every material (white, black and red marbles on the board, red marbles captured by white) with
+# at most K marbles on the board, from the smallest total up, since captures only lead to smaller materials. A
+# position is indexed by the placement of the marbles, the color to move and the ko rule move. Ko rule moves that
+# cannot be played by either color are dropped, the others are indexed by the white or black marble they push and
+# the direction. Values are stored for the side to move as 16 bit integers: 0 for a draw, 2n + 1 for a win in n plies
+# and 2n + 2 for a loss in n plies. Rules follow KubaGame: a player without an available move loses, white is
+# checked first as player a, and a player whose only moves push off an own marble loses, as in the simulator.
+#
+# The output file starts with the magic b'KUBT', a version byte, K, the number of materials and a directory of
+# (white, black, red, red captured by white, number of states, offset) followed by the value arrays.
+
+import argparse
+import array
+import functools
+import mmap
+import os
+import pickle
+import struct
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from math import comb
+
+import instrument
+from KubaGame import geometry
+from search import legal_moves
+
+MAGIC = b'KUBT'
+VERSION = 1
+HEADER = struct.Struct('<4sBBH')
+ENTRY = struct.Struct('<BBBBQQ')
+VALUE = struct.Struct('<H')
+
+DIRS = 'FBLR'
+DIR_INDEX = {dir: index for index, dir in enumerate(DIRS)}
+_OPPOSITE = [DIR_INDEX['B'], DIR_INDEX['F'], DIR_INDEX['R'], DIR_INDEX['L']]
+
+WIN = 'win'
+LOSS = 'loss'
+DRAW = 'draw'
+_INVALID = 0xFFFF
+
+
+def _ray_tables():
+    """
+    Builds the cells from every cell to the edge in every push direction and the cell a marble is pushed from, from
+    the rays of the 7x7 geometry
+
+    :return: tuple (rays [cell][dir] of cell lists, behind [cell][dir] of a cell or -1 on the edge)
+    """
+    board_geometry = geometry(7)
+    rays = [[[row * 7 + col for row, col in cell_rays[dir]] for dir in DIRS] for cell_rays in board_geometry.rays]
+    # The square behind a marble is the second square of the ray in the opposite direction
+    behind = [[cell_rays[opposite][1] if len(cell_rays[opposite]) > 1 else -1 for opposite in _OPPOSITE]
+              for cell_rays in rays]
+    return rays, behind
+
+
+RAYS, BEHIND = _ray_tables()
+
+
+def materials(k):
+    """
+    Lists the materials with at most k marbles on the board that are not decided by the counters alone
+
+    :param k: largest number of marbles on the board
+    :return: list of (white, black, red, red captured by white), smallest totals first
+    """
+    found = []
+    for total in range(3, k + 1):
+        for white in range(1, min(8, total - 2) + 1):
+            for black in range(1, min(8, total - white - 1) + 1):
+                red = total - white - black
+                if red > 13:
+                    continue
+                # Neither player may have 7 red marbles already
+                for red_white in range(max(0, 7 - red), min(6, 13 - red) + 1):
+                    found.append((white, black, red, red_white))
+    return found
+
+
+def ko_count(white, black):
+    """ Number of ko indices of a material, no ko and 4 directions per white or black marble """
+    return 1 + 4 * (white + black)
+
+
+def placements(white, black, red):
+    """ Number of ways to place the marbles of a material """
+    return comb(49, white) * comb(49 - white, black) * comb(49 - white - black, red)
+
+
+def material_states(material):
+    """ Number of indexed positions of a material """
+    white, black, red, _ = material
+    return placements(white, black, red) * 2 * ko_count(white, black)
+
+
+def _cells(mask):
+    """ Cells of a mask in increasing order """
+    cells = []
+    while mask:
+        low = mask & -mask
+        cells.append(low.bit_length() - 1)
+        mask ^= low
+    return cells
+
+
+def _rank_cells(mask, taken):
+    """ Colex rank of the cells of a mask, numbered among the cells not in taken """
+    rank = 0
+    for i, cell in enumerate(_cells(mask)):
+        rank += comb(cell - (taken & ((1 << cell) - 1)).bit_count(), i + 1)
+    return rank
+
+
+def _unrank_cells(rank, k, taken):
+    """ Mask of the k cells with a colex rank, numbered among the cells not in taken """
+    labels = []
+    for i in range(k, 0, -1):
+        label = i - 1
+        while comb(label + 1, i) <= rank:
+            label += 1
+        rank -= comb(label, i)
+        labels.append(label)
+    free = [cell for cell in range(49) if not taken >> cell & 1]
+    mask = 0
+    for label in labels:
+        mask |= 1 << free[label]
+    return mask
+
+
+def placement_rank(white_mask, black_mask, red_mask, white, black, red):
+    """
+    Ranks a placement of marbles
+
+    :return: int in range(placements(white, black, red))
+    """
+    rank_white = _rank_cells(white_mask, 0)
+    rank_black = _rank_cells(black_mask, white_mask)
+    rank_red = _rank_cells(red_mask, white_mask | black_mask)
+    return (rank_white * comb(49 - white, black) + rank_black) * comb(49 - white - black, red) + rank_red
+
+
+def placement_masks(rank, white, black, red):
+    """
+    Unranks a placement of marbles
+
+    :return: tuple (white mask, black mask, red mask)
+    """
+    rest, rank_red = divmod(rank, comb(49 - white - black, red))
+    rank_white, rank_black = divmod(rest, comb(49 - white, black))
+    white_mask = _unrank_cells(rank_white, white, 0)
+    black_mask = _unrank_cells(rank_black, black, white_mask)
+    red_mask = _unrank_cells(rank_red, red, white_mask | black_mask)
+    return white_mask, black_mask, red_mask
+
+
+def _push(masks, cell, dir_index):
+    """
+    Pushes the chain starting at a cell, matching Board.update_board
+
+    :param masks: list of the white, black and red masks, changed in place
+    :return: tuple (index of the color pushed off or None, cell the chain ends on or None)
+    """
+    ray = RAYS[cell][dir_index]
+    occupied = masks[0] | masks[1] | masks[2]
+    length = 0
+    while length < len(ray) and occupied >> ray[length] & 1:
+        length += 1
+
+    pushed_off = None
+    end = None
+    if length == len(ray):
+        last = 1 << ray[-1]
+        pushed_off = 0 if masks[0] & last else 1 if masks[1] & last else 2
+        masks[pushed_off] ^= last
+        length -= 1
+    else:
+        end = ray[length]
+    for i in range(length - 1, -1, -1):
+        bit = 1 << ray[i]
+        for color in range(3):
+            if masks[color] & bit:
+                masks[color] ^= bit | 1 << ray[i + 1]
+                break
+    return pushed_off, end
+
+
+def _ko_index(masks, cell, dir_index):
+    """
+    Index of a ko rule move, 0 if neither color could play it
+
+    :return: int in range(ko_count)
+    """
+    players = masks[0] | masks[1]
+    if not players >> cell & 1:
+        return 0
+    behind = BEHIND[cell][dir_index]
+    if behind >= 0 and (players | masks[2]) >> behind & 1:
+        return 0
+    return 1 + 4 * (players & ((1 << cell) - 1)).bit_count() + dir_index
+
+
+def _encode(result, distance):
+    """ Encodes a value for the side to move """
+    if result == WIN:
+        return 2 * distance + 1
+    if result == LOSS:
+        return 2 * distance + 2
+    return 0
+
+
+def decode(value):
+    """
+    Decodes a stored value
+
+    :param value: 16 bit value
+    :return: tuple (WIN, LOSS or DRAW, distance in plies or None for a draw)
+    """
+    if value == 0:
+        return DRAW, None
+    if value & 1:
+        return WIN, (value - 1) // 2
+    return LOSS, (value - 2) // 2
+
+
+@functools.lru_cache(maxsize=None)
+def _load_values(directory, material):
+    """ Loads the solved values of a material from a checkpoint directory """
+    values = array.array('H')
+    with open(_values_path(directory, material), 'rb') as file:
+        values.frombytes(file.read())
+    return values
+
+
+def _material_name(material):
+    return '{}w{}b{}r{}c'.format(*material)
+
+
+def _values_path(directory, material):
+    return os.path.join(directory, _material_name(material) + '.values')
+
+
+def _chunk_path(directory, material, start):
+    return os.path.join(directory, '{}.{}.chunk'.format(_material_name(material), start))
+
+
+def forward_chunk(material, start, end, directory):
+    """
+    Generates the moves of the positions of a range of placements. Module level so it can run in a worker process.
+
+    :param material: (white, black, red, red captured by white)
+    :param start: first placement rank
+    :param end: placement rank after the last
+    :param directory: checkpoint directory holding the values of the smaller materials
+    :return: dictionary of arrays over the states of the range: 'term' terminal values (0 for none, _INVALID for
+             states that are never reached), 'exit_win' and 'loss_max' distances through moves leaving the material,
+             'escape' set if such a move draws, and 'src', 'dst' of the moves staying in the material
+    """
+    white, black, red, red_white = material
+    counts = (white, black)
+    red_counts = (red_white, 13 - red - red_white)
+    kos = ko_count(white, black)
+    first_state = start * 2 * kos
+    size = (end - start) * 2 * kos
+    term = array.array('H', bytes(2 * size))
+    exit_win = array.array('H', bytes(2 * size))
+    loss_max = array.array('H', bytes(2 * size))
+    escape = bytearray(size)
+    src = array.array('I')
+    dst = array.array('I')
+
+    for rank in range(start, end):
+        masks = list(placement_masks(rank, white, black, red))
+        occupied = masks[0] | masks[1] | masks[2]
+
+        # Available moves of each color and where they lead
+        moves = ([], [])
+        outcomes = {}
+        for color in (0, 1):
+            for cell in _cells(masks[color]):
+                for dir_index in range(4):
+                    behind = BEHIND[cell][dir_index]
+                    if behind >= 0 and occupied >> behind & 1:
+                        continue
+                    move = (cell, dir_index)
+                    moves[color].append(move)
+                    after = list(masks)
+                    pushed_off, end_cell = _push(after, cell, dir_index)
+                    if pushed_off == color:
+                        # Pushing off an own marble is not allowed
+                        outcomes[move] = None
+                    elif pushed_off is None:
+                        ko = _ko_index(after, end_cell, _OPPOSITE[dir_index])
+                        outcomes[move] = ('state', (placement_rank(*after, white, black, red) * 2 + 1 - color) * kos
+                                          + ko)
+                    elif pushed_off == 2:
+                        captured = red_counts[color] + 1
+                        if captured == 7:
+                            outcomes[move] = ('exit', _encode(LOSS, 0))
+                        else:
+                            lower = (white, black, red - 1, red_white + (1 - color))
+                            lower_rank = placement_rank(*after, white, black, red - 1)
+                            lower_state = (lower_rank * 2 + 1 - color) * ko_count(white, black)
+                            outcomes[move] = ('exit', _load_values(directory, lower)[lower_state])
+                    elif counts[pushed_off] == 1:
+                        outcomes[move] = ('exit', _encode(LOSS, 0))
+                    else:
+                        lower_counts = list(counts)
+                        lower_counts[pushed_off] -= 1
+                        lower = (lower_counts[0], lower_counts[1], red, red_white)
+                        lower_rank = placement_rank(*after, *lower_counts, red)
+                        lower_state = (lower_rank * 2 + 1 - color) * ko_count(*lower_counts)
+                        outcomes[move] = ('exit', _load_values(directory, lower)[lower_state])
+
+        ko_moves = {0: None}
+        for color in (0, 1):
+            for move in moves[color]:
+                ko_moves[_ko_index(masks, *move)] = (color, move)
+
+        for side in (0, 1):
+            base = (rank * 2 + side) * kos
+            for state in range(base, base + kos):
+                term[state - first_state] = _INVALID
+            for ko, ko_move in ko_moves.items():
+                state = base + ko
+                local = state - first_state
+                available = [len(moves[0]), len(moves[1])]
+                if ko_move is not None:
+                    available[ko_move[0]] -= 1
+                    ko_move = ko_move[1]
+
+                if available[0] == 0:
+                    term[local] = _encode(WIN if side == 1 else LOSS, 0)
+                    continue
+                if available[1] == 0:
+                    term[local] = _encode(WIN if side == 0 else LOSS, 0)
+                    continue
+                legal = [move for move in moves[side] if move != ko_move and outcomes[move] is not None]
+                if not legal:
+                    term[local] = _encode(LOSS, 0)
+                    continue
+
+                term[local] = 0
+                for move in legal:
+                    kind, target = outcomes[move]
+                    if kind == 'state':
+                        src.append(state)
+                        dst.append(target)
+                        continue
+                    result, distance = decode(target)
+                    if result == LOSS:
+                        if not exit_win[local] or distance + 1 < exit_win[local]:
+                            exit_win[local] = distance + 1
+                    elif result == WIN:
+                        loss_max[local] = max(loss_max[local], distance + 1)
+                    else:
+                        escape[local] = 1
+
+    return {'term': term, 'exit_win': exit_win, 'loss_max': loss_max, 'escape': escape, 'src': src, 'dst': dst}
+
+
+def solve_material(material, directory, workers=1, chunk_placements=2000, log=None):
+    """
+    Solves one material by retrograde analysis, skipping it if the checkpoint directory already has its values.
+    Forward moves are generated in chunks of placements by worker processes and every chunk is saved to the
+    checkpoint directory, so an interrupted run picks up where it stopped.
+
+    :param material: (white, black, red, red captured by white)
+    :param directory: checkpoint directory, must hold the values of the smaller materials
+    :param workers: number of worker processes
+    :param chunk_placements: placements per chunk
+    :param log: optional function called with progress messages
+    :return: array of values
+    """
+    path = _values_path(directory, material)
+    if os.path.exists(path):
+        return _load_values(directory, material)
+
+    white, black, red, _ = material
+    total = placements(white, black, red)
+    states = material_states(material)
+    starts = list(range(0, total, chunk_placements))
+    pending = [start for start in starts if not os.path.exists(_chunk_path(directory, material, start))]
+
+    def save(start, chunk):
+        with open(_chunk_path(directory, material, start) + '.tmp', 'wb') as file:
+            pickle.dump(chunk, file, pickle.HIGHEST_PROTOCOL)
+        os.replace(_chunk_path(directory, material, start) + '.tmp', _chunk_path(directory, material, start))
+        if log is not None:
+            log('{} chunk {} of {}'.format(_material_name(material), starts.index(start) + 1, len(starts)))
+
+    args = [(material, start, min(start + chunk_placements, total), directory) for start in pending]
+    if workers <= 1:
+        for chunk_args in args:
+            save(chunk_args[1], forward_chunk(*chunk_args))
+    else:
+        with ProcessPoolExecutor(workers, initializer=instrument.enable_worker_from_environment) as executor:
+            for chunk_args, chunk in zip(args, executor.map(forward_chunk, *zip(*args))):
+                save(chunk_args[1], chunk)
+
+    # Merge the chunks
+    term = array.array('H')
+    exit_win = array.array('H')
+    loss_max = array.array('H')
+    escape = bytearray()
+    remaining = array.array('I', bytes(4 * states))
+    pred_count = array.array('I', bytes(4 * (states + 1)))
+    edges = []
+    for start in starts:
+        with open(_chunk_path(directory, material, start), 'rb') as file:
+            chunk = pickle.load(file)
+        term.extend(chunk['term'])
+        exit_win.extend(chunk['exit_win'])
+        loss_max.extend(chunk['loss_max'])
+        escape.extend(chunk['escape'])
+        for state in chunk['src']:
+            remaining[state] += 1
+        for state in chunk['dst']:
+            pred_count[state + 1] += 1
+        edges.append((chunk['src'], chunk['dst']))
+
+    # Predecessor lists in compressed rows
+    for state in range(states):
+        pred_count[state + 1] += pred_count[state]
+    fill = array.array('I', pred_count)
+    preds = array.array('I', bytes(4 * pred_count[states]))
+    for src, dst in edges:
+        for source, target in zip(src, dst):
+            preds[fill[target]] = source
+            fill[target] += 1
+    del edges, fill
+
+    # Retrograde propagation in order of distance, so wins are the fastest and losses the slowest
+    values = array.array('H', bytes(2 * states))
+    done = bytearray(states)
+    buckets = [[]]
+
+    def push(distance, state, value):
+        while len(buckets) <= distance:
+            buckets.append([])
+        buckets[distance].append((state, value))
+
+    for state in range(states):
+        if term[state] == _INVALID:
+            done[state] = 1
+        elif term[state]:
+            push(0, state, term[state])
+        else:
+            if exit_win[state]:
+                push(exit_win[state], state, _encode(WIN, exit_win[state]))
+            elif not remaining[state] and not escape[state]:
+                push(loss_max[state], state, _encode(LOSS, loss_max[state]))
+
+    distance = 0
+    while distance < len(buckets):
+        for state, value in buckets[distance]:
+            if done[state]:
+                continue
+            done[state] = 1
+            values[state] = value
+            lost = not value & 1
+            for index in range(pred_count[state], pred_count[state + 1]):
+                pred = preds[index]
+                if done[pred]:
+                    continue
+                if lost:
+                    push(distance + 1, pred, _encode(WIN, distance + 1))
+                else:
+                    remaining[pred] -= 1
+                    if distance + 1 > loss_max[pred]:
+                        loss_max[pred] = distance + 1
+                    if not remaining[pred] and not escape[pred] and not exit_win[pred]:
+                        push(loss_max[pred], pred, _encode(LOSS, loss_max[pred]))
+        buckets[distance] = None
+        distance += 1
+
+    with open(path + '.tmp', 'wb') as file:
+        values.tofile(file)
+    os.replace(path + '.tmp', path)
+    for start in starts:
+        os.remove(_chunk_path(directory, material, start))
+    if log is not None:
+        log('{} solved, {} states'.format(_material_name(material), states))
+    return values
+
+
+def build(k, output, workers=1, checkpoint=None, chunk_placements=2000, log=None):
+    """
+    Builds a tablebase file for every material with at most k marbles on the board
+
+    :param k: largest number of marbles on the board
+    :param output: output file path
+    :param workers: number of worker processes
+    :param checkpoint: directory for the solved materials and the move chunks, a temporary one if None
+    :param chunk_placements: placements per chunk of work
+    :param log: optional function called with progress messages
+    :return: number of positions written
+    """
+    temporary = None
+    if checkpoint is None:
+        temporary = tempfile.TemporaryDirectory()
+        checkpoint = temporary.name
+    os.makedirs(checkpoint, exist_ok=True)
+    try:
+        found = materials(k)
+        for material in found:
+            solve_material(material, checkpoint, workers, chunk_placements, log)
+
+        offset = HEADER.size + ENTRY.size * len(found)
+        with open(output, 'wb') as file:
+            file.write(HEADER.pack(MAGIC, VERSION, k, len(found)))
+            for material in found:
+                states = material_states(material)
+                file.write(ENTRY.pack(*material, states, offset))
+                offset += states * VALUE.size
+            for material in found:
+                with open(_values_path(checkpoint, material), 'rb') as values:
+                    file.write(values.read())
+        return sum(material_states(material) for material in found)
+    finally:
+        _load_values.cache_clear()
+        if temporary is not None:
+            temporary.cleanup()
+
+
+class Tablebase:
+    """ Read only view of a tablebase file through a memory map. A probe ranks the position and reads one value. """
+
+    def __init__(self, path):
+        """
+        Opens a tablebase file
+
+        :param path: file path
+        """
+        with open(path, 'rb') as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, k, count = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError('{} is not a Kuba tablebase'.format(path))
+        if version != VERSION:
+            raise ValueError('unsupported tablebase version {}'.format(version))
+        self._k = k
+        self._materials = {}
+        for index in range(count):
+            entry = ENTRY.unpack_from(self._map, HEADER.size + index * ENTRY.size)
+            white, black, red, red_white, states, offset = entry
+            self._materials[(white, black, red, red_white)] = offset
+
+    @property
+    def k(self):
+        """ K property
+            :return the largest number of marbles on the board of the tables
+        """
+        return self._k
+
+    @property
+    def materials(self):
+        """ Materials property
+            :return list of the materials in the file
+        """
+        return list(self._materials)
+
+    def probe(self, game):
+        """
+        Looks up the exact result of a position for the side to move. Player a must play white.
+
+        :param game: KubaGame
+        :return: tuple (WIN, LOSS or DRAW, distance in plies or None), None if the position is not in the tables
+        """
+        if game.player_a.color != 'W':
+            return None
+        turn = game.get_current_turn()
+        if turn is None:
+            return None
+        masks = game.board.masks
+        white, black, red = masks['W'].bit_count(), masks['B'].bit_count(), masks['R'].bit_count()
+        if game.player_a.marbles_left != white or game.player_b.marbles_left != black:
+            return None
+        material = (white, black, red, game.player_a.red_captured)
+        offset = self._materials.get(material)
+        if offset is None or red + game.player_a.red_captured + game.player_b.red_captured != 13:
+            return None
+
+        side = 0 if game.players[turn].color == 'W' else 1
+        ko = 0
+        if game.ko_rule_move is not None:
+            (row, col), dir = game.ko_rule_move
+            ko = _ko_index([masks['W'], masks['B'], masks['R']], row * 7 + col, DIR_INDEX[dir])
+        rank = placement_rank(masks['W'], masks['B'], masks['R'], white, black, red)
+        state = (rank * 2 + side) * ko_count(white, black) + ko
+        return decode(VALUE.unpack_from(self._map, offset + state * VALUE.size)[0])
+
+    def best_move(self, game, player_name=None):
+        """
+        Picks the move that wins the fastest, else one that draws, else the one that loses the slowest
+
+        :param game: KubaGame
+        :param player_name: name of the player to move, the player whose turn it is if None
+        :return: tuple (move, (result, distance) after the move for the player), None if the position is not in the
+                 tables
+        """
+        if player_name is None:
+            player_name = game.get_current_turn()
+        if player_name is None or player_name != game.get_current_turn() or self.probe(game) is None:
+            return None
+
+        best = None
+        best_key = None
+        for move in legal_moves(game, game.players[player_name]):
+            record = game.apply_move(*move)
+            try:
+                winner = game.get_winner()
+                if winner is not None:
+                    outcome = (WIN if winner == player_name else LOSS, 1)
+                else:
+                    reply = self.probe(game)
+                    if reply is None:
+                        continue
+                    result, distance = reply
+                    outcome = (LOSS if result == WIN else WIN if result == LOSS else DRAW,
+                               None if distance is None else distance + 1)
+            finally:
+                game.undo_move(record)
+            result, distance = outcome
+            key = (2, -distance) if result == WIN else (1, 0) if result == DRAW else (0, distance)
+            if best_key is None or key > best_key:
+                best, best_key = (move, outcome), key
+        return best
+
+    def close(self):
+        """ Closes the memory map """
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+@functools.lru_cache(maxsize=None)
+def load_tablebase(path):
+    """
+    Opens a tablebase file once per process, used by the simulator policies
+
+    :param path: file path
+    :return: Tablebase
+    """
+    return Tablebase(path)
+
+
+def tablebase_policy(tablebase, fallback):
+    """
+    Wraps a policy so it plays the tablebase move when the position is in the tables
+
+    :param tablebase: Tablebase
+    :param fallback: policy function (game, player_name) -> move used outside of the tables
+    :return: policy function (game, player_name) -> move
+    """
+
+    def policy(game, player_name):
+        best = tablebase.best_move(game, player_name)
+        if best is None:
+            return fallback(game, player_name)
+        return best[0]
+    return policy
+
+
+def main(argv=None):
+    instrument.enable_from_environment()
+    parser = argparse.ArgumentParser(description='Build a Kuba endgame tablebase.')
+    parser.add_argument('-k', type=int, default=3, help='largest number of marbles on the board')
+    parser.add_argument('-o', '--output', required=True, help='tablebase file')
+    parser.add_argument('-w', '--workers', type=int, default=1, help='number of worker processes')
+    parser.add_argument('--checkpoint', help='directory to keep progress in, a run can be resumed from it')
+    parser.add_argument('--chunk', type=int, default=2000, help='placements per chunk of work')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    positions = build(args.k, args.output, args.workers, args.checkpoint, args.chunk,
+                      log=lambda message: print(message, flush=True))
+    print('{} positions in {:.1f} s'.format(positions, time.perf_counter() - start))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])